@@ -4,17 +4,38 @@ Dashboard de Imóveis + API REST
 Integração com Innoitune Agent via HTTP Request
 """
 
-from flask import Flask, request, jsonify, send_from_directory, make_response, session, redirect, url_for, render_template_string
+from flask import (
+    Blueprint, Flask, current_app, g, request, jsonify, send_from_directory, make_response, session,
+    redirect, url_for, render_template_string
+)
 from flask_cors import CORS
+from werkzeug.local import LocalProxy
 from functools import wraps
+import copy
 import json
 import os
-import time
 import secrets
+import threading
+from typing import Any, Dict, Optional
 from datetime import datetime, timezone, timedelta
-from database import LeadsDatabase
+from database import LeadsDatabase, ler_data, normalizar_data, normalizar_hora
 from auth import init_oauth, login_required, admin_required, UserModel
-from decorators import protect_endpoint
+from decorators import protect_endpoint, retry_on_lock
+from metrics import metrics, init_metrics
+from query_stats import init_contagem_consultas, query_stats
+from timing import fase, init_server_timing
+from tracing import init_tracing, span
+from profiler import profiler, ProfileEmAndamento, MAX_SEGUNDOS, collapsed, top_funcoes
+from memoria import memoria
+from catalogo import cache_arquivos
+from assets import assets_respostas_total, manifesto_assets
+from snapshot_catalogo import SnapshotCatalogo, compilar as compilar_snapshot
+from manutencao import ManutencaoBanco
+from prontidao import (
+    ProbeProntidao, verificar_aquecimento, verificar_banco, verificar_disco, verificar_catalogo,
+    verificar_estruturas
+)
+from aquecimento import Aquecimento
 
 # Fuso horário de Brasília (UTC-3)
 BRASILIA_TZ = timezone(timedelta(hours=-3))
@@ -24,41 +45,150 @@ def now_brasilia():
     # Retorna datetime "naive" no horário de Brasília (sem info de timezone)
     return datetime.now(BRASILIA_TZ).replace(tzinfo=None)
 
-app = Flask(__name__)
-CORS(app)
-
-# Configurar secret key para sessões
-app.secret_key = os.getenv('SECRET_KEY', secrets.token_hex(32))
-
-# Configurações de sessão segura
-app.config.update(
-    SESSION_COOKIE_SECURE=True if os.getenv('FLASK_ENV') == 'production' else False,
-    SESSION_COOKIE_HTTPONLY=True,
-    SESSION_COOKIE_SAMESITE='Lax',
-    PERMANENT_SESSION_LIFETIME=86400  # 24 horas
-)
-
-# Inicializar OAuth Google
-google_oauth = init_oauth(app)
-
-# Inicializar banco de leads
-db_leads = LeadsDatabase()
-
-# Inicializar modelo de usuários
-user_model = UserModel(db_leads)
+# Rotas do dashboard e da API, registradas na app por create_app()
+bp = Blueprint('dashboard', __name__)
 
 # Configurações
 API_KEY = os.getenv('API_KEY', 'dev-token-12345')
 DATA_DIR = 'data'
 INDICE_FILE = os.path.join(DATA_DIR, 'INDICE.json')
 IMOVEIS_DIR = os.path.join(DATA_DIR, 'imoveis')
+INDICE_VAZIO = {'versao': '1.0', 'total_imoveis': 0, 'imoveis': []}
+LINKS_VAZIO = {'fotos': [], 'video_tour': None, 'planta_baixa': None}
 
-# Garantir que diretórios existem
-os.makedirs(IMOVEIS_DIR, exist_ok=True)
+
+class Armazenamento:
+    """
+    Banco de leads, usuários e manutenção do SQLite, criados no primeiro uso
+
+    Cada processo cria os seus (conexões SQLite e a thread de manutenção
+    não sobrevivem ao fork): se o pid mudou desde a criação, tudo é
+    recriado no worker. Assim o import de app.py não faz I/O e o master do
+    gunicorn (--preload) não herda conexões para os filhos.
+    """
+
+    def __init__(self, db_path: str, manutencao: bool = True):
+        self.db_path = db_path
+        self.manutencao_ativa = manutencao
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._db: Optional[LeadsDatabase] = None
+        self._users: Optional[UserModel] = None
+        self._manutencao: Optional[ManutencaoBanco] = None
+
+    def _garantir(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Garantir que diretórios existem
+            os.makedirs(IMOVEIS_DIR, exist_ok=True)
+
+            db = LeadsDatabase(self.db_path)
+            users = UserModel(db)
+
+            # Checkpoints do WAL, PRAGMA optimize e incremental vacuum em segundo plano
+            manutencao = ManutencaoBanco(db.db_path)
+            if self.manutencao_ativa:
+                manutencao.iniciar()
+
+            self._db, self._users, self._manutencao = db, users, manutencao
+            self._pid = os.getpid()
+
+    @property
+    def db(self) -> LeadsDatabase:
+        self._garantir()
+        return self._db
+
+    @property
+    def users(self) -> UserModel:
+        self._garantir()
+        return self._users
+
+    @property
+    def manutencao(self) -> ManutencaoBanco:
+        self._garantir()
+        return self._manutencao
+
+    def fechar(self) -> None:
+        """Para a manutenção e fecha o pool de leitura (testes/encerramento)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                self._manutencao.parar()
+                if self._db.pool_leitura is not None:
+                    self._db.pool_leitura.fechar()
+            self._pid = self._db = self._users = self._manutencao = None
+
+
+_lock_oauth = threading.Lock()
+
+
+def _google_oauth():
+    """Cliente OAuth registrado na primeira rota de login que precisar dele"""
+    app = current_app._get_current_object()
+    cliente = app.extensions.get('google_oauth')
+    if cliente is None:
+        with _lock_oauth:
+            cliente = app.extensions.get('google_oauth')
+            if cliente is None:
+                cliente = init_oauth(app, app.config.get('OAUTH_CREDENTIALS_FILE'))
+                app.extensions['google_oauth'] = cliente
+    return cliente
+
+
+# Recursos da app atual, resolvidos a cada acesso (como request/session)
+db_leads = LocalProxy(lambda: current_app.extensions['armazenamento'].db)
+user_model = LocalProxy(lambda: current_app.extensions['armazenamento'].users)
+manutencao_banco = LocalProxy(lambda: current_app.extensions['armazenamento'].manutencao)
+google_oauth = LocalProxy(_google_oauth)
+
+
+def _criar_probe_prontidao() -> ProbeProntidao:
+    """Probe de prontidão (/api/ready) de uma app - resultado reaproveitado por 1s"""
+    probe = ProbeProntidao(ttl=1.0)
+    probe.registrar('banco', lambda: verificar_banco(db_leads, manutencao_banco))
+    probe.registrar('disco', lambda: verificar_disco(DATA_DIR))
+    probe.registrar('catalogo', lambda: verificar_catalogo(contar_imoveis))
+    probe.registrar('estruturas', verificar_estruturas)
+    probe.registrar('aquecimento', lambda: verificar_aquecimento(current_app.extensions.get('aquecimento')))
+    return probe
+
+
+@bp.before_app_request
+def _iniciar_aquecimento():
+    """Primeira requisição do processo dispara o aquecimento (uma vez por pid)"""
+    aquecimento = current_app.extensions.get('aquecimento')
+    if aquecimento is not None:
+        aquecimento.iniciar()
+
+
+def _aquecer_catalogo():
+    """
+    INDICE.json e o FAQ/links de cada imóvel no cache de arquivos, ou no
+    page cache quando o snapshot está ativo (compilado aqui se faltar)
+    """
+    snapshot = current_app.extensions.get('snapshot_catalogo')
+    if snapshot is not None and _snapshot() is None:
+        recompilar_snapshot()
+
+    total = 0
+    for imovel in imoveis_catalogo():
+        ler_faq_bytes(imovel)
+        ler_links(imovel)
+        total += 1
+    if snapshot is not None:
+        return snapshot.estatisticas()
+    return {'imoveis': total, 'arquivos': len(cache_arquivos)}
+
+
+def _aquecer_estatisticas():
+    """Primeiro obter_estatisticas (fica no cache até o banco mudar)"""
+    return {'total_leads': db_leads.obter_estatisticas()['total_leads']}
 
 # ==================== ROTAS DE AUTENTICAÇÃO OAUTH ====================
 
-@app.route('/login')
+@bp.route('/login')
 def login():
     """Página de login - Se já logado, redireciona para dashboard"""
     # Se já está logado, vai direto para dashboard
@@ -66,10 +196,10 @@ def login():
         return redirect('/')
 
     # Mostra página de login
-    return send_from_directory('static', 'login.html')
+    return servir_html('login.html')
 
 
-@app.route('/auth/google')
+@bp.route('/auth/google')
 def auth_google():
     """Inicia fluxo OAuth com Google"""
     # Sempre usar HTTPS em produção
@@ -77,7 +207,7 @@ def auth_google():
     return google_oauth.authorize_redirect(redirect_uri)
 
 
-@app.route('/authorize')
+@bp.route('/authorize')
 def authorize():
     """Callback do OAuth Google"""
     try:
@@ -115,14 +245,14 @@ def authorize():
         return jsonify({'error': f'Erro na autenticação: {str(e)}'}), 500
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """Faz logout do usuário"""
     session.pop('user', None)
     return redirect('/login')
 
 
-@app.route('/api/user')
+@bp.route('/api/user')
 def api_user():
     """Retorna dados do usuário logado (sem @login_required para aguardando aprovação)"""
     if 'user' not in session:
@@ -134,7 +264,7 @@ def api_user():
     })
 
 
-@app.route('/aguardando-aprovacao')
+@bp.route('/aguardando-aprovacao')
 def aguardando_aprovacao():
     """Página de espera para usuários não aprovados"""
     # Se não está logado, redireciona para login
@@ -146,7 +276,7 @@ def aguardando_aprovacao():
         return redirect('/')
 
     # Mostra página de espera
-    return send_from_directory('static', 'aguardando-aprovacao.html')
+    return servir_html('aguardando-aprovacao.html')
 
 
 # ==================== AUTENTICAÇÃO API ====================
@@ -155,34 +285,138 @@ def require_api_key(f):
     """Decorator para validar API Key"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
+        with fase('auth'):
+            auth_header = request.headers.get('Authorization')
 
-        if not auth_header:
-            return jsonify({'success': False, 'error': 'API Key não fornecida'}), 401
+            if not auth_header:
+                erro = 'API Key não fornecida'
+            else:
+                try:
+                    token = auth_header.split('Bearer ')[1]
+                    erro = 'API Key inválida' if token != API_KEY else None
+                except:
+                    erro = 'Formato de Authorization inválido'
 
-        try:
-            token = auth_header.split('Bearer ')[1]
-            if token != API_KEY:
-                return jsonify({'success': False, 'error': 'API Key inválida'}), 401
-        except:
-            return jsonify({'success': False, 'error': 'Formato de Authorization inválido'}), 401
+        if erro:
+            return jsonify({'success': False, 'error': erro}), 401
 
         return f(*args, **kwargs)
     return decorated_function
 
 # ==================== HELPERS ====================
 
-def ler_indice():
-    """Lê o arquivo INDICE.json"""
-    if not os.path.exists(INDICE_FILE):
-        return {
-            'versao': '1.0',
-            'total_imoveis': 0,
-            'imoveis': []
-        }
+def _snapshot():
+    """
+    Mapa do snapshot compilado (CATALOG_SNAPSHOT), se ativo e legível
+
+    Resolvido uma vez por requisição (um stat): buscar_imovel_catalogo,
+    ler_faq e ler_links da mesma rota leem o mesmo mapa.
+    """
+    snapshot = current_app.extensions.get('snapshot_catalogo')
+    if snapshot is None:
+        return None
+    if 'mapa_catalogo' not in g:
+        g.mapa_catalogo = snapshot.mapa_ou_none()
+    return g.mapa_catalogo
+
+def ler_indice(copia=False):
+    """
+    Lê o arquivo INDICE.json (do cache enquanto o arquivo não mudar)
 
-    with open(INDICE_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    O dict é compartilhado entre requisições: rotas que alteram o
+    índice antes de salvar pedem copia=True (e leem sempre os arquivos,
+    que são a fonte do snapshot).
+    """
+    with fase('arquivo'), span('catalogo.ler_indice'):
+        snapshot = None if copia else _snapshot()
+        if snapshot is not None:
+            return snapshot.indice()
+        return cache_arquivos.ler_json(INDICE_FILE, INDICE_VAZIO, copia=copia)
+
+def imoveis_catalogo():
+    """
+    Imóveis do catálogo, um a um
+
+    Com o snapshot ativo cada registro é decodificado do mmap na hora e
+    descartado depois da requisição: nenhum worker guarda o catálogo
+    decodificado, que fica só nas páginas compartilhadas do arquivo.
+    """
+    with fase('arquivo'), span('catalogo.imoveis'):
+        snapshot = _snapshot()
+        if snapshot is not None:
+            return snapshot.imoveis()
+        return iter(cache_arquivos.ler_json(INDICE_FILE, INDICE_VAZIO)['imoveis'])
+
+def filtrar_imoveis(cidade=None, tipo=None, status=None):
+    """Imóveis que passam nos filtros (sem diferenciar maiúsculas)"""
+    cidade = cidade.lower() if cidade else None
+    tipo = tipo.lower() if tipo else None
+    status = status.lower() if status else None
+
+    return [
+        imovel for imovel in imoveis_catalogo()
+        if (not cidade or imovel.get('cidade', '').lower() == cidade)
+        and (not tipo or imovel.get('tipo', '').lower() == tipo)
+        and (not status or imovel.get('status', 'disponivel').lower() == status)
+    ]
+
+def contar_imoveis():
+    """Total de imóveis no catálogo (sem decodificar os registros do snapshot)"""
+    snapshot = _snapshot()
+    if snapshot is not None:
+        return snapshot.n
+    return len(cache_arquivos.ler_json(INDICE_FILE, INDICE_VAZIO)['imoveis'])
+
+def buscar_imovel_catalogo(imovel_id):
+    """Imóvel do catálogo por id (busca binária no snapshot, se ativo)"""
+    with fase('arquivo'), span('catalogo.buscar_imovel', imovel_id=imovel_id):
+        snapshot = _snapshot()
+        if snapshot is not None:
+            return snapshot.imovel(imovel_id)
+        indice = cache_arquivos.ler_json(INDICE_FILE, INDICE_VAZIO)
+        return next((i for i in indice['imoveis'] if i['id'] == imovel_id), None)
+
+def ler_faq(imovel, padrao='FAQ não disponível'):
+    """Lê o FAQ.txt do imóvel (ou retorna o texto padrão)"""
+    slug = imovel['slug']
+
+    with fase('arquivo'), span('catalogo.ler_faq', slug=slug):
+        snapshot = _snapshot()
+        if snapshot is not None:
+            return snapshot.faq(imovel['id'], padrao)
+        return cache_arquivos.ler_texto(os.path.join(IMOVEIS_DIR, slug, 'FAQ.txt'), padrao)
+
+def ler_faq_bytes(imovel, padrao='FAQ não disponível'):
+    """
+    FAQ.txt do imóvel em UTF-8, sem passar por str
+
+    Com o snapshot ativo é uma fatia do mmap (memoryview, sem cópia).
+    """
+    slug = imovel['slug']
+
+    with fase('arquivo'), span('catalogo.ler_faq', slug=slug):
+        snapshot = _snapshot()
+        if snapshot is not None:
+            faq = snapshot.faq_bytes(imovel['id'])
+            return faq if faq is not None else padrao.encode('utf-8')
+        return cache_arquivos.ler_texto(os.path.join(IMOVEIS_DIR, slug, 'FAQ.txt'), padrao).encode('utf-8')
+
+def ler_links(imovel):
+    """Lê o links.json do imóvel (fotos, vídeo e planta)"""
+    slug = imovel['slug']
+
+    with fase('arquivo'), span('catalogo.ler_links', slug=slug):
+        snapshot = _snapshot()
+        if snapshot is not None:
+            return snapshot.links(imovel['id'], copy.deepcopy(LINKS_VAZIO))
+        return cache_arquivos.ler_json(os.path.join(IMOVEIS_DIR, slug, 'links.json'), LINKS_VAZIO)
+
+def recompilar_snapshot():
+    """Depois de alterar o catálogo: gera e troca o snapshot, se ativo"""
+    snapshot = current_app.extensions.get('snapshot_catalogo')
+    if snapshot is not None:
+        compilar_snapshot(DATA_DIR, snapshot.caminho)
+        g.pop('mapa_catalogo', None)
 
 def salvar_indice(dados):
     """Salva o arquivo INDICE.json"""
@@ -205,41 +439,65 @@ def gerar_slug(titulo):
 
 def proximo_id():
     """Retorna o próximo ID disponível"""
-    indice = ler_indice()
-    if not indice['imoveis']:
-        return 1
-    return max(imovel['id'] for imovel in indice['imoveis']) + 1
+    return max((imovel['id'] for imovel in imoveis_catalogo()), default=0) + 1
 
 # ==================== ROTAS FRONTEND ====================
 
-@app.route('/')
+# URL com hash do conteúdo: o arquivo nunca muda sob a mesma URL
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+# URLs sem hash: sempre revalidar (304 pelo ETag)
+CACHE_REVALIDAR = 'no-cache'
+# HTML (o index exige login): revalida no navegador, nunca em cache compartilhado
+CACHE_HTML = 'private, no-cache'
+
+
+def _responder_asset(asset, cache_control: str):
+    """Resposta com a variante (br/gzip/original) aceita pelo cliente"""
+    aceitas = [c for c in asset.codificacoes if request.accept_encodings[c]]
+    codificacao, corpo = asset.variante(aceitas)
+    assets_respostas_total.inc(codificacao=codificacao or 'identity')
+
+    response = make_response(corpo)
+    response.mimetype = asset.mimetype
+    response.headers['Cache-Control'] = cache_control
+    if asset.codificacoes:
+        response.headers['Vary'] = 'Accept-Encoding'
+    if codificacao:
+        response.headers['Content-Encoding'] = codificacao
+    response.set_etag(f"{asset.hash}-{codificacao}" if codificacao else asset.hash)
+    return response.make_conditional(request)
+
+
+def servir_html(nome: str):
+    """HTML de static/ com as referências apontando para as URLs com hash"""
+    asset = manifesto_assets.html(nome)
+    if asset is None:
+        response = send_from_directory('static', nome)
+        response.headers['Cache-Control'] = CACHE_HTML
+        return response
+    return _responder_asset(asset, CACHE_HTML)
+
+
+@bp.route('/')
 @login_required
 def index():
-    """Servir dashboard HTML com cache busting (requer autenticação)"""
-    # Ler HTML
-    with open('static/index.html', 'r', encoding='utf-8') as f:
-        html = f.read()
-
-    # Injetar timestamp dinâmico nos scripts
-    timestamp = str(int(time.time()))
-    html = html.replace('agenda.js?v=1762739999', f'agenda.js?v={timestamp}')
-    html = html.replace('leads_v2.js?v=1762738405', f'leads_v2.js?v={timestamp}')
-
-    # Retornar com headers anti-cache
-    response = make_response(html)
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
-
-@app.route('/static/<path:path>')
+    """Servir dashboard HTML (requer autenticação); os scripts vão com hash na URL"""
+    return servir_html('index.html')
+
+@bp.route('/static/<path:path>')
 def static_files(path):
-    """Servir arquivos estáticos"""
+    """Servir arquivos estáticos do manifesto (pré-comprimidos em memória)"""
+    asset = manifesto_assets.por_url(path)
+    if asset is not None:
+        return _responder_asset(asset, CACHE_IMUTAVEL)
+    asset = manifesto_assets.asset(path)
+    if asset is not None:
+        return _responder_asset(asset, CACHE_REVALIDAR)
     return send_from_directory('static', path)
 
 # ==================== API ENDPOINTS ====================
 
-@app.route('/api/health', methods=['GET'])
+@bp.route('/api/health', methods=['GET'])
 def health():
     """Health check (sem autenticação)"""
     return jsonify({
@@ -248,28 +506,36 @@ def health():
         'timestamp': now_brasilia().isoformat()
     })
 
+@bp.route('/api/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe (sem autenticação)
+
+    Diferente do /api/health, toca o banco, o disco e o catálogo.
+    Retorna 503 com os motivos quando algum limite é ultrapassado, para o
+    traefik parar de rotear para esta instância.
+    """
+    pronto, relatorio = current_app.extensions['prontidao'].verificar()
+
+    return jsonify({
+        'success': pronto,
+        'status': 'pronto' if pronto else 'indisponivel',
+        'timestamp': now_brasilia().isoformat(),
+        **relatorio
+    }), 200 if pronto else 503
+
 # ==================== ENDPOINTS TEXTO PURO (para Innoitune) ====================
 
-@app.route('/api/texto/imoveis', methods=['GET'])
+@bp.route('/api/texto/imoveis', methods=['GET'])
 @require_api_key
 def listar_imoveis_texto():
     """Lista imóveis em formato JSON estruturado"""
-    indice = ler_indice()
-
     # Filtros opcionais
     cidade = request.args.get('cidade')
     tipo = request.args.get('tipo')
     status_filter = request.args.get('status', 'disponivel')
 
-    imoveis = indice['imoveis']
-
-    # Aplicar filtros
-    if cidade:
-        imoveis = [i for i in imoveis if i.get('cidade', '').lower() == cidade.lower()]
-    if tipo:
-        imoveis = [i for i in imoveis if i.get('tipo', '').lower() == tipo.lower()]
-    if status_filter:
-        imoveis = [i for i in imoveis if i.get('status', 'disponivel').lower() == status_filter.lower()]
+    imoveis = filtrar_imoveis(cidade, tipo, status_filter)
 
     # Retornar JSON estruturado
     resultado = {
@@ -291,7 +557,7 @@ def listar_imoveis_texto():
 
     return jsonify(resultado)
 
-@app.route('/api/texto/faq', methods=['GET'])
+@bp.route('/api/texto/faq', methods=['GET'])
 @require_api_key
 def buscar_faq_por_parametro():
     """Busca FAQ usando ID como parâmetro (para IA preencher automaticamente)"""
@@ -305,30 +571,17 @@ def buscar_faq_por_parametro():
     except:
         return "Parametro 'id' deve ser um numero.", 400, {'Content-Type': 'text/plain; charset=utf-8'}
 
-    indice = ler_indice()
 
-    imovel = next((i for i in indice['imoveis'] if i['id'] == imovel_id), None)
+    imovel = buscar_imovel_catalogo(imovel_id)
 
     if not imovel:
         return "Imovel nao encontrado.", 404, {'Content-Type': 'text/plain; charset=utf-8'}
 
     # Ler arquivo FAQ.txt
-    faq_path = os.path.join(IMOVEIS_DIR, imovel['slug'], 'FAQ.txt')
-
-    if not os.path.exists(faq_path):
-        faq_content = 'FAQ nao disponivel'
-    else:
-        with open(faq_path, 'r', encoding='utf-8') as f:
-            faq_content = f.read()
+    faq_content = ler_faq(imovel, 'FAQ nao disponivel')
 
     # Ler arquivo links.json para pegar fotos
-    links_path = os.path.join(IMOVEIS_DIR, imovel['slug'], 'links.json')
-
-    if not os.path.exists(links_path):
-        links_data = {'fotos': [], 'video_tour': None, 'planta_baixa': None}
-    else:
-        with open(links_path, 'r', encoding='utf-8') as f:
-            links_data = json.load(f)
+    links_data = ler_links(imovel)
 
     fotos = links_data.get('fotos', [])
     video_tour = links_data.get('video_tour')
@@ -351,34 +604,21 @@ def buscar_faq_por_parametro():
 
     return jsonify(resultado)
 
-@app.route('/api/texto/imoveis/<int:imovel_id>/faq', methods=['GET'])
+@bp.route('/api/texto/imoveis/<int:imovel_id>/faq', methods=['GET'])
 @require_api_key
 def buscar_faq_texto(imovel_id):
     """Busca FAQ completo (informações + fotos) em formato texto puro - URL antiga mantida"""
-    indice = ler_indice()
 
-    imovel = next((i for i in indice['imoveis'] if i['id'] == imovel_id), None)
+    imovel = buscar_imovel_catalogo(imovel_id)
 
     if not imovel:
         return "Imovel nao encontrado.", 404, {'Content-Type': 'text/plain; charset=utf-8'}
 
     # Ler arquivo FAQ.txt
-    faq_path = os.path.join(IMOVEIS_DIR, imovel['slug'], 'FAQ.txt')
-
-    if not os.path.exists(faq_path):
-        faq_content = 'FAQ nao disponivel'
-    else:
-        with open(faq_path, 'r', encoding='utf-8') as f:
-            faq_content = f.read()
+    faq_content = ler_faq(imovel, 'FAQ nao disponivel')
 
     # Ler arquivo links.json para pegar fotos
-    links_path = os.path.join(IMOVEIS_DIR, imovel['slug'], 'links.json')
-
-    if not os.path.exists(links_path):
-        links_data = {'fotos': [], 'video_tour': None, 'planta_baixa': None}
-    else:
-        with open(links_path, 'r', encoding='utf-8') as f:
-            links_data = json.load(f)
+    links_data = ler_links(imovel)
 
     fotos = links_data.get('fotos', [])
     video_tour = links_data.get('video_tour')
@@ -408,25 +648,18 @@ def buscar_faq_texto(imovel_id):
 
     return texto, 200, {'Content-Type': 'text/plain; charset=utf-8'}
 
-@app.route('/api/texto/imoveis/<int:imovel_id>/fotos', methods=['GET'])
+@bp.route('/api/texto/imoveis/<int:imovel_id>/fotos', methods=['GET'])
 @require_api_key
 def buscar_fotos_texto(imovel_id):
     """Busca URLs de fotos em formato texto puro"""
-    indice = ler_indice()
 
-    imovel = next((i for i in indice['imoveis'] if i['id'] == imovel_id), None)
+    imovel = buscar_imovel_catalogo(imovel_id)
 
     if not imovel:
         return "Imovel nao encontrado.", 404, {'Content-Type': 'text/plain; charset=utf-8'}
 
     # Ler arquivo links.json
-    links_path = os.path.join(IMOVEIS_DIR, imovel['slug'], 'links.json')
-
-    if not os.path.exists(links_path):
-        links_data = {'fotos': [], 'video_tour': None, 'planta_baixa': None}
-    else:
-        with open(links_path, 'r', encoding='utf-8') as f:
-            links_data = json.load(f)
+    links_data = ler_links(imovel)
 
     fotos = links_data.get('fotos', [])
     video_tour = links_data.get('video_tour')
@@ -451,27 +684,17 @@ def buscar_fotos_texto(imovel_id):
 
     return texto, 200, {'Content-Type': 'text/plain; charset=utf-8'}
 
-@app.route('/api/imoveis', methods=['GET'])
+@bp.route('/api/imoveis', methods=['GET'])
 @require_api_key
 def listar_imoveis():
     """Lista todos os imóveis"""
-    indice = ler_indice()
-
     # Filtros opcionais
     cidade = request.args.get('cidade')
     tipo = request.args.get('tipo')
     status = request.args.get('status', 'disponivel')
     formato = request.args.get('formato', 'json')  # json ou texto
 
-    imoveis = indice['imoveis']
-
-    # Aplicar filtros
-    if cidade:
-        imoveis = [i for i in imoveis if i.get('cidade', '').lower() == cidade.lower()]
-    if tipo:
-        imoveis = [i for i in imoveis if i.get('tipo', '').lower() == tipo.lower()]
-    if status:
-        imoveis = [i for i in imoveis if i.get('status', 'disponivel').lower() == status.lower()]
+    imoveis = filtrar_imoveis(cidade, tipo, status)
 
     # Retornar em formato texto para agentes IA
     if formato == 'texto':
@@ -502,13 +725,12 @@ def listar_imoveis():
         'mensagem': 'Nenhum imóvel encontrado' if not imoveis else f'{len(imoveis)} imóveis encontrados'
     })
 
-@app.route('/api/imoveis/<int:imovel_id>', methods=['GET'])
+@bp.route('/api/imoveis/<int:imovel_id>', methods=['GET'])
 @require_api_key
 def buscar_imovel(imovel_id):
     """Busca um imóvel por ID"""
-    indice = ler_indice()
 
-    imovel = next((i for i in indice['imoveis'] if i['id'] == imovel_id), None)
+    imovel = buscar_imovel_catalogo(imovel_id)
 
     if not imovel:
         return jsonify({'success': False, 'error': 'Imóvel não encontrado'}), 404
@@ -518,53 +740,45 @@ def buscar_imovel(imovel_id):
         'imovel': imovel
     })
 
-@app.route('/api/imoveis/<int:imovel_id>/faq', methods=['GET'])
+@bp.route('/api/imoveis/<int:imovel_id>/faq', methods=['GET'])
 @require_api_key
 def buscar_faq(imovel_id):
     """Busca FAQ de um imóvel"""
-    indice = ler_indice()
     formato = request.args.get('formato', 'json')
 
-    imovel = next((i for i in indice['imoveis'] if i['id'] == imovel_id), None)
+    imovel = buscar_imovel_catalogo(imovel_id)
 
     if not imovel:
         if formato == 'texto':
             return "Imóvel não encontrado.", 404, {'Content-Type': 'text/plain; charset=utf-8'}
         return jsonify({'success': False, 'error': 'Imóvel não encontrado'}), 404
 
-    # Ler arquivo FAQ.txt
-    faq_path = os.path.join(IMOVEIS_DIR, imovel['slug'], 'FAQ.txt')
-
-    if not os.path.exists(faq_path):
-        faq_content = 'FAQ não disponível'
-    else:
-        with open(faq_path, 'r', encoding='utf-8') as f:
-            faq_content = f.read()
+    # Ler arquivo FAQ.txt (bytes direto do snapshot, sem decodificar)
+    faq_content = ler_faq_bytes(imovel)
 
     # Retornar em formato texto
     if formato == 'texto':
         texto = f"FAQ - {imovel['titulo']}\n"
         texto += f"ID: {imovel_id}\n"
         texto += "=" * 50 + "\n\n"
-        texto += faq_content
-        return texto, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+        corpo = b''.join((texto.encode('utf-8'), faq_content))
+        return corpo, 200, {'Content-Type': 'text/plain; charset=utf-8'}
 
     # Retorno JSON padrão
     return jsonify({
         'success': True,
         'imovel_id': imovel_id,
         'slug': imovel['slug'],
-        'faq': faq_content
+        'faq': str(faq_content, 'utf-8')
     })
 
-@app.route('/api/imoveis/<int:imovel_id>/fotos', methods=['GET'])
+@bp.route('/api/imoveis/<int:imovel_id>/fotos', methods=['GET'])
 @require_api_key
 def buscar_fotos(imovel_id):
     """Busca URLs das fotos de um imóvel"""
-    indice = ler_indice()
     formato = request.args.get('formato', 'json')
 
-    imovel = next((i for i in indice['imoveis'] if i['id'] == imovel_id), None)
+    imovel = buscar_imovel_catalogo(imovel_id)
 
     if not imovel:
         if formato == 'texto':
@@ -572,13 +786,7 @@ def buscar_fotos(imovel_id):
         return jsonify({'success': False, 'error': 'Imóvel não encontrado'}), 404
 
     # Ler arquivo links.json
-    links_path = os.path.join(IMOVEIS_DIR, imovel['slug'], 'links.json')
-
-    if not os.path.exists(links_path):
-        links_data = {'fotos': [], 'video_tour': None, 'planta_baixa': None}
-    else:
-        with open(links_path, 'r', encoding='utf-8') as f:
-            links_data = json.load(f)
+    links_data = ler_links(imovel)
 
     fotos = links_data.get('fotos', [])
     video_tour = links_data.get('video_tour')
@@ -615,7 +823,7 @@ def buscar_fotos(imovel_id):
         'planta_baixa': planta_baixa
     })
 
-@app.route('/api/imoveis', methods=['POST'])
+@bp.route('/api/imoveis', methods=['POST'])
 def criar_imovel():
     """Cria um novo imóvel (sem autenticação para o dashboard)"""
     dados = request.json
@@ -624,7 +832,7 @@ def criar_imovel():
     if not dados.get('titulo'):
         return jsonify({'success': False, 'error': 'Título é obrigatório'}), 400
 
-    indice = ler_indice()
+    indice = ler_indice(copia=True)
 
     # Gerar slug
     slug_base = dados.get('slug') or gerar_slug(dados['titulo'])
@@ -667,6 +875,8 @@ def criar_imovel():
     with open(links_path, 'w', encoding='utf-8') as f:
         json.dump(links_data, f, ensure_ascii=False, indent=2)
 
+    recompilar_snapshot()
+
     return jsonify({
         'success': True,
         'imovel_id': novo_imovel['id'],
@@ -674,11 +884,11 @@ def criar_imovel():
         'message': 'Imóvel criado com sucesso'
     }), 201
 
-@app.route('/api/imoveis/<int:imovel_id>', methods=['PUT'])
+@bp.route('/api/imoveis/<int:imovel_id>', methods=['PUT'])
 def atualizar_imovel(imovel_id):
     """Atualiza um imóvel existente"""
     dados = request.json
-    indice = ler_indice()
+    indice = ler_indice(copia=True)
 
     imovel = next((i for i in indice['imoveis'] if i['id'] == imovel_id), None)
 
@@ -723,16 +933,18 @@ def atualizar_imovel(imovel_id):
         with open(links_path, 'w', encoding='utf-8') as f:
             json.dump(links_data, f, ensure_ascii=False, indent=2)
 
+    recompilar_snapshot()
+
     return jsonify({
         'success': True,
         'imovel_id': imovel_id,
         'message': 'Imóvel atualizado com sucesso'
     })
 
-@app.route('/api/imoveis/<int:imovel_id>', methods=['DELETE'])
+@bp.route('/api/imoveis/<int:imovel_id>', methods=['DELETE'])
 def deletar_imovel(imovel_id):
     """Deleta um imóvel"""
-    indice = ler_indice()
+    indice = ler_indice(copia=True)
 
     imovel = next((i for i in indice['imoveis'] if i['id'] == imovel_id), None)
 
@@ -750,6 +962,8 @@ def deletar_imovel(imovel_id):
     # if os.path.exists(imovel_dir):
     #     shutil.rmtree(imovel_dir)
 
+    recompilar_snapshot()
+
     return jsonify({
         'success': True,
         'message': 'Imóvel deletado com sucesso'
@@ -757,7 +971,7 @@ def deletar_imovel(imovel_id):
 
 # ==================== ENDPOINTS DE LEADS ====================
 
-@app.route('/api/leads/score', methods=['GET'])
+@bp.route('/api/leads/score', methods=['GET'])
 @require_api_key
 @protect_endpoint(
     max_requests=10,  # 10 req/s por IP
@@ -849,7 +1063,7 @@ def atualizar_score():
 
     return jsonify(resultado), 200
 
-@app.route('/api/leads/imovel', methods=['GET'])
+@bp.route('/api/leads/imovel', methods=['GET'])
 @require_api_key
 @protect_endpoint(
     max_requests=10,  # 10 req/s por IP
@@ -948,8 +1162,9 @@ def definir_imovel():
 
     return jsonify(resultado), 200
 
-@app.route('/api/leads/agendar', methods=['GET'])
+@bp.route('/api/leads/agendar', methods=['GET'])
 @require_api_key
+@retry_on_lock()
 def marcar_agendamento():
     """
     ENDPOINT 3: Marcar que lead AGENDOU VISITA
@@ -1000,8 +1215,9 @@ def marcar_agendamento():
 
     return jsonify(resultado), 200
 
-@app.route('/api/leads/tag', methods=['GET'])
+@bp.route('/api/leads/tag', methods=['GET'])
 @require_api_key
+@retry_on_lock()
 def taguear_lead_get():
     """
     ENDPOINT COMPLETO (LEGADO): Atualizar tudo de uma vez
@@ -1081,8 +1297,9 @@ def taguear_lead_get():
 
     return jsonify(resultado), 201 if resultado['acao'] == 'created' else 200
 
-@app.route('/api/leads/registrar', methods=['POST'])
+@bp.route('/api/leads/registrar', methods=['POST'])
 @require_api_key
+@retry_on_lock()
 def registrar_lead():
     """
     Registra ou atualiza lead (usado pelo agente IA via ferramenta)
@@ -1124,7 +1341,7 @@ def registrar_lead():
 
     return jsonify(resultado), 201 if resultado['acao'] == 'created' else 200
 
-@app.route('/api/leads', methods=['GET'])
+@bp.route('/api/leads', methods=['GET'])
 @require_api_key
 def listar_leads():
     """
@@ -1157,7 +1374,7 @@ def listar_leads():
         'leads': leads
     })
 
-@app.route('/api/leads/<whatsapp>', methods=['GET'])
+@bp.route('/api/leads/<whatsapp>', methods=['GET'])
 @require_api_key
 def buscar_lead(whatsapp):
     """Busca lead específico com histórico de score"""
@@ -1180,8 +1397,9 @@ def buscar_lead(whatsapp):
         'historico': historico
     })
 
-@app.route('/api/leads/<whatsapp>', methods=['DELETE'])
+@bp.route('/api/leads/<whatsapp>', methods=['DELETE'])
 @require_api_key
+@retry_on_lock()
 def deletar_lead_route(whatsapp):
     """Deleta um lead"""
     whatsapp = whatsapp.replace('+', '').replace(' ', '').replace('-', '')
@@ -1192,7 +1410,7 @@ def deletar_lead_route(whatsapp):
 
     return jsonify(resultado)
 
-@app.route('/api/leads/export', methods=['GET'])
+@bp.route('/api/leads/export', methods=['GET'])
 @require_api_key
 def exportar_leads():
     """
@@ -1224,7 +1442,7 @@ def exportar_leads():
         'Content-Disposition': f'attachment; filename=leads_{now_brasilia().strftime("%Y%m%d")}.csv'
     }
 
-@app.route('/api/estatisticas', methods=['GET'])
+@bp.route('/api/estatisticas', methods=['GET'])
 @require_api_key
 def estatisticas():
     """Retorna estatísticas agregadas para gráficos"""
@@ -1237,29 +1455,46 @@ def estatisticas():
 
 # ==================== ENDPOINTS DE AGENDA ====================
 
-@app.route('/api/agenda/agendamentos', methods=['GET'])
+@bp.route('/api/agenda/agendamentos', methods=['GET'])
 def listar_agendamentos():
-    """Lista agendamentos com filtros opcionais"""
+    """
+    Lista agendamentos com filtros opcionais (ordem cronológica)
+
+    Query params:
+        - status, data_inicio, data_fim, imovel_id: filtros
+        - limite, offset: paginação (opcional)
+    """
     filtros = {}
 
     if request.args.get('status'):
         filtros['status'] = request.args.get('status')
-    if request.args.get('data_inicio'):
-        filtros['data_inicio'] = request.args.get('data_inicio')
-    if request.args.get('data_fim'):
-        filtros['data_fim'] = request.args.get('data_fim')
+    try:
+        for campo in ('data_inicio', 'data_fim'):
+            if request.args.get(campo):
+                filtros[campo] = normalizar_data(request.args.get(campo))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Formato de data inválido. Use YYYY-MM-DD'
+        }), 400
     if request.args.get('imovel_id'):
         filtros['imovel_id'] = int(request.args.get('imovel_id'))
 
-    agendamentos = db_leads.listar_agendamentos(filtros)
+    limite = request.args.get('limite', type=int)
+    offset = request.args.get('offset', 0, type=int)
+
+    agendamentos = db_leads.listar_agendamentos(filtros, limite=limite, offset=offset)
 
     return jsonify({
         'success': True,
         'total': len(agendamentos),
+        'limite': limite,
+        'offset': offset,
         'agendamentos': agendamentos
     })
 
-@app.route('/api/agenda/agendamentos', methods=['POST'])
+@bp.route('/api/agenda/agendamentos', methods=['POST'])
+@retry_on_lock()
 def criar_agendamento():
     """Cria novo agendamento"""
     dados = request.json
@@ -1299,23 +1534,31 @@ def criar_agendamento():
         status=dados.get('status', 'agendado')
     )
 
+    if resultado.get('conflito'):
+        return jsonify(resultado), 409
+
     if not resultado['success']:
         return jsonify(resultado), 400
 
     return jsonify(resultado), 201
 
-@app.route('/api/agenda/agendamentos/<int:agendamento_id>', methods=['PUT'])
+@bp.route('/api/agenda/agendamentos/<int:agendamento_id>', methods=['PUT'])
+@retry_on_lock()
 def atualizar_agendamento_route(agendamento_id):
     """Atualiza agendamento existente"""
     dados = request.json
     resultado = db_leads.atualizar_agendamento(agendamento_id, dados)
 
+    if resultado.get('conflito'):
+        return jsonify(resultado), 409
+
     if not resultado['success']:
         return jsonify(resultado), 400
 
     return jsonify(resultado)
 
-@app.route('/api/agenda/agendamentos/<int:agendamento_id>', methods=['DELETE'])
+@bp.route('/api/agenda/agendamentos/<int:agendamento_id>', methods=['DELETE'])
+@retry_on_lock()
 def deletar_agendamento_route(agendamento_id):
     """Deleta agendamento"""
     resultado = db_leads.deletar_agendamento(agendamento_id)
@@ -1325,7 +1568,7 @@ def deletar_agendamento_route(agendamento_id):
 
     return jsonify(resultado)
 
-@app.route('/api/agenda/estatisticas', methods=['GET'])
+@bp.route('/api/agenda/estatisticas', methods=['GET'])
 def estatisticas_agenda():
     """Retorna estatísticas da agenda"""
     stats = db_leads.obter_estatisticas_agenda()
@@ -1335,7 +1578,33 @@ def estatisticas_agenda():
         'estatisticas': stats
     })
 
-@app.route('/api/agenda/observacoes', methods=['GET'])
+@bp.route('/api/agenda/calendario', methods=['GET'])
+def calendario_agenda():
+    """
+    Ocupação do mês por dia/status (heatmap do calendário)
+
+    Query params:
+        - mes: YYYY-MM (padrão: mês atual)
+    """
+    mes_param = request.args.get('mes') or now_brasilia().strftime('%Y-%m')
+
+    try:
+        ano, mes = (int(parte) for parte in mes_param.split('-'))
+        calendario = db_leads.obter_calendario(ano, mes)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Formato de mês inválido. Use YYYY-MM'
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'mes': f'{ano:04d}-{mes:02d}',
+        'dias': calendario,
+        'maximo_dia': max((dia['total'] for dia in calendario.values()), default=0)
+    })
+
+@bp.route('/api/agenda/observacoes', methods=['GET'])
 def obter_observacoes():
     """Obtém observações da agenda"""
     observacoes = db_leads.obter_configuracao('agenda_observacoes')
@@ -1345,7 +1614,8 @@ def obter_observacoes():
         'observacoes': observacoes or ''
     })
 
-@app.route('/api/agenda/observacoes', methods=['POST'])
+@bp.route('/api/agenda/observacoes', methods=['POST'])
+@retry_on_lock()
 def salvar_observacoes():
     """Salva observações da agenda"""
     dados = request.json
@@ -1360,9 +1630,37 @@ def salvar_observacoes():
 
     return jsonify(resultado)
 
+@bp.route('/api/agenda/horarios', methods=['GET'])
+def obter_horarios_agenda():
+    """Obtém regras estruturadas da agenda (horário de funcionamento e durações)"""
+    return jsonify({
+        'success': True,
+        'regras': db_leads.obter_regras_agenda()
+    })
+
+@bp.route('/api/agenda/horarios', methods=['POST'])
+@retry_on_lock()
+def salvar_horarios_agenda():
+    """
+    Salva regras estruturadas da agenda
+
+    Body JSON:
+    {
+        "duracao_slot_min": 30,
+        "duracao_visita_min": 60,
+        "dias": {"seg": [["08:00", "12:00"], ["13:00", "18:00"]], "dom": []}
+    }
+    """
+    resultado = db_leads.salvar_regras_agenda(request.json or {})
+
+    if not resultado['success']:
+        return jsonify(resultado), 400
+
+    return jsonify(resultado)
+
 # ==================== ENDPOINTS ADMIN ====================
 
-@app.route('/api/admin/usuarios', methods=['GET'])
+@bp.route('/api/admin/usuarios', methods=['GET'])
 @admin_required
 def listar_todos_usuarios():
     """Lista todos os usuários (somente admin)"""
@@ -1374,7 +1672,7 @@ def listar_todos_usuarios():
     })
 
 
-@app.route('/api/admin/usuarios/pendentes', methods=['GET'])
+@bp.route('/api/admin/usuarios/pendentes', methods=['GET'])
 @admin_required
 def listar_usuarios_pendentes():
     """Lista usuários aguardando aprovação (somente admin)"""
@@ -1386,8 +1684,9 @@ def listar_usuarios_pendentes():
     })
 
 
-@app.route('/api/admin/usuarios/<int:user_id>/aprovar', methods=['POST'])
+@bp.route('/api/admin/usuarios/<int:user_id>/aprovar', methods=['POST'])
 @admin_required
+@retry_on_lock()
 def aprovar_usuario(user_id):
     """Aprova um usuário (somente admin)"""
     resultado = user_model.aprovar_usuario(user_id)
@@ -1398,8 +1697,9 @@ def aprovar_usuario(user_id):
     return jsonify(resultado)
 
 
-@app.route('/api/admin/usuarios/<int:user_id>/revogar', methods=['POST'])
+@bp.route('/api/admin/usuarios/<int:user_id>/revogar', methods=['POST'])
 @admin_required
+@retry_on_lock()
 def revogar_usuario(user_id):
     """Revoga aprovação de um usuário (somente admin)"""
     resultado = user_model.revogar_usuario(user_id)
@@ -1409,9 +1709,183 @@ def revogar_usuario(user_id):
 
     return jsonify(resultado)
 
+@bp.route('/metrics', methods=['GET'])
+@admin_required
+def exportar_metricas():
+    """Métricas no formato Prometheus (somente admin)"""
+    return metrics.exportar(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@bp.route('/api/admin/queries', methods=['GET'])
+@admin_required
+def consultas_sql():
+    """
+    Statements SQL mais custosos (somente admin)
+
+    Query params:
+        - top: Quantidade (padrão: 20)
+        - ordem: total, media, max ou chamadas (padrão: total)
+    """
+    top = request.args.get('top', 20, type=int)
+    ordem = request.args.get('ordem', 'total')
+
+    return jsonify({
+        'success': True,
+        'limite_lento_ms': query_stats.limite_lento_ms,
+        'consultas': query_stats.top(top, ordem)
+    })
+
+
+@bp.route('/api/admin/queries', methods=['DELETE'])
+@admin_required
+def resetar_consultas_sql():
+    """Zera estatísticas de statements SQL (somente admin)"""
+    query_stats.resetar()
+
+    return jsonify({
+        'success': True,
+        'message': 'Estatísticas de consultas zeradas'
+    })
+
+
+@bp.route('/api/admin/manutencao', methods=['GET'])
+@admin_required
+def estado_manutencao():
+    """Último checkpoint, tamanho do WAL e tarefas da manutenção do SQLite (somente admin)"""
+    return jsonify({
+        'success': True,
+        'manutencao': manutencao_banco.resumo()
+    })
+
+
+@bp.route('/api/admin/manutencao', methods=['POST'])
+@admin_required
+def executar_manutencao():
+    """Executa uma rodada de manutenção agora (somente admin)"""
+    return jsonify({
+        'success': True,
+        'executadas': manutencao_banco.rodada(),
+        'manutencao': manutencao_banco.resumo()
+    })
+
+
+@bp.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def executar_profile():
+    """
+    Amostra as pilhas de todas as threads por alguns segundos (somente admin)
+
+    Query params:
+        - seconds: Duração da amostragem (padrão: 10, máximo: 60)
+        - intervalo_ms: Intervalo entre amostras (padrão: 10, 1-100)
+        - formato: collapsed (texto para flamegraph, padrão) ou top (JSON)
+        - ociosas: 1 para incluir threads aguardando I/O (padrão: 0)
+
+    Uso:
+        curl -X POST -b cookie.txt '.../api/admin/profile?seconds=15' > perfil.folded
+        flamegraph.pl perfil.folded > perfil.svg
+    """
+    segundos = request.args.get('seconds', 10, type=float)
+    if segundos <= 0 or segundos > MAX_SEGUNDOS:
+        return jsonify({
+            'success': False,
+            'error': f'seconds deve estar entre 0 e {MAX_SEGUNDOS}'
+        }), 400
+
+    try:
+        resultado = profiler.amostrar(
+            segundos,
+            intervalo_ms=request.args.get('intervalo_ms', 10, type=float),
+            incluir_ociosas=request.args.get('ociosas') == '1'
+        )
+    except ProfileEmAndamento:
+        return jsonify({
+            'success': False,
+            'error': 'Já existe um profile em andamento'
+        }), 409
+
+    if request.args.get('formato') == 'top':
+        return jsonify({
+            'success': True,
+            'segundos': resultado['segundos'],
+            'amostras': resultado['amostras'],
+            'funcoes': top_funcoes(resultado['pilhas'])
+        })
+
+    return collapsed(resultado['pilhas']), 200, {
+        'Content-Type': 'text/plain; charset=utf-8',
+        'X-Profile-Amostras': str(resultado['amostras'])
+    }
+
+
+@bp.route('/api/admin/memoria', methods=['GET'])
+@admin_required
+def resumo_memoria():
+    """RSS, tamanho das estruturas em memória e estado do tracemalloc (somente admin)"""
+    return jsonify({
+        'success': True,
+        **memoria.resumo()
+    })
+
+
+@bp.route('/api/admin/memoria/snapshot', methods=['POST'])
+@admin_required
+def snapshot_memoria():
+    """
+    Tira um snapshot do tracemalloc (somente admin)
+
+    O primeiro snapshot liga o tracemalloc (overhead de alocação até o
+    DELETE). Tire um, aguarde tráfego e tire outro; compare com /diff.
+
+    Query params:
+        - frames: Profundidade do traceback guardado (padrão: 10)
+    """
+    return jsonify({
+        'success': True,
+        **memoria.snapshot(request.args.get('frames', 10, type=int))
+    })
+
+
+@bp.route('/api/admin/memoria/diff', methods=['GET'])
+@admin_required
+def diff_memoria():
+    """
+    Maiores diferenças de alocação entre dois snapshots (somente admin)
+
+    Query params:
+        - de, ate: IDs dos snapshots (padrão: os dois últimos)
+        - top: Quantidade de linhas (padrão: 20)
+        - agrupar: lineno, filename ou traceback (padrão: lineno)
+    """
+    try:
+        resultado = memoria.diff(
+            de=request.args.get('de', type=int),
+            ate=request.args.get('ate', type=int),
+            top=request.args.get('top', 20, type=int),
+            agrupar=request.args.get('agrupar', 'lineno')
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    return jsonify({
+        'success': True,
+        **resultado
+    })
+
+
+@bp.route('/api/admin/memoria/snapshot', methods=['DELETE'])
+@admin_required
+def parar_tracemalloc():
+    """Descarta snapshots e desliga o tracemalloc (somente admin)"""
+    memoria.parar()
+
+    return jsonify({
+        'success': True,
+        'message': 'tracemalloc desligado'
+    })
+
 # ==================== ENDPOINTS PARA AGENTE IA ====================
 
-@app.route('/api/agente/consultar-agenda', methods=['GET'])
+@bp.route('/api/agente/consultar-agenda', methods=['GET'])
 @require_api_key
 def consultar_agenda_agente():
     """
@@ -1426,6 +1900,7 @@ def consultar_agenda_agente():
     Retorna: Lista de horários agendados + observações/regras
     """
     from datetime import datetime, timedelta
+    from itertools import groupby
 
     # Parâmetros
     data_param = request.args.get('data')
@@ -1434,8 +1909,8 @@ def consultar_agenda_agente():
     # Data inicial
     if data_param:
         try:
-            data_inicio = datetime.strptime(data_param, '%Y-%m-%d').date()
-        except:
+            data_inicio = ler_data(data_param)
+        except ValueError:
             return jsonify({
                 'success': False,
                 'error': 'Formato de data inválido. Use YYYY-MM-DD'
@@ -1452,24 +1927,27 @@ def consultar_agenda_agente():
         'data_fim': data_fim.isoformat()
     }
 
-    agendamentos = db_leads.listar_agendamentos(filtros)
+    agendamentos = db_leads.listar_agendamentos(
+        filtros,
+        colunas=['data_visita', 'hora_visita', 'nome_cliente', 'imovel_id', 'status']
+    )
 
     # Buscar observações/regras
     observacoes = db_leads.obter_configuracao('agenda_observacoes') or 'Nenhuma regra configurada'
 
-    # Organizar por data
-    agenda_por_data = {}
-    for agendamento in agendamentos:
-        data = agendamento['data_visita']
-        if data not in agenda_por_data:
-            agenda_por_data[data] = []
-
-        agenda_por_data[data].append({
-            'hora': agendamento['hora_visita'],
-            'cliente': agendamento['nome_cliente'],
-            'imovel_id': agendamento['imovel_id'],
-            'status': agendamento['status']
-        })
+    # Organizar por data (já vem em ordem de data/hora do banco)
+    agenda_por_data = {
+        data: [
+            {
+                'hora': agendamento['hora_visita'],
+                'cliente': agendamento['nome_cliente'],
+                'imovel_id': agendamento['imovel_id'],
+                'status': agendamento['status']
+            }
+            for agendamento in itens
+        ]
+        for data, itens in groupby(agendamentos, key=lambda a: a['data_visita'])
+    }
 
     # Resposta formatada para IA
     return jsonify({
@@ -1485,8 +1963,123 @@ def consultar_agenda_agente():
         'mensagem': f'Agenda consultada de {data_inicio.strftime("%d/%m/%Y")} até {data_fim.strftime("%d/%m/%Y")}'
     })
 
-@app.route('/api/agente/agendar-visita', methods=['POST'])
+@bp.route('/api/agente/horarios-livres', methods=['GET'])
+@require_api_key
+def horarios_livres_agente():
+    """
+    ENDPOINT 3 (AGENTE IA): Horários livres para visita em um imóvel
+
+    Uso: GET /api/agente/horarios-livres?imovel_id=1&dias=7
+
+    Query params:
+        - imovel_id: ID do imóvel (obrigatório)
+        - data: Data inicial (YYYY-MM-DD) - opcional (padrão: hoje)
+        - dias: Quantos dias à frente consultar (padrão: 7, máximo: 60)
+
+    Retorna: Horários em que uma visita completa cabe, já descontando
+    visitas agendadas e o horário de funcionamento
+    """
+    from datetime import datetime
+
+    imovel_id = request.args.get('imovel_id')
+    if not imovel_id:
+        return jsonify({
+            'success': False,
+            'error': 'Parâmetro "imovel_id" é obrigatório',
+            'instrucao_agente': 'Identifique qual imóvel o cliente quer visitar antes de consultar horários'
+        }), 400
+
+    try:
+        imovel_id = int(imovel_id)
+        dias = min(max(int(request.args.get('dias', 7)), 0), 60)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'imovel_id e dias devem ser números'
+        }), 400
+
+    data_param = request.args.get('data')
+    if data_param:
+        try:
+            data_inicio = ler_data(data_param)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Formato de data inválido. Use YYYY-MM-DD'
+            }), 400
+    else:
+        data_inicio = now_brasilia().date()
+
+    livres = db_leads.horarios_livres(imovel_id, data_inicio, dias)
+
+    return jsonify({
+        'success': True,
+        'imovel_id': imovel_id,
+        'duracao_visita_min': db_leads.obter_regras_agenda()['duracao_visita_min'],
+        'horarios_livres': livres,
+        'total_horarios': sum(len(horas) for horas in livres.values())
+    })
+
+@bp.route('/api/agente/proximos-horarios', methods=['GET'])
 @require_api_key
+def proximos_horarios_agente():
+    """
+    ENDPOINT 4 (AGENTE IA): Próximos N horários livres a partir de um instante
+
+    Uso: GET /api/agente/proximos-horarios?imovel_id=1&n=5&a_partir_de=2025-01-15T14:00
+
+    Query params:
+        - imovel_id: ID do imóvel, ou vários separados por vírgula (obrigatório)
+        - n: Quantidade de horários (padrão: 5, máximo: 50)
+        - a_partir_de: YYYY-MM-DD ou YYYY-MM-DDTHH:MM (padrão: agora)
+
+    Retorna: Horários livres em ordem cronológica (útil quando o horário
+    preferido do cliente está ocupado)
+    """
+    from datetime import datetime
+
+    imovel_param = request.args.get('imovel_id')
+    if not imovel_param:
+        return jsonify({
+            'success': False,
+            'error': 'Parâmetro "imovel_id" é obrigatório',
+            'instrucao_agente': 'Identifique qual imóvel o cliente quer visitar antes de consultar horários'
+        }), 400
+
+    try:
+        imovel_ids = [int(i) for i in imovel_param.split(',') if i.strip()]
+        n = min(max(int(request.args.get('n', 5)), 1), 50)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'imovel_id e n devem ser números'
+        }), 400
+
+    a_partir_param = request.args.get('a_partir_de')
+    if a_partir_param:
+        try:
+            a_partir_de = datetime.fromisoformat(a_partir_param)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Formato de a_partir_de inválido. Use YYYY-MM-DD ou YYYY-MM-DDTHH:MM'
+            }), 400
+    else:
+        a_partir_de = now_brasilia()
+
+    horarios = db_leads.proximos_horarios(imovel_ids, a_partir_de, n)
+
+    return jsonify({
+        'success': True,
+        'a_partir_de': a_partir_de.isoformat(),
+        'total': len(horarios),
+        'horarios': horarios,
+        'mensagem': f'{len(horarios)} horários livres encontrados' if horarios else 'Nenhum horário livre nos próximos 60 dias'
+    })
+
+@bp.route('/api/agente/agendar-visita', methods=['POST'])
+@require_api_key
+@retry_on_lock()
 def agendar_visita_agente():
     """
     ENDPOINT 2 (AGENTE IA): Agendar visita automaticamente
@@ -1533,17 +2126,33 @@ def agendar_visita_agente():
     # Limpar whatsapp
     whatsapp = str(dados['whatsapp']).replace('+', '').replace(' ', '').replace('-', '')
 
+    # Validar antes de gravar: a resposta usa a data/hora normalizadas
+    try:
+        data_visita = normalizar_data(dados['data_visita'])
+        hora_visita = normalizar_hora(dados['hora_visita'])
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'Data ou hora inválida. Use data YYYY-MM-DD e hora HH:MM',
+            'instrucao_agente': 'Confirme com o cliente a data e o horário da visita e chame novamente esta ferramenta'
+        }), 400
+
     # Criar agendamento (sem validar imóvel)
     resultado = db_leads.criar_agendamento(
         nome_cliente=dados['nome_cliente'],
         whatsapp=whatsapp,
         imovel_id=dados['imovel_id'],
-        data_visita=dados['data_visita'],
-        hora_visita=dados['hora_visita'],
+        data_visita=data_visita,
+        hora_visita=hora_visita,
         observacoes=dados.get('observacoes'),
         status='agendado'
     )
 
+    if resultado.get('conflito'):
+        # Horário ocupado: orientar o agente a oferecer as alternativas
+        resultado['instrucao_agente'] = 'Este horário já está ocupado para este imóvel. Ofereça ao cliente um dos horários em "alternativas" e chame novamente esta ferramenta com o horário escolhido'
+        return jsonify(resultado), 409
+
     if not resultado['success']:
         return jsonify(resultado), 400
 
@@ -1557,23 +2166,102 @@ def agendar_visita_agente():
     )
 
     # Resposta formatada
-    from datetime import datetime
-    data_obj = datetime.strptime(dados['data_visita'], '%Y-%m-%d')
-    data_formatada = data_obj.strftime('%d/%m/%Y')
+    data_formatada = ler_data(data_visita).strftime('%d/%m/%Y')
 
     return jsonify({
         'success': True,
         'agendamento_id': resultado['agendamento_id'],
-        'mensagem': f'Visita agendada com sucesso para {data_formatada} às {dados["hora_visita"]}',
+        'mensagem': f'Visita agendada com sucesso para {data_formatada} às {hora_visita}',
         'detalhes': {
             'cliente': dados['nome_cliente'],
             'whatsapp': whatsapp,
             'imovel_id': dados['imovel_id'],
             'data': data_formatada,
-            'hora': dados['hora_visita']
+            'hora': hora_visita
         }
     }), 201
 
+# ==================== APP ====================
+
+def create_app(config: Optional[Dict[str, Any]] = None) -> Flask:
+    """
+    Cria a aplicação Flask
+
+    Não faz I/O: banco, usuários e diretórios são criados na primeira
+    requisição de cada processo (ver Armazenamento) e o OAuth Google no
+    primeiro /auth/google ou /authorize. Essa primeira requisição também
+    dispara o aquecimento dos caches (WARMUP), que em `python app.py`
+    começa já no boot.
+
+    Args:
+        config: Sobrescreve app.config (ex: DB_PATH, DB_MAINTENANCE, WARMUP,
+                CATALOG_SNAPSHOT, OAUTH_CREDENTIALS_FILE)
+
+    Usage:
+        app = create_app({'DB_PATH': '/tmp/teste.db', 'DB_MAINTENANCE': False})
+    """
+    # /static é servido pelo blueprint (manifesto de assets), não pela rota padrão
+    app = Flask(__name__, static_folder=None)
+    CORS(app)
+
+    # Latência e contagem de requisições por rota (exportadas em /metrics)
+    init_metrics(app)
+
+    # Decomposição da latência por fase (header Server-Timing)
+    init_server_timing(app)
+
+    # Statements SQL e conexões por requisição (headers X-DB-* e métricas)
+    init_contagem_consultas(app)
+
+    # Spans por requisição gravados em data/traces.jsonl (formato OTLP/JSON)
+    init_tracing(app)
+
+    # Gravação do tráfego para replay (python replay.py) - opcional
+    if os.getenv('REQUEST_LOG'):
+        from replay import init_gravacao
+        init_gravacao(app, os.getenv('REQUEST_LOG'))
+
+    # Configurar secret key para sessões
+    app.secret_key = os.getenv('SECRET_KEY', secrets.token_hex(32))
+
+    # Configurações de sessão segura
+    app.config.update(
+        SESSION_COOKIE_SECURE=True if os.getenv('FLASK_ENV') == 'production' else False,
+        SESSION_COOKIE_HTTPONLY=True,
+        SESSION_COOKIE_SAMESITE='Lax',
+        PERMANENT_SESSION_LIFETIME=86400,  # 24 horas
+        DB_PATH=os.path.join(DATA_DIR, 'dashboard.db'),
+        DB_MAINTENANCE=os.getenv('DB_MAINTENANCE', '1') != '0',
+        WARMUP=os.getenv('WARMUP', '1') != '0',
+        CATALOG_SNAPSHOT=os.getenv('CATALOG_SNAPSHOT') or None,  # ex: data/catalogo.snap
+        OAUTH_CREDENTIALS_FILE=None  # None = config/oauth_credentials.json
+    )
+    app.config.update(config or {})
+
+    # Catálogo lido do snapshot compilado via mmap (python snapshot_catalogo.py)
+    if app.config['CATALOG_SNAPSHOT']:
+        app.extensions['snapshot_catalogo'] = SnapshotCatalogo(app.config['CATALOG_SNAPSHOT'])
+
+    app.extensions['armazenamento'] = Armazenamento(
+        app.config['DB_PATH'], manutencao=app.config['DB_MAINTENANCE']
+    )
+    app.extensions['prontidao'] = _criar_probe_prontidao()
+
+    # Caches carregados em segundo plano; /api/ready responde 503 até o fim
+    if app.config['WARMUP']:
+        aquecimento = Aquecimento(envolver=app.app_context)
+        aquecimento.registrar('catalogo', _aquecer_catalogo)
+        aquecimento.registrar('banco', lambda: db_leads.aquecer_cache())
+        aquecimento.registrar('estatisticas', _aquecer_estatisticas)
+        aquecimento.registrar('assets', manifesto_assets.construir)
+        app.extensions['aquecimento'] = aquecimento
+
+    app.register_blueprint(bp)
+    return app
+
+
+app = create_app()
+
 # ==================== RUN ====================
 
 if __name__ == '__main__':
@@ -1583,4 +2271,6 @@ if __name__ == '__main__':
     print(f"🔑 API Key: {API_KEY}")
     print(f"🌐 Porta: {port}")
     print("=" * 60)
+    if 'aquecimento' in app.extensions:
+        app.extensions['aquecimento'].iniciar()
     app.run(host='0.0.0.0', port=port, debug=True)
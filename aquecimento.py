@@ -0,0 +1,114 @@
+"""
+Aquecimento do Boot
+Pré-carrega catálogo, FAQs/links, page cache do SQLite e estatísticas
+numa thread logo após o boot; /api/ready fica indisponível até concluir
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+warmup_duration_seconds = metrics.histogram(
+    'warmup_duration_seconds', 'Duração das tarefas de aquecimento', ('tarefa',),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0)
+)
+
+# Cada tarefa retorna detalhes para o relatório (ex: itens carregados)
+Tarefa = Callable[[], Any]
+
+
+class Aquecimento:
+    """
+    Executa as tarefas registradas uma vez por processo, em segundo plano
+
+    Falha de uma tarefa não impede as demais nem trava a prontidão: o erro
+    fica no relatório e a instância passa a atender com o cache frio.
+
+    Usage:
+        aquecimento = Aquecimento()
+        aquecimento.registrar('catalogo', carregar_catalogo)
+        aquecimento.iniciar()
+        aquecimento.concluido  # False até todas as tarefas rodarem
+    """
+
+    def __init__(self, envolver: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            envolver: Fábrica de context manager aberto em volta das tarefas
+                      (ex: app.app_context)
+        """
+        self.envolver = envolver
+        self._tarefas: List[Tuple[str, Tarefa]] = []
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._concluido = threading.Event()
+        self._inicio: Optional[float] = None
+        self._fim: Optional[float] = None
+        self.resultados: Dict[str, Dict[str, Any]] = {}
+
+    def registrar(self, nome: str, tarefa: Tarefa) -> None:
+        self._tarefas.append((nome, tarefa))
+
+    def iniciar(self) -> bool:
+        """Dispara a thread (uma vez por processo); True se disparou agora"""
+        if self._pid == os.getpid():
+            return False
+        with self._lock:
+            if self._pid == os.getpid():
+                return False
+            self._pid = os.getpid()
+            self._concluido = threading.Event()
+            self.resultados = {}
+            self._inicio, self._fim = time.monotonic(), None
+            threading.Thread(target=self._executar, name='aquecimento', daemon=True).start()
+            return True
+
+    def _executar(self) -> None:
+        try:
+            if self.envolver is None:
+                self.executar_tarefas()
+            else:
+                with self.envolver():
+                    self.executar_tarefas()
+        finally:
+            self._fim = time.monotonic()
+            self._concluido.set()
+
+    def executar_tarefas(self) -> None:
+        for nome, tarefa in self._tarefas:
+            inicio = time.perf_counter()
+            try:
+                detalhes = tarefa()
+                resultado = {'ok': True, 'detalhes': detalhes}
+            except Exception as e:
+                logger.warning(f"Aquecimento '{nome}' falhou: {e}")
+                resultado = {'ok': False, 'erro': f"{type(e).__name__}: {e}"}
+            duracao = time.perf_counter() - inicio
+            warmup_duration_seconds.observe(duracao, tarefa=nome)
+            resultado['duracao_ms'] = round(duracao * 1000, 2)
+            self.resultados[nome] = resultado
+
+    def aguardar(self, timeout: Optional[float] = None) -> bool:
+        return self._concluido.wait(timeout)
+
+    @property
+    def iniciado(self) -> bool:
+        return self._pid == os.getpid()
+
+    @property
+    def concluido(self) -> bool:
+        return self.iniciado and self._concluido.is_set()
+
+    def estado(self) -> Dict[str, Any]:
+        if not self.iniciado:
+            return {'estado': 'pendente'}
+        return {
+            'estado': 'concluido' if self._concluido.is_set() else 'executando',
+            'segundos': round((self._fim or time.monotonic()) - self._inicio, 2),
+            'tarefas': dict(self.resultados)
+        }
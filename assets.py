@@ -0,0 +1,238 @@
+"""
+Pipeline de Assets Estáticos
+Manifesto montado uma vez por processo: hash do conteúdo de cada arquivo
+de static/, URLs com o hash no nome (/static/app.3f9c2a1b7d4e.js), HTML
+com as referências reescritas e variantes gzip/brotli pré-comprimidas
+
+Brotli é opcional: sem o pacote `brotli` instalado só gzip é gerado.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from memoria import memoria
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+DIRETORIO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Abaixo disso o ganho da compressão não paga o header extra
+MINIMO_COMPRESSAO = 1024
+
+TIPOS_COMPRIMIVEIS = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# src="/static/arquivo" ou href='/static/arquivo?v=123' (query antiga é descartada)
+REFERENCIA = re.compile(r'''(?P<abre>(?:src|href)\s*=\s*["'])/static/(?P<nome>[^"'?#]+)(?:\?[^"'#]*)?''')
+
+assets_respostas_total = metrics.counter(
+    'assets_respostas_total', 'Assets estáticos servidos pelo manifesto', ('codificacao',)
+)
+
+
+class Asset:
+    """Conteúdo de um arquivo em memória, com hash e variantes comprimidas"""
+
+    __slots__ = ('nome', 'conteudo', 'hash', 'versao', 'mimetype', 'variantes')
+
+    def __init__(self, nome: str, conteudo: bytes, versao: Tuple[int, int] = (0, 0)):
+        self.nome = nome
+        self.conteudo = conteudo
+        self.hash = hashlib.sha256(conteudo).hexdigest()[:12]
+        self.versao = versao
+        self.mimetype = mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+        self.variantes = _comprimir(conteudo, self.mimetype)
+
+    @property
+    def nome_hash(self) -> str:
+        """app.js -> app.3f9c2a1b7d4e.js"""
+        raiz, ext = os.path.splitext(self.nome)
+        return f"{raiz}.{self.hash}{ext}"
+
+    @property
+    def url(self) -> str:
+        return f"/static/{self.nome_hash}"
+
+    @property
+    def codificacoes(self) -> List[str]:
+        return list(self.variantes)
+
+    def variante(self, aceitas: Iterable[str]) -> Tuple[Optional[str], bytes]:
+        """
+        Melhor variante entre as codificações aceitas pelo cliente
+
+        Returns:
+            (codificação ou None para o original, corpo)
+        """
+        aceitas = set(aceitas)
+        for codificacao in ('br', 'gzip'):
+            if codificacao in aceitas and codificacao in self.variantes:
+                return codificacao, self.variantes[codificacao]
+        return None, self.conteudo
+
+    def tamanho(self) -> int:
+        return len(self.conteudo) + sum(len(corpo) for corpo in self.variantes.values())
+
+
+def _comprimir(conteudo: bytes, mimetype: str) -> Dict[str, bytes]:
+    if len(conteudo) < MINIMO_COMPRESSAO or not mimetype.startswith(TIPOS_COMPRIMIVEIS):
+        return {}
+    variantes = {}
+    if brotli is not None:
+        variantes['br'] = brotli.compress(conteudo, quality=11)
+    # mtime=0: mesmo conteúdo gera sempre os mesmos bytes
+    variantes['gzip'] = gzip.compress(conteudo, compresslevel=9, mtime=0)
+    return {codificacao: corpo for codificacao, corpo in variantes.items() if len(corpo) < len(conteudo)}
+
+
+class ManifestoAssets:
+    """
+    Arquivos de static/ em memória, indexados pelo nome e pelo nome com hash
+
+    A URL com hash muda junto com o conteúdo, então pode ser servida com
+    `Cache-Control: immutable`; o HTML (que aponta para essas URLs) é
+    revalidado por ETag. Cada arquivo guarda mtime/tamanho: editar um
+    asset em disco gera hash novo na próxima leitura, sem reiniciar.
+
+    Usage:
+        manifesto = ManifestoAssets('static')
+        manifesto.url('app.js')          # /static/app.3f9c2a1b7d4e.js
+        manifesto.html('index.html')     # Asset com as referências reescritas
+        manifesto.por_url('app.3f9c2a1b7d4e.js')
+    """
+
+    def __init__(self, diretorio: str = DIRETORIO_PADRAO):
+        self.diretorio = diretorio
+        self._assets: Dict[str, Asset] = {}
+        self._por_hash: Dict[str, Asset] = {}
+        # nome -> ((hash da fonte, ((referência, url), ...)), HTML renderizado)
+        self._html: Dict[str, Tuple[Tuple[str, Tuple[Tuple[str, str], ...]], Asset]] = {}
+        self._construido = False
+        self._lock = threading.RLock()
+
+    def construir(self) -> Dict[str, Any]:
+        """Lê, faz o hash e comprime todos os arquivos (recomeça do zero)"""
+        assets = {}
+        for pasta, _, arquivos in os.walk(self.diretorio):
+            for arquivo in sorted(arquivos):
+                caminho = os.path.join(pasta, arquivo)
+                nome = os.path.relpath(caminho, self.diretorio).replace(os.sep, '/')
+                asset = _carregar(caminho, nome)
+                if asset is not None:
+                    assets[nome] = asset
+        with self._lock:
+            self._assets = assets
+            self._por_hash = {asset.nome_hash: asset for asset in assets.values()}
+            self._html = {}
+            self._construido = True
+        return self.estatisticas()
+
+    def _garantir(self) -> None:
+        if not self._construido:
+            with self._lock:
+                if not self._construido:
+                    self.construir()
+
+    def asset(self, nome: str) -> Optional[Asset]:
+        """Asset pelo nome original, recarregado se o arquivo mudou"""
+        self._garantir()
+        atual = self._assets.get(nome)
+        if atual is None:
+            return None
+
+        caminho = os.path.join(self.diretorio, nome)
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            with self._lock:
+                self._assets.pop(nome, None)
+                self._por_hash.pop(atual.nome_hash, None)
+            return None
+        if atual.versao == (info.st_mtime_ns, info.st_size):
+            return atual
+
+        novo = _carregar(caminho, nome)
+        if novo is None:
+            return None
+        with self._lock:
+            self._assets[nome] = novo
+            self._por_hash.pop(atual.nome_hash, None)
+            self._por_hash[novo.nome_hash] = novo
+        return novo
+
+    def por_url(self, nome_hash: str) -> Optional[Asset]:
+        """Asset pelo nome com hash (app.3f9c2a1b7d4e.js)"""
+        self._garantir()
+        return self._por_hash.get(nome_hash)
+
+    def url(self, nome: str) -> str:
+        asset = self.asset(nome)
+        return asset.url if asset is not None else f"/static/{nome}"
+
+    def html(self, nome: str) -> Optional[Asset]:
+        """
+        HTML com cada /static/<arquivo>[?v=...] trocado pela URL com hash
+
+        O resultado fica em memória até o HTML ou algum asset referenciado
+        mudar de hash.
+        """
+        fonte = self.asset(nome)
+        if fonte is None:
+            return None
+
+        entrada = self._html.get(nome)
+        if entrada is not None:
+            chave, renderizado = entrada
+            referencias = tuple((ref, self.url(ref)) for ref, _ in chave[1])
+            if chave == (fonte.hash, referencias):
+                return renderizado
+
+        referencias = []
+
+        def reescrever(m: re.Match) -> str:
+            url = self.url(m.group('nome'))
+            referencias.append((m.group('nome'), url))
+            return m.group('abre') + url
+
+        texto = REFERENCIA.sub(reescrever, fonte.conteudo.decode('utf-8'))
+        renderizado = Asset(nome, texto.encode('utf-8'), fonte.versao)
+        with self._lock:
+            self._html[nome] = ((fonte.hash, tuple(referencias)), renderizado)
+        return renderizado
+
+    def estatisticas(self) -> Dict[str, Any]:
+        assets = list(self._assets.values())
+        originais = sum(len(asset.conteudo) for asset in assets)
+        return {
+            'arquivos': len(assets),
+            'bytes': originais,
+            'bytes_comprimidos': sum(asset.tamanho() for asset in assets) - originais,
+            'brotli': brotli is not None
+        }
+
+    def copiar_entradas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'assets': dict(self._assets), 'html': {nome: html for nome, (_, html) in self._html.items()}}
+
+
+def _carregar(caminho: str, nome: str) -> Optional[Asset]:
+    try:
+        with open(caminho, 'rb') as f:
+            info = os.fstat(f.fileno())
+            conteudo = f.read()
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+    return Asset(nome, conteudo, (info.st_mtime_ns, info.st_size))
+
+
+# Instância global (static/ ao lado deste módulo)
+manifesto_assets = ManifestoAssets()
+
+memoria.registrar('assets.manifesto', manifesto_assets.copiar_entradas)
@@ -8,8 +8,10 @@ def login_required(f):
     """
     Decorator para proteger rotas que requerem autenticação E aprovação
 
+    Redireciona para as rotas do blueprint `dashboard` (app.py).
+
     Usage:
-        @app.route('/dashboard')
+        @bp.route('/dashboard')
         @login_required
         def dashboard():
             return render_template('dashboard.html')
@@ -23,7 +25,7 @@ def login_required(f):
                 return jsonify({'error': 'Não autenticado'}), 401
 
             # Se for página web, redireciona para login
-            return redirect(url_for('login'))
+            return redirect(url_for('dashboard.login'))
 
         # Verifica se usuário foi aprovado
         user = session['user']
@@ -33,7 +35,7 @@ def login_required(f):
                 return jsonify({'error': 'Usuário aguardando aprovação do administrador'}), 403
 
             # Se for web, redireciona para página de espera
-            return redirect(url_for('aguardando_aprovacao'))
+            return redirect(url_for('dashboard.aguardando_aprovacao'))
 
         return f(*args, **kwargs)
 
@@ -45,7 +47,7 @@ def admin_required(f):
     Decorator para rotas que requerem permissão de admin
 
     Usage:
-        @app.route('/admin')
+        @bp.route('/admin')
         @admin_required
         def admin_panel():
             return render_template('admin.html')
@@ -56,7 +58,7 @@ def admin_required(f):
             # Se for API, retorna JSON
             if request.path.startswith('/api/'):
                 return jsonify({'error': 'Não autenticado'}), 401
-            return redirect(url_for('login'))
+            return redirect(url_for('dashboard.login'))
 
         # Verifica se usuário é admin
         user = session['user']
@@ -64,7 +66,7 @@ def admin_required(f):
             # Se for API, retorna JSON
             if request.path.startswith('/api/'):
                 return jsonify({'error': 'Permissão negada - apenas administradores'}), 403
-            return redirect(url_for('index'))
+            return redirect(url_for('dashboard.index'))
 
         return f(*args, **kwargs)
 
@@ -1,23 +1,31 @@
 """
 Configuração OAuth 2.0 com Google usando Authlib
 """
-from authlib.integrations.flask_client import OAuth
 from flask import Flask
 import json
 from pathlib import Path
+from typing import Optional
 
-def init_oauth(app: Flask):
+CREDENCIAIS_PADRAO = Path(__file__).parent.parent / 'config' / 'oauth_credentials.json'
+
+def init_oauth(app: Flask, config_path: Optional[str] = None):
     """
     Inicializa OAuth com credenciais Google
 
+    Chamado no primeiro uso do login (ver create_app): o import do Authlib
+    e a leitura das credenciais ficam fora do boot do worker.
+
     Args:
         app: Instância Flask
+        config_path: JSON de credenciais (padrão: config/oauth_credentials.json)
 
     Returns:
         Cliente OAuth configurado para Google
     """
+    from authlib.integrations.flask_client import OAuth
+
     # Carregar credenciais OAuth
-    config_path = Path(__file__).parent.parent / 'config' / 'oauth_credentials.json'
+    config_path = config_path or CREDENCIAIS_PADRAO
 
     with open(config_path, 'r') as f:
         credentials = json.load(f)['web']
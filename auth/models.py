@@ -4,6 +4,8 @@ Models de usuário para autenticação
 from datetime import datetime
 from typing import Optional, Dict, Any
 
+from database import eh_erro_de_lock, retry_on_db_lock
+
 class UserModel:
     """
     Classe para gerenciar usuários OAuth no banco de dados
@@ -14,50 +16,10 @@ class UserModel:
         Args:
             db: Instância LeadsDatabase
         """
+        # Tabela users vem das migrações do LeadsDatabase (migracoes.py)
         self.db = db
-        self._criar_tabela_users()
-
-    def _criar_tabela_users(self):
-        """Cria tabela de usuários se não existir"""
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                google_id TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                name TEXT,
-                picture TEXT,
-                access_token TEXT,
-                refresh_token TEXT,
-                token_expires_at TIMESTAMP,
-                approved INTEGER DEFAULT 0,
-                is_admin INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP
-            )
-        """)
-
-        # Adicionar colunas se não existirem (migração) - ANTES dos índices
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN approved INTEGER DEFAULT 0")
-        except:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER DEFAULT 0")
-        except:
-            pass
-
-        # Índices (depois das colunas existirem)
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_google_id ON users(google_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_email ON users(email)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_approved ON users(approved)")
-
-        conn.commit()
-        conn.close()
 
+    @retry_on_db_lock()
     def criar_ou_atualizar(self, user_info: Dict[str, Any], token: Dict[str, Any]) -> Dict[str, Any]:
         """
         Cria novo usuário ou atualiza existente
@@ -88,6 +50,8 @@ class UserModel:
         approved = 1 if is_admin else 0  # Admin sempre aprovado
 
         try:
+            cursor.execute("BEGIN IMMEDIATE")
+
             # Tenta atualizar
             cursor.execute("""
                 UPDATE users
@@ -125,6 +89,9 @@ class UserModel:
             }
 
         except Exception as e:
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
             return {
                 'success': False,
                 'error': str(e)
@@ -134,7 +101,7 @@ class UserModel:
 
     def buscar_por_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Busca usuário por email"""
-        conn = self.db._get_connection()
+        conn = self.db._get_leitura()
         cursor = conn.cursor()
 
         cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
@@ -145,7 +112,7 @@ class UserModel:
 
     def buscar_por_google_id(self, google_id: str) -> Optional[Dict[str, Any]]:
         """Busca usuário por Google ID"""
-        conn = self.db._get_connection()
+        conn = self.db._get_leitura()
         cursor = conn.cursor()
 
         cursor.execute("SELECT * FROM users WHERE google_id = ?", (google_id,))
@@ -156,7 +123,7 @@ class UserModel:
 
     def listar_todos(self) -> list:
         """Lista todos os usuários"""
-        conn = self.db._get_connection()
+        conn = self.db._get_leitura()
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -172,7 +139,7 @@ class UserModel:
 
     def listar_pendentes(self) -> list:
         """Lista usuários aguardando aprovação"""
-        conn = self.db._get_connection()
+        conn = self.db._get_leitura()
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -187,12 +154,14 @@ class UserModel:
         conn.close()
         return users
 
+    @retry_on_db_lock()
     def aprovar_usuario(self, user_id: int) -> Dict[str, Any]:
         """Aprova um usuário"""
         conn = self.db._get_connection()
         cursor = conn.cursor()
 
         try:
+            cursor.execute("BEGIN IMMEDIATE")
             cursor.execute("UPDATE users SET approved = 1 WHERE id = ?", (user_id,))
             conn.commit()
 
@@ -202,16 +171,21 @@ class UserModel:
             return {'success': True, 'message': 'Usuário aprovado'}
 
         except Exception as e:
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
             return {'success': False, 'error': str(e)}
         finally:
             conn.close()
 
+    @retry_on_db_lock()
     def revogar_usuario(self, user_id: int) -> Dict[str, Any]:
         """Revoga aprovação de um usuário"""
         conn = self.db._get_connection()
         cursor = conn.cursor()
 
         try:
+            cursor.execute("BEGIN IMMEDIATE")
             cursor.execute("UPDATE users SET approved = 0 WHERE id = ? AND is_admin = 0", (user_id,))
             conn.commit()
 
@@ -221,6 +195,9 @@ class UserModel:
             return {'success': True, 'message': 'Aprovação revogada'}
 
         except Exception as e:
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
             return {'success': False, 'error': str(e)}
         finally:
             conn.close()
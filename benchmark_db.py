@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Benchmark do LeadsDatabase
+Mede ops/s e percentis de latência dos métodos públicos em vários tamanhos
+de banco, grava baseline JSON e falha quando algum método regride além do
+orçamento
+
+Uso:
+    python benchmark_db.py --tamanhos 1000,10000 --salvar baseline_db.json
+    python benchmark_db.py --tamanhos 1000,10000 --baseline baseline_db.json --orcamento 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+from database import LeadsDatabase
+from gerar_dados import gerar, whatsapp_do_lead
+from replay import percentil
+
+# Métrica comparada com o baseline (latência em ms)
+METRICA_PADRAO = 'p50_ms'
+
+Caso = Callable[[LeadsDatabase, int], Any]
+
+
+def casos(leads: int) -> Dict[str, Caso]:
+    """
+    Operações medidas; cada uma recebe o banco e o número da iteração
+
+    Escritas usam whatsapps distintos por iteração para medir sempre o
+    mesmo caminho (criação nunca vira atualização, deleção sempre acha o lead).
+    """
+    rng = random.Random(0)
+
+    def existente(_: int) -> str:
+        return whatsapp_do_lead(rng.randrange(leads))
+
+    return {
+        'registrar_lead.criar': lambda db, i: db.registrar_lead(
+            f"55119{i:08d}", "Bench Criar", 1, 10, False),
+        'registrar_lead.atualizar': lambda db, i: db.registrar_lead(
+            existente(i), "Bench Atualizar", 1, 1 + i % 100, False),
+        'buscar_lead': lambda db, i: db.buscar_lead(existente(i)),
+        'listar_leads': lambda db, i: db.listar_leads(),
+        'listar_leads.score_min': lambda db, i: db.listar_leads({'score_min': 90}),
+        'listar_leads.score_max': lambda db, i: db.listar_leads({'score_max': 5}),
+        'listar_leads.imovel_id': lambda db, i: db.listar_leads({'imovel_id': 1 + i % 10}),
+        'listar_leads.agendou_visita': lambda db, i: db.listar_leads({'agendou_visita': True}),
+        'obter_estatisticas': lambda db, i: db.obter_estatisticas(),
+        'obter_historico': lambda db, i: db.obter_historico(existente(i)),
+        'listar_agendamentos': lambda db, i: db.listar_agendamentos(limite=100),
+        'listar_agendamentos.periodo': lambda db, i: db.listar_agendamentos(
+            {'data_inicio': '2025-03-01', 'data_fim': '2025-03-07'}),
+        'listar_agendamentos.imovel': lambda db, i: db.listar_agendamentos(
+            {'imovel_id': 1 + i % 10, 'data_inicio': '2025-03-01', 'data_fim': '2025-03-31'}),
+        'obter_estatisticas_agenda': lambda db, i: db.obter_estatisticas_agenda(),
+        'deletar_lead': lambda db, i: db.deletar_lead(whatsapp_do_lead(leads - 1 - i)),
+    }
+
+
+def medir(funcao: Callable[[int], Any], tempo_max: float, iteracoes_max: int,
+          aquecimento: int = 3) -> Dict[str, Any]:
+    """Executa até `tempo_max` segundos ou `iteracoes_max` vezes"""
+    for i in range(aquecimento):
+        funcao(-1 - i)
+
+    latencias: List[float] = []
+    inicio = time.perf_counter()
+    while len(latencias) < iteracoes_max and time.perf_counter() - inicio < tempo_max:
+        t0 = time.perf_counter()
+        funcao(len(latencias))
+        latencias.append(time.perf_counter() - t0)
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'iteracoes': len(latencias),
+        'ops_s': round(len(latencias) / total, 1) if total else None,
+        'p50_ms': round(percentil(latencias, 50) * 1000, 4),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 4),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 4),
+        'max_ms': round(latencias[-1] * 1000, 4)
+    }
+
+
+def executar(tamanhos: List[int], tempo_max: float = 1.0, iteracoes_max: int = 500,
+             filtro: Optional[str] = None, diretorio: Optional[str] = None, log=print) -> Dict[str, Any]:
+    """
+    Roda todos os casos em um banco gerado para cada tamanho
+
+    Cada caso usa uma cópia nova do banco gerado (escritas de um caso não
+    alteram as medições do seguinte).
+    """
+    temporario = None if diretorio else tempfile.TemporaryDirectory(prefix='bench_db_')
+    base = diretorio or temporario.name
+    try:
+        resultados = _executar_tamanhos(base, tamanhos, tempo_max, iteracoes_max, filtro, log)
+    finally:
+        if temporario:
+            temporario.cleanup()
+
+    return {
+        'meta': {
+            'data': date.today().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'tempo_max_s': tempo_max,
+            'iteracoes_max': iteracoes_max
+        },
+        'resultados': resultados
+    }
+
+
+def _executar_tamanhos(base: str, tamanhos: List[int], tempo_max: float, iteracoes_max: int,
+                       filtro: Optional[str], log) -> Dict[str, Dict[str, Any]]:
+    resultados: Dict[str, Dict[str, Any]] = {}
+
+    for tamanho in tamanhos:
+        origem = os.path.join(base, f"leads_{tamanho}")
+        if not os.path.exists(os.path.join(origem, 'dashboard.db')):
+            log(f"Gerando {tamanho} leads...")
+            gerar(origem, leads=tamanho, agendamentos=max(tamanho // 5, 10), imoveis=50,
+                  dias=365, log=lambda *_: None)
+
+        resultados[str(tamanho)] = {}
+        for nome, caso in casos(tamanho).items():
+            if filtro and filtro not in nome:
+                continue
+            caminho = os.path.join(base, f"caso_{tamanho}.db")
+            _copiar_banco(os.path.join(origem, 'dashboard.db'), caminho)
+            db = LeadsDatabase(caminho)
+
+            # Deleções consomem leads: limita às linhas existentes
+            limite = min(iteracoes_max, tamanho - 10) if nome == 'deletar_lead' else iteracoes_max
+            resultado = medir(lambda i: caso(db, i), tempo_max, limite)
+            resultados[str(tamanho)][nome] = resultado
+            log(f"  [{tamanho:>8}] {nome:<32} {resultado['ops_s']:>10} ops/s  "
+                f"p50 {resultado['p50_ms']:.3f}ms  p99 {resultado['p99_ms']:.3f}ms")
+
+    return resultados
+
+
+def _copiar_banco(origem: str, destino: str) -> None:
+    """Cópia consistente via backup API (inclui o que estiver no WAL)"""
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(destino + sufixo):
+            os.remove(destino + sufixo)
+    fonte = sqlite3.connect(origem)
+    alvo = sqlite3.connect(destino)
+    fonte.backup(alvo)
+    alvo.close()
+    fonte.close()
+
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], orcamento: float,
+             metrica: str = METRICA_PADRAO) -> List[Dict[str, Any]]:
+    """
+    Casos cuja métrica piorou além do orçamento
+
+    O baseline pode ter "orcamentos": {"caso": 0.5} para sobrescrever o
+    orçamento global de casos mais ruidosos.
+    """
+    especificos = baseline.get('orcamentos', {})
+    regressoes = []
+
+    for tamanho, casos_atuais in atual['resultados'].items():
+        for nome, resultado in casos_atuais.items():
+            referencia = baseline.get('resultados', {}).get(tamanho, {}).get(nome)
+            if not referencia or not referencia.get(metrica):
+                continue
+            limite = especificos.get(nome, orcamento)
+            variacao = resultado[metrica] / referencia[metrica] - 1
+            if variacao > limite:
+                regressoes.append({
+                    'tamanho': int(tamanho),
+                    'caso': nome,
+                    'metrica': metrica,
+                    'baseline': referencia[metrica],
+                    'atual': resultado[metrica],
+                    'variacao_pct': round(variacao * 100, 1),
+                    'orcamento_pct': round(limite * 100, 1)
+                })
+    return regressoes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark do LeadsDatabase com orçamento de regressão')
+    parser.add_argument('--tamanhos', default='1000,10000', help='Quantidades de leads (separadas por vírgula)')
+    parser.add_argument('--tempo', type=float, default=1.0, help='Segundos máximos por caso')
+    parser.add_argument('--iteracoes', type=int, default=500, help='Iterações máximas por caso')
+    parser.add_argument('--filtro', help='Só casos cujo nome contém este texto')
+    parser.add_argument('--dados', help='Diretório para reaproveitar bancos gerados entre execuções')
+    parser.add_argument('--salvar', help='Grava o resultado como baseline JSON')
+    parser.add_argument('--baseline', help='Compara com este baseline e falha se regredir')
+    parser.add_argument('--orcamento', type=float, default=0.25,
+                        help='Piora máxima tolerada (0.25 = 25%%)')
+    parser.add_argument('--metrica', default=METRICA_PADRAO, choices=['p50_ms', 'p95_ms', 'p99_ms'])
+    args = parser.parse_args(argv)
+
+    tamanhos = [int(t) for t in args.tamanhos.split(',') if t.strip()]
+    resultado = executar(tamanhos, args.tempo, args.iteracoes, args.filtro, args.dados)
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"Baseline gravado em {args.salvar}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressoes = comparar(resultado, baseline, args.orcamento, args.metrica)
+        if regressoes:
+            print(json.dumps({'regressoes': regressoes}, ensure_ascii=False, indent=2))
+            return 1
+        print(f"Sem regressões acima de {args.orcamento:.0%} em {args.metrica}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Cache dos Arquivos do Catálogo
+INDICE.json, FAQ.txt e links.json em memória, revalidados por mtime e
+tamanho a cada leitura (um stat em vez de open + parse)
+"""
+import copy
+import json
+import os
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from memoria import memoria
+from metrics import metrics
+
+_AUSENTE = object()
+
+catalogo_cache_total = metrics.counter(
+    'catalogo_cache_total', 'Leituras de arquivos do catálogo pelo cache', ('resultado',)
+)
+
+
+class CacheArquivos:
+    """
+    Conteúdo já decodificado de arquivos pequenos, por caminho
+
+    Uma escrita no arquivo (salvar_indice, edição do FAQ, deploy de um
+    INDICE.json novo) muda mtime/tamanho e a próxima leitura recarrega;
+    não há invalidação manual. O objeto devolvido é compartilhado entre
+    requisições: quem for alterar pede `copia=True`.
+
+    Usage:
+        cache = CacheArquivos()
+        indice = cache.ler_json('data/INDICE.json', padrao={'imoveis': []})
+    """
+
+    def __init__(self):
+        self._entradas: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+        self._lock = Lock()
+
+    def _ler(self, caminho: str, carregar: Callable[[str], Any]) -> Any:
+        """Conteúdo decodificado ou _AUSENTE se o arquivo não existe"""
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            with self._lock:
+                self._entradas.pop(caminho, None)
+            return _AUSENTE
+
+        versao = (info.st_mtime_ns, info.st_size)
+        with self._lock:
+            entrada = self._entradas.get(caminho)
+        if entrada is not None and entrada[0] == versao:
+            catalogo_cache_total.inc(resultado='hit')
+            return entrada[1]
+
+        catalogo_cache_total.inc(resultado='miss')
+        conteudo = carregar(caminho)
+        with self._lock:
+            self._entradas[caminho] = (versao, conteudo)
+        return conteudo
+
+    def ler_json(self, caminho: str, padrao: Any = None, copia: bool = False) -> Any:
+        conteudo = self._ler(caminho, _carregar_json)
+        if conteudo is _AUSENTE:
+            return copy.deepcopy(padrao)
+        return copy.deepcopy(conteudo) if copia else conteudo
+
+    def ler_texto(self, caminho: str, padrao: Optional[str] = None) -> Optional[str]:
+        conteudo = self._ler(caminho, _carregar_texto)
+        return padrao if conteudo is _AUSENTE else conteudo
+
+    def copiar_entradas(self) -> Dict[str, Tuple[Tuple[int, int], Any]]:
+        with self._lock:
+            return dict(self._entradas)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+def _carregar_json(caminho: str) -> Any:
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _carregar_texto(caminho: str) -> str:
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+# Instância global (compartilhada entre requisições)
+cache_arquivos = CacheArquivos()
+
+memoria.registrar('catalogo.arquivos', cache_arquivos.copiar_entradas)
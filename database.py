@@ -2,173 +2,390 @@
 Sistema de Banco de Dados para Leads
 Gerencia score, histórico e agendamentos
 """
+import os
+import copy
+import math
+import random
 import sqlite3
 import time
+import json
+import heapq
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import wraps
-from datetime import datetime, timezone, timedelta
-from typing import Optional, List, Dict, Any, Callable
+from threading import Lock
+from datetime import datetime, date, timezone, timedelta
+from typing import Optional, List, Dict, Any, Callable, Iterator, Tuple
 from pathlib import Path
 
+import timing
+from metrics import metrics
+from tracing import rastrear_metodos
+from query_stats import ConexaoInstrumentada
+from pool_leitura import TAMANHO_POOL, PoolLeitura
+from migracoes import VERSAO_ATUAL, migrar, versao_schema
+from disponibilidade import (
+    CHAVE_REGRAS, GradeAgenda, validar_regras, bitmap_para_blob, blob_para_bitmap
+)
+
+# Índices e tabelas lidos por aquecer_cache (rotas do agente e do dashboard)
+INDICES_QUENTES = (
+    ('leads', 'idx_whatsapp'),
+    ('leads', 'idx_score'),
+    ('leads', 'idx_imovel'),
+    ('agendamentos', 'idx_agendamentos_data_hora'),
+    ('agendamentos', 'idx_agendamentos_imovel_data'),
+)
+TABELAS_QUENTES = (
+    ('leads', 'nome'),
+    ('agendamentos', 'nome_cliente'),
+    ('agenda_slots', 'ocupados'),
+    ('agenda_ocupacao', 'status'),
+)
+
 # Fuso horário de Brasília (UTC-3)
 BRASILIA_TZ = timezone(timedelta(hours=-3))
 
+# Colunas da tabela agendamentos (whitelist para projeção em listar_agendamentos)
+COLUNAS_AGENDAMENTO = (
+    'id', 'nome_cliente', 'whatsapp', 'imovel_id', 'data_visita', 'hora_visita',
+    'status', 'observacoes', 'criado_em', 'atualizado_em'
+)
+
 def now_brasilia():
     """Retorna datetime atual no horário de Brasília (sem timezone para evitar conversão no frontend)"""
     # Retorna datetime "naive" no horário de Brasília (sem info de timezone)
     return datetime.now(BRASILIA_TZ).replace(tzinfo=None)
 
 
-def retry_on_db_lock(max_retries: int = 3, backoff_ms: int = 100) -> Callable:
+def normalizar_hora(hora: str) -> str:
+    """
+    Normaliza horário para o formato HH:MM
+
+    Aceita "9:00", "09:00" e "09:00:00". Levanta ValueError se inválido.
+    """
+    partes = str(hora).strip().split(':')
+    if len(partes) not in (2, 3):
+        raise ValueError("Formato de hora inválido. Use HH:MM")
+
+    try:
+        h, m = int(partes[0]), int(partes[1])
+    except ValueError:
+        raise ValueError("Formato de hora inválido. Use HH:MM")
+
+    if not (0 <= h < 24 and 0 <= m < 60):
+        raise ValueError("Formato de hora inválido. Use HH:MM")
+
+    return f"{h:02d}:{m:02d}"
+
+
+def ler_data(data: str) -> date:
+    """
+    Data da API (agenda e agendamentos), numa única gramática
+
+    Aceita o que date.fromisoformat aceita (no Python 3.11+ também
+    "20990310" e "2099-W10-2"). Levanta ValueError se inválido.
+    """
+    return date.fromisoformat(str(data).strip())
+
+
+def normalizar_data(data: str) -> str:
+    """
+    Normaliza data para o formato YYYY-MM-DD (ver ler_data)
+
+    O valor gravado é sempre YYYY-MM-DD, o formato comparado pelo
+    conflito, pelas consultas por período e pelas chaves de
+    agenda_slots/agenda_ocupacao.
+    """
+    return ler_data(data).isoformat()
+
+
+def hora_para_minutos(hora: str) -> int:
+    """Converte "HH:MM" em minutos desde 00:00"""
+    h, m = normalizar_hora(hora).split(':')
+    return int(h) * 60 + int(m)
+
+
+# Política de contenção das escritas (ver retry_on_db_lock)
+RETRY_MAX_TENTATIVAS = int(os.getenv('DB_RETRY_MAX', '8'))
+RETRY_BACKOFF_MS = float(os.getenv('DB_RETRY_BACKOFF_MS', '25'))
+RETRY_BACKOFF_MAX_MS = float(os.getenv('DB_RETRY_BACKOFF_MAX_MS', '1000'))
+PRAZO_ESCRITA_S = float(os.getenv('DB_WRITE_DEADLINE_S', '5'))
+
+# Timeout padrão das conexões (busy handler do SQLite)
+TIMEOUT_CONEXAO_S = 30.0
+
+# Busy timeout de cada tentativa dentro de prazo_escrita: curto, para que a
+# espera aconteça no backoff com jitter do retry_on_db_lock e não dentro do
+# SQLite (que dormiria o prazo inteiro na primeira tentativa)
+TIMEOUT_TENTATIVA_S = float(os.getenv('DB_BUSY_TIMEOUT_MS', '100')) / 1000
+
+db_lock_contention_total = metrics.counter(
+    'db_lock_contention_total', 'Eventos de contenção de escrita no SQLite', ('metodo', 'evento')
+)
+db_lock_wait_seconds = metrics.histogram(
+    'db_lock_wait_seconds', 'Tempo gasto em escritas que encontraram lock (incluindo retries)', ('metodo',),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# Instante (time.monotonic) em que a escrita/requisição atual desiste
+_prazo_escrita: ContextVar[Optional[float]] = ContextVar('prazo_escrita', default=None)
+
+
+def eh_erro_de_lock(erro: BaseException) -> bool:
+    """Se a exceção é contenção de escrita (database is locked / busy)"""
+    if not isinstance(erro, sqlite3.OperationalError):
+        return False
+    texto = str(erro).lower()
+    return 'database is locked' in texto or 'database is busy' in texto
+
+
+@contextmanager
+def prazo_escrita(segundos: float = PRAZO_ESCRITA_S) -> Iterator[float]:
+    """
+    Limita o tempo total de escrita no bloco (retries + espera por lock)
+
+    Prazos aninhados nunca estendem o externo: uma requisição com prazo
+    de 5s não ganha mais 5s a cada método de escrita que chama.
+
+    Usage:
+        with prazo_escrita(3):
+            db.registrar_lead(...)
+            db.criar_agendamento(...)
+    """
+    externo = _prazo_escrita.get()
+    prazo = time.monotonic() + segundos
+    if externo is not None and externo < prazo:
+        prazo = externo
+    token = _prazo_escrita.set(prazo)
+    try:
+        yield prazo
+    finally:
+        _prazo_escrita.reset(token)
+
+
+def tempo_restante() -> Optional[float]:
+    """Segundos até o prazo de escrita atual (None fora de prazo_escrita)"""
+    prazo = _prazo_escrita.get()
+    return None if prazo is None else max(prazo - time.monotonic(), 0.0)
+
+
+class ContadorLock:
+    """
+    Retries e falhas por "database is locked" no processo atual
+
+    Também guarda quanto tempo as escritas contendidas levaram no último
+    minuto: retry_after() usa isso para sugerir a espera no 503 em vez de
+    um valor fixo. Lido pelo stress_db.py e pelo retry_on_lock.
+    """
+
+    JANELA_S = 60.0
+
+    def __init__(self):
+        self._lock = Lock()
+        self.retries = 0
+        self.esgotados = 0
+        self._esperas: deque = deque(maxlen=1000)
+
+    def registrar(self, esgotado: bool = False) -> None:
+        with self._lock:
+            if esgotado:
+                self.esgotados += 1
+            else:
+                self.retries += 1
+
+    def registrar_espera(self, segundos: float) -> None:
+        """Duração total de uma escrita que encontrou lock"""
+        with self._lock:
+            self._esperas.append((time.monotonic(), segundos))
+
+    def retry_after(self, minimo: int = 1, maximo: int = 30) -> int:
+        """
+        Segundos sugeridos ao cliente: média das esperas recentes,
+        arredondada para cima (sem contenção recente: o mínimo)
+        """
+        limite = time.monotonic() - self.JANELA_S
+        with self._lock:
+            recentes = [segundos for quando, segundos in self._esperas if quando >= limite]
+        if not recentes:
+            return minimo
+        return max(minimo, min(maximo, math.ceil(sum(recentes) / len(recentes))))
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {'retries': self.retries, 'esgotados': self.esgotados}
+
+    def resetar(self) -> None:
+        with self._lock:
+            self.retries = 0
+            self.esgotados = 0
+            self._esperas.clear()
+
+
+# Instância global (compartilhada entre threads do processo)
+contador_lock = ContadorLock()
+
+
+def retry_on_db_lock(max_retries: int = RETRY_MAX_TENTATIVAS,
+                     backoff_ms: float = RETRY_BACKOFF_MS,
+                     max_backoff_ms: float = RETRY_BACKOFF_MAX_MS,
+                     prazo_s: float = PRAZO_ESCRITA_S) -> Callable:
     """
     Decorator para retry em operações que podem gerar database locked
 
+    Backoff exponencial com jitter total (espera aleatória entre 0 e
+    backoff_ms * 2^tentativa, limitada a max_backoff_ms) para que escritas
+    de um mesmo burst não colidam de novo no mesmo instante. Tentativas
+    param no prazo da requisição (ver prazo_escrita) ou em `prazo_s`; cada
+    uma espera o lock só TIMEOUT_TENTATIVA_S dentro do SQLite.
+
     Args:
         max_retries: Número máximo de tentativas
-        backoff_ms: Tempo base de espera entre tentativas (cresce exponencialmente)
+        backoff_ms: Teto da primeira espera (dobra a cada tentativa)
+        max_backoff_ms: Teto de cada espera
+        prazo_s: Tempo total quando não há prazo da requisição
 
     Usage:
-        @retry_on_db_lock(max_retries=3, backoff_ms=100)
+        @retry_on_db_lock()
         def minha_funcao_de_escrita(self, ...):
-            # código que acessa banco
+            # código que acessa banco (deve deixar erros de lock propagarem)
     """
     def decorator(func: Callable) -> Callable:
+        metodo = func.__name__
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            last_error = None
+            inicio = time.monotonic()
+            contendido = False
 
-            for attempt in range(max_retries):
+            with prazo_escrita(prazo_s):
                 try:
-                    return func(*args, **kwargs)
-                except sqlite3.OperationalError as e:
-                    if "database is locked" in str(e).lower():
-                        last_error = e
-                        if attempt < max_retries - 1:
-                            # Exponential backoff: 100ms, 200ms, 400ms
-                            sleep_time = (backoff_ms * (2 ** attempt)) / 1000
-                            time.sleep(sleep_time)
-                            continue
-                    # Se não for "locked" ou última tentativa, levanta erro
-                    raise
-
-            # Todas tentativas falharam
-            raise last_error
+                    for attempt in range(max_retries):
+                        try:
+                            return func(*args, **kwargs)
+                        except sqlite3.OperationalError as e:
+                            if not eh_erro_de_lock(e):
+                                raise
+                            contendido = True
+
+                            restante = tempo_restante()
+                            if attempt == max_retries - 1 or restante <= 0:
+                                contador_lock.registrar(esgotado=True)
+                                db_lock_contention_total.inc(metodo=metodo, evento='esgotado')
+                                raise
+
+                            contador_lock.registrar()
+                            db_lock_contention_total.inc(metodo=metodo, evento='retry')
+                            teto = min(max_backoff_ms, backoff_ms * (2 ** attempt)) / 1000
+                            time.sleep(min(random.uniform(0, teto), restante))
+                finally:
+                    if contendido:
+                        espera = time.monotonic() - inicio
+                        contador_lock.registrar_espera(espera)
+                        db_lock_wait_seconds.observe(espera, metodo=metodo)
 
         return wrapper
     return decorator
 
 
+@rastrear_metodos('LeadsDatabase')
 class LeadsDatabase:
-    def __init__(self, db_path: str = "data/dashboard.db"):
+    def __init__(self, db_path: str = "data/dashboard.db", pool_leitura: int = TAMANHO_POOL):
+        """
+        Args:
+            db_path: Arquivo SQLite
+            pool_leitura: Conexões somente leitura ociosas mantidas para os
+                          métodos de leitura (0 = leituras usam conexões normais)
+        """
         self.db_path = db_path
-        self._criar_tabelas()
+
+        # Regras da agenda compiladas (recompiladas quando a configuração muda)
+        self._grade: Optional[GradeAgenda] = None
+        self._grade_valor: Optional[str] = None
+
+        # Último obter_estatisticas e o data_version em que foi calculado
+        self._estatisticas: Optional[Tuple[int, Dict[str, Any]]] = None
+        self._conn_versao: Optional[sqlite3.Connection] = None
+        self._lock_estatisticas = Lock()
+
+        self._migrar_schema()
+
+        # Criado depois do schema: mode=ro exige o arquivo existente
+        self.pool_leitura = PoolLeitura(db_path, pool_leitura) if pool_leitura > 0 else None
 
     def _get_connection(self):
         """
         Cria conexão com SQLite otimizada para concorrência
 
         Configurações:
-        - timeout=30s: Aguarda até 30s se DB estiver locked
+        - timeout=30s: Aguarda até 30s se DB estiver locked; dentro de
+          prazo_escrita, TIMEOUT_TENTATIVA_S (limitado ao que resta do
+          prazo) e o retry_on_db_lock cuida das novas tentativas
         - check_same_thread=False: Permite uso em múltiplas threads
         - row_factory: Retorna dicts ao invés de tuplas
+        - factory: Cursores medidos por statement (ver query_stats.py)
+        - synchronous=NORMAL: fsync só nos checkpoints do WAL
         """
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(
-            self.db_path,
-            timeout=30.0,  # Aguarda 30s antes de lançar OperationalError
-            check_same_thread=False  # Permite threads Flask simultâneas
-        )
+        restante = tempo_restante()
+        timeout = TIMEOUT_CONEXAO_S if restante is None else min(TIMEOUT_TENTATIVA_S, restante)
+        with timing.fase('db'):
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=timeout,  # Aguarda antes de lançar OperationalError
+                check_same_thread=False,  # Permite threads Flask simultâneas
+                factory=ConexaoInstrumentada
+            )
+        # Por conexão (não fica no arquivo): sem fsync a cada commit em WAL.
+        # Cursor base: não entra nas contagens da requisição
+        sqlite3.Cursor(conn).execute("PRAGMA synchronous=NORMAL")
         conn.row_factory = sqlite3.Row  # Retorna dicts
         return conn
 
-    def _criar_tabelas(self):
+    def _get_leitura(self):
+        """
+        Conexão somente leitura (mode=ro + PRAGMA query_only) do pool
+
+        Para métodos que só fazem SELECT: não disputam o lock de escrita e
+        close() devolve a conexão ao pool. Sem pool, cai em _get_connection.
         """
-        Cria estrutura do banco de dados com otimizações de concorrência
+        if self.pool_leitura is None:
+            return self._get_connection()
+        with timing.fase('db'):
+            return self.pool_leitura.obter()
 
-        Ativa WAL mode (Write-Ahead Logging):
+    def _migrar_schema(self):
+        """
+        Leva o arquivo à versão atual do schema (ver migracoes.py)
+
+        Com o schema em dia é só a leitura do PRAGMA user_version: nenhum
+        CREATE/ALTER e nenhum lock de escrita no boot do worker.
+
+        Em arquivos novos (versão 0) ativa antes WAL mode (Write-Ahead
+        Logging), que é persistente no arquivo:
         - Permite leituras durante escritas
         - Melhor performance em alta concorrência
         - Reduz locks em até 90%
         """
         conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # ========== OTIMIZAÇÕES DE CONCORRÊNCIA ==========
-        # WAL mode: Permite leituras simultâneas durante escritas
-        cursor.execute("PRAGMA journal_mode=WAL")
-
-        # Aumenta timeout de busy (30s)
-        cursor.execute("PRAGMA busy_timeout=30000")
-
-        # Desabilita fsync em checkpoints (mais rápido, seguro para nosso caso)
-        cursor.execute("PRAGMA synchronous=NORMAL")
-
-        # Cache de 10MB para melhor performance
-        cursor.execute("PRAGMA cache_size=-10000")
-
-        # Tabela principal de leads
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS leads (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                whatsapp TEXT UNIQUE NOT NULL,
-                nome TEXT NOT NULL,
-                imovel_id INTEGER,
-                score INTEGER CHECK(score >= 0 AND score <= 100) DEFAULT 0,
-                agendou_visita BOOLEAN DEFAULT 0,
-                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Histórico de mudanças de score
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS score_historico (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                whatsapp TEXT NOT NULL,
-                score_anterior INTEGER,
-                score_novo INTEGER,
-                motivo TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (whatsapp) REFERENCES leads(whatsapp)
-            )
-        """)
-
-        # Tabela de agendamentos
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS agendamentos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome_cliente TEXT NOT NULL,
-                whatsapp TEXT NOT NULL,
-                imovel_id INTEGER NOT NULL,
-                data_visita DATE NOT NULL,
-                hora_visita TIME NOT NULL,
-                status TEXT CHECK(status IN ('agendado', 'confirmado', 'realizado', 'cancelado')) DEFAULT 'agendado',
-                observacoes TEXT,
-                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Tabela de configurações (para observações da agenda)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS configuracoes (
-                chave TEXT PRIMARY KEY,
-                valor TEXT,
-                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Índices para performance
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_whatsapp ON leads(whatsapp)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_score ON leads(score)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_imovel ON leads(imovel_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_agendou ON leads(agendou_visita)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_agendamentos_data ON agendamentos(data_visita)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_agendamentos_status ON agendamentos(status)")
-
-        conn.commit()
-        conn.close()
+        try:
+            versao = versao_schema(conn)
+            if versao >= VERSAO_ATUAL:
+                return
+
+            if versao == 0:
+                # Páginas liberadas por DELETE voltam ao disco via incremental_vacuum
+                # (manutencao.py). Só vale para bancos novos: precisa vir antes do
+                # journal_mode e da primeira tabela; em bancos existentes é no-op
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("PRAGMA journal_mode=WAL")
+
+            migrar(conn, self)
+        finally:
+            conn.close()
 
-    @retry_on_db_lock(max_retries=3, backoff_ms=100)
+    @retry_on_db_lock()
     def registrar_lead(self, whatsapp: str, nome: str, imovel_id: int,
                       score: int, agendou_visita: bool) -> Dict[str, Any]:
         """
@@ -185,11 +402,10 @@ class LeadsDatabase:
             Dict com success, lead_id, e acao (created/updated)
 
         Note:
-            Protegido com @retry_on_db_lock para resistir a bursts
+            Protegido com @retry_on_db_lock para resistir a bursts. A busca
+            e a escrita rodam sob BEGIN IMMEDIATE: duas requisições do mesmo
+            whatsapp não tentam criar o lead ao mesmo tempo
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
         # Validações
         if not whatsapp or not nome:
             return {"success": False, "error": "whatsapp e nome são obrigatórios"}
@@ -197,55 +413,65 @@ class LeadsDatabase:
         if score < 0 or score > 100:
             return {"success": False, "error": "score deve estar entre 0 e 100"}
 
-        # Verifica se lead já existe
-        cursor.execute("SELECT id, score FROM leads WHERE whatsapp = ?", (whatsapp,))
-        lead_existente = cursor.fetchone()
+        conn = self._get_connection()
+        cursor = conn.cursor()
 
-        timestamp = now_brasilia().isoformat()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
 
-        if lead_existente:
-            # Atualiza lead existente
-            score_anterior = lead_existente['score']
-            lead_id = lead_existente['id']
+            # Verifica se lead já existe
+            cursor.execute("SELECT id, score FROM leads WHERE whatsapp = ?", (whatsapp,))
+            lead_existente = cursor.fetchone()
+
+            timestamp = now_brasilia().isoformat()
+
+            if lead_existente:
+                # Atualiza lead existente
+                score_anterior = lead_existente['score']
+                lead_id = lead_existente['id']
 
-            cursor.execute("""
-                UPDATE leads
-                SET nome = ?, imovel_id = ?, score = ?,
-                    agendou_visita = ?, atualizado_em = ?
-                WHERE whatsapp = ?
-            """, (nome, imovel_id, score, agendou_visita, timestamp, whatsapp))
-
-            # Registra histórico se score mudou
-            if score_anterior != score:
-                motivo = f"Score atualizado de {score_anterior} para {score}"
+                cursor.execute("""
+                    UPDATE leads
+                    SET nome = ?, imovel_id = ?, score = ?,
+                        agendou_visita = ?, atualizado_em = ?
+                    WHERE whatsapp = ?
+                """, (nome, imovel_id, score, agendou_visita, timestamp, whatsapp))
+
+                # Registra histórico se score mudou
+                if score_anterior != score:
+                    motivo = f"Score atualizado de {score_anterior} para {score}"
+                    cursor.execute("""
+                        INSERT INTO score_historico
+                        (whatsapp, score_anterior, score_novo, motivo)
+                        VALUES (?, ?, ?, ?)
+                    """, (whatsapp, score_anterior, score, motivo))
+
+                acao = "updated"
+            else:
+                # Cria novo lead
+                cursor.execute("""
+                    INSERT INTO leads
+                    (whatsapp, nome, imovel_id, score, agendou_visita, criado_em, atualizado_em)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (whatsapp, nome, imovel_id, score, agendou_visita, timestamp, timestamp))
+
+                lead_id = cursor.lastrowid
+
+                # Registra no histórico
                 cursor.execute("""
                     INSERT INTO score_historico
                     (whatsapp, score_anterior, score_novo, motivo)
                     VALUES (?, ?, ?, ?)
-                """, (whatsapp, score_anterior, score, motivo))
-
-            acao = "updated"
-        else:
-            # Cria novo lead
-            cursor.execute("""
-                INSERT INTO leads
-                (whatsapp, nome, imovel_id, score, agendou_visita, criado_em, atualizado_em)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (whatsapp, nome, imovel_id, score, agendou_visita, timestamp, timestamp))
-
-            lead_id = cursor.lastrowid
-
-            # Registra no histórico
-            cursor.execute("""
-                INSERT INTO score_historico
-                (whatsapp, score_anterior, score_novo, motivo)
-                VALUES (?, ?, ?, ?)
-            """, (whatsapp, 0, score, "Lead criado"))
+                """, (whatsapp, 0, score, "Lead criado"))
 
-            acao = "created"
+                acao = "created"
 
-        conn.commit()
-        conn.close()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
 
         return {
             "success": True,
@@ -264,7 +490,7 @@ class LeadsDatabase:
             - imovel_id: ID do imóvel
             - agendou_visita: True/False
         """
-        conn = self._get_connection()
+        conn = self._get_leitura()
         cursor = conn.cursor()
 
         query = "SELECT * FROM leads WHERE 1=1"
@@ -297,7 +523,7 @@ class LeadsDatabase:
 
     def buscar_lead(self, whatsapp: str) -> Optional[Dict[str, Any]]:
         """Busca lead específico por WhatsApp"""
-        conn = self._get_connection()
+        conn = self._get_leitura()
         cursor = conn.cursor()
 
         cursor.execute("SELECT * FROM leads WHERE whatsapp = ?", (whatsapp,))
@@ -308,7 +534,7 @@ class LeadsDatabase:
 
     def obter_historico(self, whatsapp: str) -> List[Dict[str, Any]]:
         """Obtém histórico de score de um lead"""
-        conn = self._get_connection()
+        conn = self._get_leitura()
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -322,9 +548,42 @@ class LeadsDatabase:
         conn.close()
         return historico
 
+    def _versao_dados(self) -> int:
+        """
+        PRAGMA data_version de uma conexão dedicada: muda a cada commit de
+        qualquer outra conexão, deste ou de outro processo
+
+        mtime/tamanho do arquivo e do -wal não servem: depois de um
+        checkpoint o -wal é reescrito com o mesmo tamanho e, em sistemas
+        de arquivos com mtime grosso, o commit passa despercebido. Chamar
+        com _lock_estatisticas.
+        """
+        if self._conn_versao is None:
+            self._conn_versao = sqlite3.connect(
+                f"file:{os.path.abspath(self.db_path)}?mode=ro", uri=True, check_same_thread=False
+            )
+        return self._conn_versao.execute("PRAGMA data_version").fetchone()[0]
+
     def obter_estatisticas(self) -> Dict[str, Any]:
-        """Retorna estatísticas agregadas para gráficos"""
-        conn = self._get_connection()
+        """
+        Retorna estatísticas agregadas para gráficos
+
+        Reaproveita o último cálculo enquanto nenhum commit acontecer
+        (ver _versao_dados); o aquecimento do boot faz o primeiro.
+        """
+        with self._lock_estatisticas:
+            versao = self._versao_dados()
+            if self._estatisticas is not None and self._estatisticas[0] == versao:
+                return copy.deepcopy(self._estatisticas[1])
+
+        estatisticas = self._calcular_estatisticas()
+        with self._lock_estatisticas:
+            # Versão lida antes das consultas: um commit no meio só causa recálculo
+            self._estatisticas = (versao, estatisticas)
+        return copy.deepcopy(estatisticas)
+
+    def _calcular_estatisticas(self) -> Dict[str, Any]:
+        conn = self._get_leitura()
         cursor = conn.cursor()
 
         # Total de leads
@@ -377,16 +636,112 @@ class LeadsDatabase:
 
     # ==================== MÉTODOS DE AGENDAMENTOS ====================
 
+    def _buscar_conflito(self, cursor, imovel_id: int, data_visita: str, hora_visita: str,
+                         ignorar_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Procura agendamento ativo do mesmo imóvel que se sobreponha ao horário
+
+        Dois agendamentos conflitam quando começam a menos de
+        `duracao_visita_min` (regras da agenda) um do outro. Usa o índice
+        parcial idx_agendamentos_slot_ativo (imovel_id, data_visita, hora_visita).
+        """
+        duracao = self._obter_grade(cursor).duracao_visita
+
+        cursor.execute("""
+            SELECT id, hora_visita, status
+            FROM agendamentos
+            WHERE imovel_id = ? AND data_visita = ? AND status != 'cancelado'
+        """, (imovel_id, data_visita))
+
+        inicio = hora_para_minutos(hora_visita)
+
+        for row in cursor.fetchall():
+            if row['id'] == ignorar_id:
+                continue
+            try:
+                outro = hora_para_minutos(row['hora_visita'])
+            except ValueError:
+                continue
+            if abs(outro - inicio) < duracao:
+                return dict(row)
+
+        return None
+
+    def _sugerir_alternativas(self, cursor, imovel_id: int, data_visita: str, hora_visita: str,
+                              limite: int = 3, dias: int = 7) -> List[Dict[str, str]]:
+        """
+        Sugere os horários livres mais próximos do horário pedido
+
+        Lê os bitmaps de agenda_slots do dia pedido até `dias` à frente e
+        ordena os inícios livres pela distância ao horário pedido.
+        """
+        data_base = date.fromisoformat(data_visita)
+        pedido = datetime.combine(data_base, datetime.min.time()) + \
+            timedelta(minutes=hora_para_minutos(hora_visita))
+
+        livres = self._horarios_livres(cursor, imovel_id, data_base, dias)
+
+        candidatos = []
+        for dia, horas in livres.items():
+            for hora in horas:
+                horario = datetime.fromisoformat(f"{dia}T{hora}")
+                candidatos.append((abs((horario - pedido).total_seconds()), horario))
+
+        candidatos.sort()
+
+        return [
+            {"data": horario.date().isoformat(), "hora": horario.strftime('%H:%M')}
+            for _, horario in candidatos[:limite]
+        ]
+
+    def _resposta_conflito(self, cursor, imovel_id: int, data_visita: str, hora_visita: str,
+                           conflito: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Monta resposta estruturada de conflito com horários alternativos"""
+        return {
+            "success": False,
+            "conflito": True,
+            "error": "Horário indisponível para este imóvel",
+            "conflito_com": {
+                "agendamento_id": conflito['id'],
+                "hora_visita": conflito['hora_visita']
+            } if conflito else None,
+            "alternativas": self._sugerir_alternativas(cursor, imovel_id, data_visita, hora_visita)
+        }
+
+    @retry_on_db_lock()
     def criar_agendamento(self, nome_cliente: str, whatsapp: str, imovel_id: int,
                          data_visita: str, hora_visita: str, observacoes: str = None,
                          status: str = 'agendado') -> Dict[str, Any]:
-        """Cria novo agendamento de visita"""
+        """
+        Cria novo agendamento de visita
+
+        Recusa horários que conflitam com outro agendamento ativo do mesmo
+        imóvel, retornando {"conflito": True, "alternativas": [...]}.
+        A verificação e o INSERT rodam sob BEGIN IMMEDIATE, então duas
+        requisições simultâneas não conseguem reservar o mesmo horário.
+        """
+        try:
+            hora_visita = normalizar_hora(hora_visita)
+            data_visita = normalizar_data(data_visita)
+        except (TypeError, ValueError) as e:
+            return {"success": False, "error": str(e)}
+
         conn = self._get_connection()
         cursor = conn.cursor()
 
         timestamp = now_brasilia().isoformat()
 
         try:
+            # Reserva o lock de escrita antes de verificar o conflito
+            cursor.execute("BEGIN IMMEDIATE")
+
+            if status != 'cancelado':
+                conflito = self._buscar_conflito(cursor, imovel_id, data_visita, hora_visita)
+                if conflito:
+                    resposta = self._resposta_conflito(cursor, imovel_id, data_visita, hora_visita, conflito)
+                    conn.rollback()
+                    return resposta
+
             cursor.execute("""
                 INSERT INTO agendamentos
                 (nome_cliente, whatsapp, imovel_id, data_visita, hora_visita, status, observacoes, criado_em, atualizado_em)
@@ -394,6 +749,9 @@ class LeadsDatabase:
             """, (nome_cliente, whatsapp, imovel_id, data_visita, hora_visita, status, observacoes, timestamp, timestamp))
 
             agendamento_id = cursor.lastrowid
+            self._apos_escrita_agenda(cursor, None, {
+                'imovel_id': imovel_id, 'data_visita': data_visita, 'status': status
+            })
             conn.commit()
 
             return {
@@ -401,7 +759,18 @@ class LeadsDatabase:
                 "agendamento_id": agendamento_id,
                 "message": "Agendamento criado com sucesso"
             }
+        except sqlite3.IntegrityError as e:
+            conn.rollback()
+            if "UNIQUE" in str(e):
+                return self._resposta_conflito(cursor, imovel_id, data_visita, hora_visita, None)
+            return {
+                "success": False,
+                "error": str(e)
+            }
         except Exception as e:
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
             return {
                 "success": False,
                 "error": str(e)
@@ -409,17 +778,24 @@ class LeadsDatabase:
         finally:
             conn.close()
 
-    def listar_agendamentos(self, filtros: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """Lista agendamentos com filtros opcionais"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def _montar_consulta_agendamentos(self, filtros: Optional[Dict[str, Any]] = None,
+                                      colunas: Optional[List[str]] = None,
+                                      limite: Optional[int] = None,
+                                      offset: int = 0) -> Tuple[str, List[Any]]:
+        """Monta SELECT de listar_agendamentos (separado para testes de plano de consulta)"""
+        colunas = list(colunas or COLUNAS_AGENDAMENTO)
+        invalidas = [c for c in colunas if c not in COLUNAS_AGENDAMENTO]
+        if invalidas:
+            raise ValueError(f"Colunas inválidas: {', '.join(invalidas)}")
 
-        query = "SELECT * FROM agendamentos WHERE 1=1"
-        params = []
+        query = f"SELECT {', '.join(colunas)} FROM agendamentos WHERE 1=1"
+        params: List[Any] = []
 
         if filtros:
             if 'status' in filtros:
-                query += " AND status = ?"
+                # "+status" impede o uso de idx_agendamentos_status (pouco
+                # seletivo), mantendo o índice de data/hora e a ordem sem sort
+                query += " AND +status = ?"
                 params.append(filtros['status'])
 
             if 'data_inicio' in filtros:
@@ -434,7 +810,35 @@ class LeadsDatabase:
                 query += " AND imovel_id = ?"
                 params.append(filtros['imovel_id'])
 
-        query += " ORDER BY criado_em DESC"
+        # Mesma ordem dos índices compostos: sem sort em memória
+        query += " ORDER BY data_visita, hora_visita"
+
+        if limite is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limite, offset])
+
+        return query, params
+
+    def listar_agendamentos(self, filtros: Optional[Dict[str, Any]] = None,
+                            colunas: Optional[List[str]] = None,
+                            limite: Optional[int] = None,
+                            offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Lista agendamentos com filtros opcionais, em ordem cronológica
+
+        Ordena por (data_visita, hora_visita), casando com os índices
+        idx_agendamentos_data_hora e idx_agendamentos_imovel_data.
+
+        Args:
+            filtros: status, data_inicio, data_fim, imovel_id
+            colunas: Subconjunto de COLUNAS_AGENDAMENTO (padrão: todas)
+            limite: Máximo de registros (padrão: sem limite)
+            offset: Registros a pular (paginação)
+        """
+        query, params = self._montar_consulta_agendamentos(filtros, colunas, limite, offset)
+
+        conn = self._get_leitura()
+        cursor = conn.cursor()
 
         cursor.execute(query, params)
         agendamentos = [dict(row) for row in cursor.fetchall()]
@@ -442,43 +846,82 @@ class LeadsDatabase:
         conn.close()
         return agendamentos
 
+    @retry_on_db_lock()
     def atualizar_agendamento(self, agendamento_id: int, dados: Dict[str, Any]) -> Dict[str, Any]:
-        """Atualiza agendamento existente"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        """
+        Atualiza agendamento existente
 
+        Mudanças de imóvel, data, hora ou status passam pela mesma
+        verificação de conflito de criar_agendamento.
+        """
         campos_atualizaveis = ['nome_cliente', 'whatsapp', 'imovel_id', 'data_visita',
                                'hora_visita', 'status', 'observacoes']
 
-        updates = []
-        params = []
-
-        for campo in campos_atualizaveis:
-            if campo in dados:
-                updates.append(f"{campo} = ?")
-                params.append(dados[campo])
+        dados = {campo: dados[campo] for campo in campos_atualizaveis if campo in dados}
 
-        if not updates:
+        if not dados:
             return {"success": False, "error": "Nenhum campo para atualizar"}
 
+        try:
+            if 'hora_visita' in dados:
+                dados['hora_visita'] = normalizar_hora(dados['hora_visita'])
+            if 'data_visita' in dados:
+                dados['data_visita'] = normalizar_data(dados['data_visita'])
+        except (TypeError, ValueError) as e:
+            return {"success": False, "error": str(e)}
+
+        updates = [f"{campo} = ?" for campo in dados]
+        params = list(dados.values())
+
         updates.append("atualizado_em = ?")
         params.append(now_brasilia().isoformat())
         params.append(agendamento_id)
 
         query = f"UPDATE agendamentos SET {', '.join(updates)} WHERE id = ?"
 
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
         try:
-            cursor.execute(query, params)
-            conn.commit()
+            cursor.execute("BEGIN IMMEDIATE")
 
-            if cursor.rowcount == 0:
+            cursor.execute("""
+                SELECT imovel_id, data_visita, hora_visita, status
+                FROM agendamentos WHERE id = ?
+            """, (agendamento_id,))
+            atual = cursor.fetchone()
+
+            if not atual:
+                conn.rollback()
                 return {"success": False, "error": "Agendamento não encontrado"}
 
+            novo = {**dict(atual), **dados}
+            afeta_agenda = bool({'imovel_id', 'data_visita', 'hora_visita', 'status'} & dados.keys())
+
+            if afeta_agenda and novo['status'] != 'cancelado':
+                conflito = self._buscar_conflito(cursor, novo['imovel_id'], novo['data_visita'],
+                                                 novo['hora_visita'], ignorar_id=agendamento_id)
+                if conflito:
+                    resposta = self._resposta_conflito(cursor, novo['imovel_id'], novo['data_visita'],
+                                                       novo['hora_visita'], conflito)
+                    conn.rollback()
+                    return resposta
+
+            cursor.execute(query, params)
+
+            if afeta_agenda:
+                self._apos_escrita_agenda(cursor, dict(atual), novo)
+
+            conn.commit()
+
             return {
                 "success": True,
                 "message": "Agendamento atualizado com sucesso"
             }
         except Exception as e:
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
             return {
                 "success": False,
                 "error": str(e)
@@ -486,23 +929,33 @@ class LeadsDatabase:
         finally:
             conn.close()
 
+    @retry_on_db_lock()
     def deletar_agendamento(self, agendamento_id: int) -> Dict[str, Any]:
         """Deleta agendamento"""
         conn = self._get_connection()
         cursor = conn.cursor()
 
         try:
-            cursor.execute("DELETE FROM agendamentos WHERE id = ?", (agendamento_id,))
-            conn.commit()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT imovel_id, data_visita, status FROM agendamentos WHERE id = ?", (agendamento_id,))
+            atual = cursor.fetchone()
 
-            if cursor.rowcount == 0:
+            if not atual:
+                conn.rollback()
                 return {"success": False, "error": "Agendamento não encontrado"}
 
+            cursor.execute("DELETE FROM agendamentos WHERE id = ?", (agendamento_id,))
+            self._apos_escrita_agenda(cursor, dict(atual), None)
+            conn.commit()
+
             return {
                 "success": True,
                 "message": "Agendamento deletado com sucesso"
             }
         except Exception as e:
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
             return {
                 "success": False,
                 "error": str(e)
@@ -510,47 +963,405 @@ class LeadsDatabase:
         finally:
             conn.close()
 
-    def obter_estatisticas_agenda(self) -> Dict[str, Any]:
-        """Retorna estatísticas da agenda"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def _apos_escrita_agenda(self, cursor, antes: Optional[Dict[str, Any]],
+                             depois: Optional[Dict[str, Any]]):
+        """
+        Mantém estruturas derivadas após escrita em agendamentos
 
-        # Total de visitas
-        cursor.execute("SELECT COUNT(*) as total FROM agendamentos")
-        total = cursor.fetchone()['total']
+        Deve rodar na mesma transação do INSERT/UPDATE/DELETE.
+
+        Args:
+            antes: imovel_id/data_visita/status antes da escrita (None = criação)
+            depois: imovel_id/data_visita/status após a escrita (None = remoção)
+        """
+        def chave_ocupacao(registro):
+            return registro['data_visita'], registro['status']
 
-        # Visitas hoje
-        hoje = now_brasilia().date().isoformat()
-        cursor.execute("SELECT COUNT(*) as hoje FROM agendamentos WHERE data_visita = ?", (hoje,))
-        hoje_count = cursor.fetchone()['hoje']
+        if not (antes and depois and chave_ocupacao(antes) == chave_ocupacao(depois)):
+            if antes:
+                self._ajustar_ocupacao(cursor, antes['data_visita'], antes['status'], -1)
+            if depois:
+                self._ajustar_ocupacao(cursor, depois['data_visita'], depois['status'], +1)
 
-        # Próximos 7 dias
-        from datetime import timedelta
-        proximos_7 = (now_brasilia().date() + timedelta(days=7)).isoformat()
+        for imovel_id, data_visita in {(r['imovel_id'], r['data_visita']) for r in (antes, depois) if r}:
+            self._atualizar_slots(cursor, imovel_id, data_visita)
+
+    def _ajustar_ocupacao(self, cursor, data_visita: str, status: str, delta: int):
+        """Incrementa/decrementa o contador dia/status do rollup agenda_ocupacao"""
         cursor.execute("""
-            SELECT COUNT(*) as proximos7
-            FROM agendamentos
-            WHERE data_visita BETWEEN ? AND ?
-        """, (hoje, proximos_7))
-        proximos7_count = cursor.fetchone()['proximos7']
+            INSERT INTO agenda_ocupacao (data_visita, status, total) VALUES (?, ?, ?)
+            ON CONFLICT (data_visita, status) DO UPDATE SET total = total + excluded.total
+        """, (data_visita, status, delta))
+
+        if delta < 0:
+            cursor.execute(
+                "DELETE FROM agenda_ocupacao WHERE data_visita = ? AND status = ? AND total <= 0",
+                (data_visita, status)
+            )
 
-        # Por status
+    def _reconstruir_ocupacao(self, cursor):
+        """Recalcula o rollup agenda_ocupacao a partir de agendamentos"""
+        cursor.execute("DELETE FROM agenda_ocupacao")
         cursor.execute("""
-            SELECT status, COUNT(*) as count
+            INSERT INTO agenda_ocupacao (data_visita, status, total)
+            SELECT data_visita, status, COUNT(*)
             FROM agendamentos
+            GROUP BY data_visita, status
+        """)
+
+    @retry_on_db_lock()
+    def reconstruir_agregados(self) -> Dict[str, Any]:
+        """
+        Recompila bitmaps de slots e rollup de ocupação
+
+        Para cargas em massa que inserem em agendamentos sem passar por
+        criar_agendamento (ex: gerar_dados.py).
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            self._reconstruir_slots(cursor)
+            self._reconstruir_ocupacao(cursor)
+            conn.commit()
+            return {"success": True}
+        except Exception as e:
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
+            return {"success": False, "error": str(e)}
+        finally:
+            conn.close()
+
+    def obter_estatisticas_agenda(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas da agenda
+
+        Lê o rollup agenda_ocupacao (uma linha por dia/status), não a
+        tabela agendamentos: o custo não cresce com o número de visitas.
+        """
+        conn = self._get_leitura()
+        cursor = conn.cursor()
+
+        hoje = now_brasilia().date()
+        proximos_7 = hoje + timedelta(days=7)
+
+        # Por status (e total)
+        cursor.execute("""
+            SELECT status, SUM(total) as count
+            FROM agenda_ocupacao
             GROUP BY status
         """)
         por_status = {row['status']: row['count'] for row in cursor.fetchall()}
 
+        # Visitas hoje e nos próximos 7 dias (busca pela PK data_visita)
+        cursor.execute("""
+            SELECT
+                COALESCE(SUM(CASE WHEN data_visita = ? THEN total END), 0) as hoje,
+                COALESCE(SUM(total), 0) as proximos7
+            FROM agenda_ocupacao
+            WHERE data_visita BETWEEN ? AND ?
+        """, (hoje.isoformat(), hoje.isoformat(), proximos_7.isoformat()))
+        periodo = cursor.fetchone()
+
         conn.close()
 
         return {
-            "total": total,
-            "hoje": hoje_count,
-            "proximos_7_dias": proximos7_count,
+            "total": sum(por_status.values()),
+            "hoje": periodo['hoje'],
+            "proximos_7_dias": periodo['proximos7'],
             "por_status": por_status
         }
 
+    def obter_calendario(self, ano: int, mes: int) -> Dict[str, Dict[str, int]]:
+        """
+        Ocupação por dia/status de um mês (heatmap do calendário)
+
+        Returns:
+            Dict {"YYYY-MM-DD": {"agendado": 2, "confirmado": 1, "total": 3}}
+            (dias sem visitas não aparecem)
+        """
+        inicio = date(ano, mes, 1)
+        fim = date(ano + (mes == 12), mes % 12 + 1, 1)
+
+        conn = self._get_leitura()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT data_visita, status, total
+            FROM agenda_ocupacao
+            WHERE data_visita >= ? AND data_visita < ?
+        """, (inicio.isoformat(), fim.isoformat()))
+
+        calendario: Dict[str, Dict[str, int]] = {}
+        for row in cursor.fetchall():
+            dia = calendario.setdefault(row['data_visita'], {'total': 0})
+            dia[row['status']] = row['total']
+            dia['total'] += row['total']
+
+        conn.close()
+        return calendario
+
+    # ==================== MÉTODOS DE DISPONIBILIDADE ====================
+
+    def _obter_grade(self, cursor) -> GradeAgenda:
+        """Regras da agenda compiladas (só recompila se a configuração mudou)"""
+        cursor.execute("SELECT valor FROM configuracoes WHERE chave = ?", (CHAVE_REGRAS,))
+        row = cursor.fetchone()
+        valor = row['valor'] if row else None
+
+        if self._grade is None or valor != self._grade_valor:
+            self._grade = GradeAgenda.de_json(valor)
+            self._grade_valor = valor
+
+        return self._grade
+
+    def _atualizar_slots(self, cursor, imovel_id: int, data_visita: str):
+        """
+        Recompila o bitmap de um imóvel/dia após escrita em agendamentos
+
+        Atualização incremental: lê apenas os agendamentos ativos daquele
+        imóvel/dia (índice idx_agendamentos_slot_ativo).
+        """
+        grade = self._obter_grade(cursor)
+
+        cursor.execute("""
+            SELECT hora_visita FROM agendamentos
+            WHERE imovel_id = ? AND data_visita = ? AND status != 'cancelado'
+        """, (imovel_id, data_visita))
+        ocupados = grade.ocupacao([row['hora_visita'] for row in cursor.fetchall()])
+
+        if ocupados:
+            cursor.execute("""
+                INSERT OR REPLACE INTO agenda_slots (imovel_id, data_visita, ocupados)
+                VALUES (?, ?, ?)
+            """, (imovel_id, data_visita, bitmap_para_blob(ocupados)))
+        else:
+            cursor.execute(
+                "DELETE FROM agenda_slots WHERE imovel_id = ? AND data_visita = ?",
+                (imovel_id, data_visita)
+            )
+
+    def _reconstruir_slots(self, cursor):
+        """Recompila todos os bitmaps (ex: após mudar duração de slot/visita)"""
+        grade = self._obter_grade(cursor)
+
+        cursor.execute("""
+            SELECT imovel_id, data_visita, hora_visita FROM agendamentos
+            WHERE status != 'cancelado'
+        """)
+
+        horas_por_dia: Dict[tuple, List[str]] = {}
+        for row in cursor.fetchall():
+            horas_por_dia.setdefault((row['imovel_id'], row['data_visita']), []).append(row['hora_visita'])
+
+        cursor.execute("DELETE FROM agenda_slots")
+        cursor.executemany(
+            "INSERT INTO agenda_slots (imovel_id, data_visita, ocupados) VALUES (?, ?, ?)",
+            [
+                (imovel_id, data_visita, bitmap_para_blob(grade.ocupacao(horas)))
+                for (imovel_id, data_visita), horas in horas_por_dia.items()
+            ]
+        )
+
+    def _horarios_livres(self, cursor, imovel_id: int, data_inicio: date,
+                         dias: int) -> Dict[str, List[str]]:
+        """Horários livres por dia, de data_inicio até data_inicio + dias"""
+        grade = self._obter_grade(cursor)
+        data_fim = data_inicio + timedelta(days=dias)
+
+        cursor.execute("""
+            SELECT data_visita, ocupados FROM agenda_slots
+            WHERE imovel_id = ? AND data_visita BETWEEN ? AND ?
+        """, (imovel_id, data_inicio.isoformat(), data_fim.isoformat()))
+        ocupados = {row['data_visita']: blob_para_bitmap(row['ocupados']) for row in cursor.fetchall()}
+
+        agora = now_brasilia()
+        livres = {}
+
+        for d in range(dias + 1):
+            dia = data_inicio + timedelta(days=d)
+            if dia < agora.date():
+                continue
+
+            bits = grade.inicios_livres(dia, ocupados.get(dia.isoformat(), 0))
+
+            # Hoje: descarta horários que já passaram
+            if dia == agora.date():
+                passados = (agora.hour * 60 + agora.minute) // grade.slot + 1
+                bits &= ~((1 << passados) - 1)
+
+            livres[dia.isoformat()] = grade.horarios(bits)
+
+        return livres
+
+    def horarios_livres(self, imovel_id: int, data_inicio: date, dias: int = 7) -> Dict[str, List[str]]:
+        """
+        Retorna horários livres para visita em um imóvel
+
+        Combina o horário de funcionamento (regras em `configuracoes`) com os
+        bitmaps de agenda_slots: uma leitura por PK, sem varrer agendamentos.
+
+        Returns:
+            Dict {"YYYY-MM-DD": ["08:00", "08:30", ...]}
+        """
+        conn = self._get_leitura()
+        cursor = conn.cursor()
+
+        try:
+            return self._horarios_livres(cursor, imovel_id, data_inicio, dias)
+        finally:
+            conn.close()
+
+    def _percorrer_livres(self, conn, grade: GradeAgenda, imovel_id: int,
+                          a_partir_de: datetime, data_limite: date) -> Iterator[Tuple[datetime, int]]:
+        """
+        Gera os horários livres de um imóvel em ordem cronológica
+
+        Caminha dia a dia sobre os agendamentos ativos lidos em ordem de
+        (data_visita, hora_visita) pelo índice idx_agendamentos_slot_ativo,
+        sem ORDER BY em memória. As linhas são buscadas sob demanda, então
+        quem consome só os N primeiros lê apenas os dias necessários.
+        """
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT data_visita, hora_visita FROM agendamentos
+            WHERE imovel_id = ? AND data_visita >= ? AND data_visita <= ?
+              AND status != 'cancelado'
+            ORDER BY data_visita, hora_visita
+        """, (imovel_id, a_partir_de.date().isoformat(), data_limite.isoformat()))
+
+        pendente = cursor.fetchone()
+        dia = a_partir_de.date()
+        minuto_inicial = a_partir_de.hour * 60 + a_partir_de.minute
+
+        while dia <= data_limite:
+            chave = dia.isoformat()
+
+            # Consome os agendamentos deste dia (e descarta datas anteriores)
+            horas = []
+            while pendente is not None and pendente['data_visita'] <= chave:
+                if pendente['data_visita'] == chave:
+                    horas.append(pendente['hora_visita'])
+                pendente = cursor.fetchone()
+
+            bits = grade.inicios_livres(dia, grade.ocupacao(horas))
+
+            if dia == a_partir_de.date():
+                # Descarta inícios antes do instante pedido
+                bits &= ~((1 << -(-minuto_inicial // grade.slot)) - 1)
+
+            for hora in grade.horarios(bits):
+                yield datetime.fromisoformat(f"{chave}T{hora}"), imovel_id
+
+            dia += timedelta(days=1)
+
+        cursor.close()
+
+    def proximos_horarios(self, imovel_ids: List[int], a_partir_de: datetime,
+                          n: int = 5, horizonte_dias: int = 60) -> List[Dict[str, Any]]:
+        """
+        Retorna os próximos N horários livres a partir de um instante
+
+        Com vários imóveis, intercala os horários de todos em ordem
+        cronológica (heapq.merge) e para assim que encontra N.
+
+        Args:
+            imovel_ids: Imóveis a consultar
+            a_partir_de: Instante inicial (horários estritamente anteriores são ignorados)
+            n: Quantidade de horários
+            horizonte_dias: Limite da busca em dias
+
+        Returns:
+            Lista de {"imovel_id", "data", "hora"}
+        """
+        agora = now_brasilia()
+        if a_partir_de < agora:
+            a_partir_de = agora
+
+        data_limite = a_partir_de.date() + timedelta(days=horizonte_dias)
+
+        conn = self._get_leitura()
+
+        try:
+            grade = self._obter_grade(conn.cursor())
+
+            geradores = [
+                self._percorrer_livres(conn, grade, imovel_id, a_partir_de, data_limite)
+                for imovel_id in dict.fromkeys(imovel_ids)
+            ]
+
+            resultado = []
+            for horario, imovel_id in heapq.merge(*geradores):
+                resultado.append({
+                    "imovel_id": imovel_id,
+                    "data": horario.date().isoformat(),
+                    "hora": horario.strftime('%H:%M')
+                })
+                if len(resultado) >= n:
+                    break
+
+            for gerador in geradores:
+                gerador.close()
+
+            return resultado
+        finally:
+            conn.close()
+
+    def obter_regras_agenda(self) -> Dict[str, Any]:
+        """Retorna regras estruturadas da agenda (horário de funcionamento e durações)"""
+        conn = self._get_leitura()
+        cursor = conn.cursor()
+
+        try:
+            return self._obter_grade(cursor).regras
+        finally:
+            conn.close()
+
+    @retry_on_db_lock()
+    def salvar_regras_agenda(self, regras: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Salva regras estruturadas da agenda e recompila os bitmaps
+
+        Args:
+            regras: Ver disponibilidade.validar_regras para o formato
+        """
+        try:
+            regras = validar_regras(regras)
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                INSERT OR REPLACE INTO configuracoes (chave, valor, atualizado_em)
+                VALUES (?, ?, ?)
+            """, (CHAVE_REGRAS, json.dumps(regras, ensure_ascii=False), now_brasilia().isoformat()))
+
+            self._reconstruir_slots(cursor)
+            conn.commit()
+
+            return {
+                "success": True,
+                "message": "Regras da agenda salvas com sucesso",
+                "regras": regras
+            }
+        except Exception as e:
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        finally:
+            conn.close()
+
+    @retry_on_db_lock()
     def salvar_configuracao(self, chave: str, valor: str) -> Dict[str, Any]:
         """Salva configuração (ex: observações da agenda)"""
         conn = self._get_connection()
@@ -559,6 +1370,7 @@ class LeadsDatabase:
         timestamp = now_brasilia().isoformat()
 
         try:
+            cursor.execute("BEGIN IMMEDIATE")
             cursor.execute("""
                 INSERT OR REPLACE INTO configuracoes (chave, valor, atualizado_em)
                 VALUES (?, ?, ?)
@@ -571,6 +1383,9 @@ class LeadsDatabase:
                 "message": "Configuração salva com sucesso"
             }
         except Exception as e:
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
             return {
                 "success": False,
                 "error": str(e)
@@ -580,7 +1395,7 @@ class LeadsDatabase:
 
     def obter_configuracao(self, chave: str) -> Optional[str]:
         """Obtém configuração salva"""
-        conn = self._get_connection()
+        conn = self._get_leitura()
         cursor = conn.cursor()
 
         cursor.execute("SELECT valor FROM configuracoes WHERE chave = ?", (chave,))
@@ -589,16 +1404,82 @@ class LeadsDatabase:
         conn.close()
         return resultado['valor'] if resultado else None
 
+    def aquecer_cache(self) -> Dict[str, Any]:
+        """
+        Lê os índices e tabelas quentes para o page cache
+
+        Varre cada índice usado pelas rotas do agente e do dashboard (o
+        INDEXED BY obriga o planejador a percorrer aquele índice) e as
+        tabelas de leads/agenda. Traz as páginas para o cache do sistema
+        operacional e para o da conexão do pool que executou.
+
+        Returns:
+            Páginas do arquivo e duração
+        """
+        inicio = time.perf_counter()
+        conn = self._get_leitura()
+        try:
+            cursor = conn.cursor()
+            for tabela, indice in INDICES_QUENTES:
+                cursor.execute(f"SELECT COUNT(*) FROM {tabela} INDEXED BY {indice}").fetchone()
+            for tabela, coluna in TABELAS_QUENTES:
+                cursor.execute(f"SELECT SUM(LENGTH({coluna})) FROM {tabela}").fetchone()
+            paginas = cursor.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            conn.close()
+
+        return {
+            "indices": len(INDICES_QUENTES),
+            "paginas": paginas,
+            "duracao_ms": round((time.perf_counter() - inicio) * 1000, 2)
+        }
+
+    def diagnostico_armazenamento(self, timeout: float = 1.0) -> Dict[str, Any]:
+        """
+        Saúde do SQLite para o probe de prontidão
+
+        Usa conexão própria com timeout curto: com o banco travado o probe
+        falha rápido em vez de esperar os 30s das conexões normais. Só
+        observa: o tamanho do WAL vem do stat do arquivo -wal, e checkpoints
+        ficam com a ManutencaoBanco (o atraso vem do estado dela).
+
+        Returns:
+            latencia_ms do SELECT 1 e tamanho do WAL em bytes
+
+        Raises:
+            sqlite3.Error: banco inacessível ou travado
+        """
+        inicio = time.perf_counter()
+        conn = sqlite3.connect(self.db_path, timeout=timeout)
+        try:
+            conn.execute("SELECT 1").fetchone()
+            latencia_ms = (time.perf_counter() - inicio) * 1000
+        finally:
+            conn.close()
+
+        try:
+            wal_bytes = os.stat(f"{self.db_path}-wal").st_size
+        except FileNotFoundError:
+            wal_bytes = 0
+
+        return {
+            "latencia_ms": round(latencia_ms, 2),
+            "wal_bytes": wal_bytes
+        }
+
+    @retry_on_db_lock()
     def deletar_lead(self, whatsapp: str) -> Dict[str, Any]:
         """Deleta um lead e seu histórico"""
         conn = self._get_connection()
         cursor = conn.cursor()
 
         try:
+            cursor.execute("BEGIN IMMEDIATE")
+
             # Verificar se lead existe
             cursor.execute("SELECT id FROM leads WHERE whatsapp = ?", (whatsapp,))
             if not cursor.fetchone():
-                conn.close()
+                conn.rollback()
                 return {
                     "success": False,
                     "error": "Lead não encontrado"
@@ -611,7 +1492,6 @@ class LeadsDatabase:
             cursor.execute("DELETE FROM leads WHERE whatsapp = ?", (whatsapp,))
 
             conn.commit()
-            conn.close()
 
             return {
                 "success": True,
@@ -619,8 +1499,12 @@ class LeadsDatabase:
             }
 
         except Exception as e:
-            conn.close()
+            conn.rollback()
+            if eh_erro_de_lock(e):
+                raise
             return {
                 "success": False,
                 "error": str(e)
             }
+        finally:
+            conn.close()
@@ -9,6 +9,12 @@ import logging
 
 # Import rate limiter global
 from rate_limiter import rate_limiter
+from database import PRAZO_ESCRITA_S, contador_lock, eh_erro_de_lock, prazo_escrita
+from timing import fase
+from tracing import span
+from metrics import (
+    rota_atual, rate_limit_rejections_total, duplicate_rejections_total, db_lock_failures_total
+)
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -42,15 +48,18 @@ def rate_limit(max_requests: int = 10, window_seconds: int = 1) -> Callable:
             client_ip = request.remote_addr or "unknown"
 
             # Verificar rate limit
-            allowed, reason = rate_limiter.is_allowed(client_ip)
+            with fase('limiter'), span('rate_limiter.is_allowed'):
+                allowed, reason = rate_limiter.is_allowed(client_ip)
 
             if not allowed:
                 logger.warning(
                     f"Rate limit exceeded for {client_ip} on {request.path}"
                 )
+                rate_limit_rejections_total.inc(route=rota_atual())
 
                 # Obter estatísticas para retry
-                stats = rate_limiter.get_stats(client_ip)
+                with fase('limiter'):
+                    stats = rate_limiter.get_stats(client_ip)
 
                 return jsonify({
                     "success": False,
@@ -70,7 +79,8 @@ def rate_limit(max_requests: int = 10, window_seconds: int = 1) -> Callable:
             else:
                 resp_obj = response
 
-            stats = rate_limiter.get_stats(client_ip)
+            with fase('limiter'):
+                stats = rate_limiter.get_stats(client_ip)
 
             # Se resposta é jsonify, adicionar headers
             if hasattr(resp_obj, 'headers'):
@@ -121,13 +131,15 @@ def deduplicate(window_seconds: int = 5, check_params: Optional[list] = None) ->
                 params = {k: v for k, v in params.items() if k in check_params}
 
             # Verificar se é duplicada
-            is_dup, req_hash = rate_limiter.is_duplicate(params)
+            with fase('limiter'), span('rate_limiter.is_duplicate'):
+                is_dup, req_hash = rate_limiter.is_duplicate(params)
 
             if is_dup:
                 logger.info(
                     f"Duplicate request detected: {request.path} "
                     f"params={params} hash={req_hash[:8]}"
                 )
+                duplicate_rejections_total.inc(route=rota_atual())
 
                 return jsonify({
                     "success": False,
@@ -144,16 +156,20 @@ def deduplicate(window_seconds: int = 5, check_params: Optional[list] = None) ->
     return decorator
 
 
-def retry_on_lock(max_retries: int = 3, log_retries: bool = True) -> Callable:
+def retry_on_lock(max_retries: int = 3, log_retries: bool = True,
+                  prazo_s: float = PRAZO_ESCRITA_S) -> Callable:
     """
     Decorator que captura erros de database locked e retorna 503
 
     Usado quando todas tentativas de retry no database.py falharam.
     Indica ao cliente que servidor está temporariamente sobrecarregado.
+    Todas as escritas da requisição dividem o mesmo prazo (prazo_escrita),
+    e o retry_after do 503 vem da contenção observada no último minuto.
 
     Args:
         max_retries: Informativo - quantas tentativas foram feitas
         log_retries: Se deve logar tentativas
+        prazo_s: Tempo total de escrita da requisição
 
     Usage:
         @app.route('/api/endpoint')
@@ -168,23 +184,28 @@ def retry_on_lock(max_retries: int = 3, log_retries: bool = True) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
             try:
-                return func(*args, **kwargs)
+                with prazo_escrita(prazo_s):
+                    return func(*args, **kwargs)
             except Exception as e:
                 # Detectar database locked
-                if "database is locked" in str(e).lower():
+                if eh_erro_de_lock(e):
                     if log_retries:
                         logger.error(
                             f"Database locked after {max_retries} retries "
                             f"on {request.path}: {e}"
                         )
+                    db_lock_failures_total.inc(route=rota_atual())
 
-                    return jsonify({
+                    retry_after = contador_lock.retry_after()
+                    response = jsonify({
                         "success": False,
                         "error": "Service temporarily unavailable",
                         "reason": "database_busy",
                         "message": "Database is busy, please retry in a few seconds",
-                        "retry_after": 2
-                    }), 503
+                        "retry_after": retry_after
+                    })
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response, 503
 
                 # Outros erros, re-raise
                 raise
@@ -0,0 +1,179 @@
+"""
+Motor de Disponibilidade da Agenda
+Compila horário de funcionamento em bitmaps de slots por dia
+"""
+import json
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+# Chave em `configuracoes` com as regras estruturadas da agenda
+CHAVE_REGRAS = 'agenda_horarios'
+
+DIAS_SEMANA = ['seg', 'ter', 'qua', 'qui', 'sex', 'sab', 'dom']
+
+# Regras padrão: todos os dias das 08:00 às 18:00, visitas de 1h
+REGRAS_PADRAO: Dict[str, Any] = {
+    'duracao_slot_min': 30,
+    'duracao_visita_min': 60,
+    'dias': {dia: [['08:00', '18:00']] for dia in DIAS_SEMANA}
+}
+
+MINUTOS_DIA = 24 * 60
+
+
+def _minutos(hora: str) -> int:
+    """Converte "HH:MM" em minutos desde 00:00 (aceita "24:00" como fim do dia)"""
+    partes = str(hora).strip().split(':')
+    if len(partes) not in (2, 3):
+        raise ValueError(f"Horário inválido: {hora}")
+    h, m = int(partes[0]), int(partes[1])
+    total = h * 60 + m
+    if not (0 <= m < 60 and 0 <= total <= MINUTOS_DIA):
+        raise ValueError(f"Horário inválido: {hora}")
+    return total
+
+
+def _formatar(minutos: int) -> str:
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def validar_regras(regras: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Valida e normaliza regras de funcionamento da agenda
+
+    Formato:
+        {
+            "duracao_slot_min": 30,
+            "duracao_visita_min": 60,
+            "dias": {
+                "seg": [["08:00", "12:00"], ["13:00", "18:00"]],
+                ...
+                "dom": []
+            }
+        }
+
+    Dias ausentes ficam fechados. Levanta ValueError se inválido.
+    """
+    if not isinstance(regras, dict):
+        raise ValueError("Regras devem ser um objeto JSON")
+
+    try:
+        slot = int(regras.get('duracao_slot_min', REGRAS_PADRAO['duracao_slot_min']))
+        visita = int(regras.get('duracao_visita_min', REGRAS_PADRAO['duracao_visita_min']))
+    except (TypeError, ValueError):
+        raise ValueError("duracao_slot_min e duracao_visita_min devem ser números")
+
+    if slot < 5 or MINUTOS_DIA % slot != 0:
+        raise ValueError("duracao_slot_min deve dividir 24h e ser >= 5 minutos")
+
+    if visita < slot or visita > MINUTOS_DIA:
+        raise ValueError("duracao_visita_min deve ser >= duracao_slot_min")
+
+    dias_entrada = regras.get('dias', {})
+    if not isinstance(dias_entrada, dict):
+        raise ValueError("'dias' deve ser um objeto com chaves seg..dom")
+
+    desconhecidos = set(dias_entrada) - set(DIAS_SEMANA)
+    if desconhecidos:
+        raise ValueError(f"Dias inválidos: {', '.join(sorted(desconhecidos))}")
+
+    dias = {}
+    for dia in DIAS_SEMANA:
+        intervalos = []
+        for intervalo in dias_entrada.get(dia) or []:
+            if not isinstance(intervalo, (list, tuple)) or len(intervalo) != 2:
+                raise ValueError(f"Intervalo inválido em '{dia}': use [\"HH:MM\", \"HH:MM\"]")
+            inicio, fim = _minutos(intervalo[0]), _minutos(intervalo[1])
+            if inicio >= fim:
+                raise ValueError(f"Intervalo inválido em '{dia}': início deve ser antes do fim")
+            intervalos.append([_formatar(inicio), _formatar(fim)])
+        dias[dia] = sorted(intervalos)
+
+    return {
+        'duracao_slot_min': slot,
+        'duracao_visita_min': visita,
+        'dias': dias
+    }
+
+
+class GradeAgenda:
+    """
+    Regras compiladas em bitmaps
+
+    Cada dia é dividido em slots de `duracao_slot_min`; o bit i representa
+    o slot que começa em i * duracao_slot_min minutos. Todas as consultas
+    de disponibilidade viram operações de bits sobre inteiros.
+    """
+
+    def __init__(self, regras: Dict[str, Any]):
+        self.regras = validar_regras(regras)
+        self.slot = self.regras['duracao_slot_min']
+        self.duracao_visita = self.regras['duracao_visita_min']
+        self.total_slots = MINUTOS_DIA // self.slot
+
+        # Quantos slots consecutivos uma visita ocupa
+        self.slots_por_visita = -(-self.duracao_visita // self.slot)
+
+        # Bitmap de funcionamento por dia da semana (0 = segunda)
+        self.funcionamento: List[int] = []
+        for dia in DIAS_SEMANA:
+            bits = 0
+            for inicio, fim in self.regras['dias'][dia]:
+                primeiro = -(-_minutos(inicio) // self.slot)
+                ultimo = _minutos(fim) // self.slot
+                for i in range(primeiro, ultimo):
+                    bits |= 1 << i
+            self.funcionamento.append(bits)
+
+    @classmethod
+    def de_json(cls, valor: Optional[str]) -> 'GradeAgenda':
+        """Compila a partir do valor salvo em `configuracoes` (None = padrão)"""
+        return cls(json.loads(valor) if valor else REGRAS_PADRAO)
+
+    def mascara_visita(self, hora: str) -> int:
+        """Bits dos slots ocupados por uma visita iniciando em `hora`"""
+        inicio = _minutos(hora)
+        primeiro = inicio // self.slot
+        ultimo = min(-(-(inicio + self.duracao_visita) // self.slot), self.total_slots)
+        return ((1 << (ultimo - primeiro)) - 1) << primeiro
+
+    def ocupacao(self, horas: List[str]) -> int:
+        """Bitmap de ocupação a partir dos horários de visitas do dia"""
+        bits = 0
+        for hora in horas:
+            try:
+                bits |= self.mascara_visita(hora)
+            except ValueError:
+                continue
+        return bits
+
+    def inicios_livres(self, dia: date, ocupados: int = 0) -> int:
+        """
+        Bitmap dos slots onde uma visita completa pode começar
+
+        Um início é válido quando os `slots_por_visita` slots seguintes estão
+        dentro do horário de funcionamento e livres.
+        """
+        livres = self.funcionamento[dia.weekday()] & ~ocupados
+        inicios = livres
+        for deslocamento in range(1, self.slots_por_visita):
+            inicios &= livres >> deslocamento
+        return inicios
+
+    def horarios(self, bits: int) -> List[str]:
+        """Converte bitmap de slots em lista de horários "HH:MM" """
+        horarios = []
+        while bits:
+            menor = bits & -bits
+            horarios.append(_formatar((menor.bit_length() - 1) * self.slot))
+            bits ^= menor
+        return horarios
+
+
+def bitmap_para_blob(bits: int) -> bytes:
+    """Serializa bitmap para BLOB (inteiros SQLite têm só 64 bits)"""
+    return bits.to_bytes((bits.bit_length() + 7) // 8 or 1, 'big')
+
+
+def blob_para_bitmap(blob: Optional[bytes]) -> int:
+    return int.from_bytes(blob, 'big') if blob else 0
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Gerador de Dados Sintéticos
+Cria data/dashboard.db e data/imoveis/ em escala de produção (ou maior),
+de forma determinística a partir de uma semente
+
+Uso:
+    python gerar_dados.py --leads 100000 --agendamentos 20000 --imoveis 200
+    python gerar_dados.py --leads 1000000 --saida /tmp/escala --seed 7
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+from database import LeadsDatabase
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique',
+         'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael',
+         'Sabrina', 'Thiago', 'Vanessa', 'William']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa',
+              'Rodrigues', 'Almeida', 'Nascimento', 'Carvalho', 'Gomes', 'Ribeiro']
+CIDADES = ['Belo Horizonte', 'Contagem', 'Nova Lima', 'Betim', 'Lagoa Santa', 'Sete Lagoas']
+TIPOS = ['casa', 'apartamento', 'lote', 'chacara', 'sala comercial']
+MOTIVOS = ['Perguntou preço', 'Pediu fotos', 'Perguntou localização',
+           'Perguntou financiamento', 'Pediu visita', 'Sem resposta']
+
+# Distribuição de status dos agendamentos (pesos)
+STATUS_AGENDAMENTO = (('agendado', 50), ('confirmado', 25), ('realizado', 15), ('cancelado', 10))
+
+# Horários cheios dentro do funcionamento padrão (visitas de 1h não se sobrepõem)
+HORAS = [f"{h:02d}:00" for h in range(8, 18)]
+
+
+def gerar_imoveis(rng: random.Random, quantidade: int, diretorio: str) -> List[Dict]:
+    """Grava INDICE.json e a pasta de cada imóvel (FAQ.txt + links.json)"""
+    imoveis_dir = os.path.join(diretorio, 'imoveis')
+    os.makedirs(imoveis_dir, exist_ok=True)
+
+    imoveis = []
+    for imovel_id in range(1, quantidade + 1):
+        tipo = rng.choice(TIPOS)
+        cidade = rng.choice(CIDADES)
+        area = rng.randrange(40, 2000, 5)
+        preco = rng.randrange(150, 5000) * 1000
+        slug = f"{tipo.replace(' ', '-')}-{imovel_id:05d}"
+
+        imoveis.append({
+            'id': imovel_id,
+            'slug': slug,
+            'tipo': tipo,
+            'titulo': f"{tipo.title()} {area}m² em {cidade}",
+            'cidade': cidade,
+            'area_m2': area,
+            'preco_total_min': preco,
+            'status': 'disponivel' if rng.random() < 0.85 else 'vendido',
+            'criado_em': datetime(2024, 1, 1).isoformat()
+        })
+
+        pasta = os.path.join(imoveis_dir, slug)
+        os.makedirs(pasta, exist_ok=True)
+        perguntas = '\n\n'.join(
+            f"P: {motivo}?\nR: Resposta padrão número {rng.randrange(1000)} sobre {motivo.lower()}."
+            for motivo in rng.sample(MOTIVOS, k=4)
+        )
+        with open(os.path.join(pasta, 'FAQ.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"FAQ - {imoveis[-1]['titulo']}\n\nÁrea: {area}m²\nPreço: R$ {preco:,}\n\n{perguntas}\n")
+        with open(os.path.join(pasta, 'links.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'fotos': [f"https://cdn.exemplo.com/{slug}/foto-{n}.jpg" for n in range(1, rng.randint(3, 15))],
+                'video_tour': f"https://cdn.exemplo.com/{slug}/tour.mp4" if rng.random() < 0.5 else None,
+                'planta_baixa': f"https://cdn.exemplo.com/{slug}/planta.pdf" if rng.random() < 0.3 else None
+            }, f, ensure_ascii=False, indent=2)
+
+    with open(os.path.join(diretorio, 'INDICE.json'), 'w', encoding='utf-8') as f:
+        json.dump({'versao': '1.0', 'total_imoveis': len(imoveis), 'imoveis': imoveis},
+                  f, ensure_ascii=False, indent=2)
+    return imoveis
+
+
+def whatsapp_do_lead(indice: int) -> str:
+    """Número único e estável por índice (DDD 31, celular)"""
+    return f"55319{indice:08d}"
+
+
+def gerar_leads(rng: random.Random, quantidade: int, imoveis: int, inicio: datetime,
+                dias: int, historico_max: int) -> Iterator[Tuple[tuple, List[tuple]]]:
+    """(linha de leads, linhas de score_historico) por lead, em ordem"""
+    for indice in range(quantidade):
+        whatsapp = whatsapp_do_lead(indice)
+        nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}"
+        criado = inicio + timedelta(seconds=rng.randrange(dias * 86400))
+
+        # Cadeia de scores crescente, como o agente registra na conversa
+        passos = rng.randint(1, min(max(historico_max, 1), 100))
+        scores = sorted(rng.sample(range(1, 101), k=passos))
+        historico = [(whatsapp, 0, scores[0], 'Lead criado', criado.isoformat(sep=' '))]
+        momento = criado
+        for anterior, novo in zip(scores, scores[1:]):
+            momento += timedelta(minutes=rng.randint(1, 600))
+            motivo = f"{rng.choice(MOTIVOS)}: score {anterior} -> {novo}"
+            historico.append((whatsapp, anterior, novo, motivo, momento.isoformat(sep=' ')))
+
+        lead = (whatsapp, nome, rng.randint(1, max(imoveis, 1)), scores[-1],
+                1 if scores[-1] >= 70 and rng.random() < 0.5 else 0,
+                criado.isoformat(), momento.isoformat())
+        yield lead, historico
+
+
+def gerar_agendamentos(rng: random.Random, quantidade: int, leads: int, imoveis: int,
+                       inicio: date, dias: int) -> Iterator[tuple]:
+    """
+    Agendamentos sem colisão de imóvel/data/hora
+
+    Sorteia posições distintas em (imóvel x dia x hora) com random.sample
+    sobre um range (O(quantidade) de memória, mesmo com capacidade enorme).
+    """
+    capacidade = imoveis * dias * len(HORAS)
+    if quantidade > capacidade:
+        raise ValueError(f"{quantidade} agendamentos não cabem em {imoveis} imóveis x {dias} dias "
+                         f"x {len(HORAS)} horários ({capacidade})")
+
+    status, pesos = zip(*STATUS_AGENDAMENTO)
+    for posicao in sorted(rng.sample(range(capacidade), quantidade)):
+        imovel_idx, resto = divmod(posicao, dias * len(HORAS))
+        dia, hora_idx = divmod(resto, len(HORAS))
+        lead = rng.randrange(max(leads, 1))
+        yield (
+            f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}",
+            whatsapp_do_lead(lead),
+            imovel_idx + 1,
+            (inicio + timedelta(days=dia)).isoformat(),
+            HORAS[hora_idx],
+            rng.choices(status, weights=pesos)[0],
+            'Gerado por gerar_dados.py' if rng.random() < 0.2 else None
+        )
+
+
+def _em_lotes(iteravel, tamanho: int) -> Iterator[list]:
+    lote = []
+    for item in iteravel:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def gerar(saida: str, leads: int, agendamentos: int, imoveis: int, seed: int = 42,
+          inicio: date = date(2025, 1, 1), dias: int = 365, historico_max: int = 5,
+          lote: int = 10000, log=print) -> Dict[str, float]:
+    """
+    Gera o conjunto completo em `saida` (que não pode ter um dashboard.db)
+
+    Cada tabela usa um gerador de números próprio derivado da semente, então
+    mudar --agendamentos ou --imoveis não altera os leads gerados.
+
+    Returns:
+        Segundos gastos em cada etapa
+    """
+    db_path = os.path.join(saida, 'dashboard.db')
+    if os.path.exists(db_path):
+        raise FileExistsError(f"{db_path} já existe")
+    os.makedirs(saida, exist_ok=True)
+
+    tempos = {}
+    inicio_etapa = time.perf_counter()
+    gerar_imoveis(random.Random(f"{seed}:imoveis"), imoveis, saida)
+    tempos['imoveis'] = time.perf_counter() - inicio_etapa
+    log(f"  {imoveis} imóveis em {tempos['imoveis']:.1f}s")
+
+    db = LeadsDatabase(db_path)  # schema, índices e configurações padrão
+
+    conn = sqlite3.connect(db_path)
+    # Carga em massa: durabilidade só no commit final de cada lote
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-200000")
+
+    inicio_etapa = time.perf_counter()
+    rng_leads = random.Random(f"{seed}:leads")
+    inicio_leads = datetime.combine(inicio, datetime.min.time())
+    total_historico = 0
+    for grupo in _em_lotes(gerar_leads(rng_leads, leads, imoveis, inicio_leads, dias, historico_max), lote):
+        with conn:
+            conn.executemany("""
+                INSERT INTO leads (whatsapp, nome, imovel_id, score, agendou_visita, criado_em, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [lead for lead, _ in grupo])
+            historico = [linha for _, linhas in grupo for linha in linhas]
+            conn.executemany("""
+                INSERT INTO score_historico (whatsapp, score_anterior, score_novo, motivo, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, historico)
+            total_historico += len(historico)
+    tempos['leads'] = time.perf_counter() - inicio_etapa
+    log(f"  {leads} leads + {total_historico} históricos em {tempos['leads']:.1f}s")
+
+    inicio_etapa = time.perf_counter()
+    rng_agenda = random.Random(f"{seed}:agendamentos")
+    for grupo in _em_lotes(gerar_agendamentos(rng_agenda, agendamentos, leads, imoveis, inicio, dias), lote):
+        with conn:
+            conn.executemany("""
+                INSERT INTO agendamentos
+                (nome_cliente, whatsapp, imovel_id, data_visita, hora_visita, status, observacoes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, grupo)
+    conn.execute("ANALYZE")
+    conn.close()
+    tempos['agendamentos'] = time.perf_counter() - inicio_etapa
+    log(f"  {agendamentos} agendamentos em {tempos['agendamentos']:.1f}s")
+
+    # Bitmaps e rollup não são mantidos por INSERT direto
+    inicio_etapa = time.perf_counter()
+    resultado = db.reconstruir_agregados()
+    if not resultado['success']:
+        raise RuntimeError(resultado['error'])
+    tempos['agregados'] = time.perf_counter() - inicio_etapa
+    log(f"  slots e ocupação recompilados em {tempos['agregados']:.1f}s")
+
+    return tempos
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Gera dados sintéticos determinísticos para testes de escala')
+    parser.add_argument('--leads', type=int, default=10000)
+    parser.add_argument('--agendamentos', type=int, default=2000)
+    parser.add_argument('--imoveis', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--saida', default='data', help='Diretório (recebe dashboard.db, INDICE.json e imoveis/)')
+    parser.add_argument('--inicio', default='2025-01-01', help='Primeiro dia dos dados (YYYY-MM-DD)')
+    parser.add_argument('--dias', type=int, default=365, help='Período coberto por leads e agendamentos')
+    parser.add_argument('--historico-max', type=int, default=5, help='Máximo de mudanças de score por lead')
+    parser.add_argument('--lote', type=int, default=10000, help='Linhas por transação')
+    args = parser.parse_args(argv)
+
+    print(f"Gerando em {args.saida} (seed {args.seed})")
+    try:
+        tempos = gerar(args.saida, args.leads, args.agendamentos, args.imoveis, args.seed,
+                       date.fromisoformat(args.inicio), args.dias, args.historico_max, args.lote)
+    except (FileExistsError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Concluído em {sum(tempos.values()):.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+Manutenção do SQLite em Segundo Plano
+Checkpoints do WAL (PASSIVE periódico, TRUNCATE quando ocioso), PRAGMA
+optimize e incremental vacuum, com métricas de tamanho do WAL e do
+último checkpoint
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre rodadas (checkpoint PASSIVE a cada rodada)
+INTERVALO_S = float(os.getenv('DB_MAINTENANCE_INTERVAL_S', '30'))
+
+# Sem commits há este tempo: TRUNCATE zera o arquivo -wal
+OCIOSO_S = float(os.getenv('DB_MAINTENANCE_IDLE_S', '60'))
+
+# PRAGMA optimize/ANALYZE (só quando ocioso)
+OTIMIZAR_S = float(os.getenv('DB_MAINTENANCE_OPTIMIZE_S', '3600'))
+
+# Páginas livres que disparam incremental_vacuum (auto_vacuum=INCREMENTAL)
+VACUUM_MIN_PAGINAS = int(os.getenv('DB_MAINTENANCE_VACUUM_PAGES', '1000'))
+VACUUM_LOTE_PAGINAS = 500
+
+# PRAGMA optimize=0x10002 (analisar todas as tabelas) existe a partir do 3.46
+_OPTIMIZE_COMPLETO = sqlite3.sqlite_version_info >= (3, 46, 0)
+
+db_wal_bytes = metrics.gauge('db_wal_bytes', 'Tamanho do arquivo -wal')
+db_wal_pending_frames = metrics.gauge(
+    'db_wal_pending_frames', 'Frames do WAL ainda não copiados para o banco'
+)
+db_last_checkpoint_timestamp_seconds = metrics.gauge(
+    'db_last_checkpoint_timestamp_seconds', 'Unix time do último checkpoint completo'
+)
+db_freelist_pages = metrics.gauge('db_freelist_pages', 'Páginas livres no arquivo do banco')
+db_checkpoints_total = metrics.counter(
+    'db_checkpoints_total', 'Checkpoints executados pela manutenção', ('modo', 'resultado')
+)
+db_optimize_total = metrics.counter(
+    'db_optimize_total', 'ANALYZE/PRAGMA optimize executados pela manutenção', ('resultado',)
+)
+db_maintenance_duration_seconds = metrics.histogram(
+    'db_maintenance_duration_seconds', 'Duração das tarefas de manutenção', ('tarefa',),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+
+class ManutencaoBanco:
+    """
+    Thread de manutenção de um arquivo SQLite em WAL
+
+    Usa conexão própria com busy timeout curto: se um escritor estiver
+    ativo, a tarefa é adiada para a próxima rodada em vez de esperar.
+    Ociosidade vem do PRAGMA data_version, que muda quando outra conexão
+    faz commit.
+
+    Usage:
+        manutencao = ManutencaoBanco('data/dashboard.db')
+        manutencao.iniciar()
+    """
+
+    def __init__(self, db_path: str, intervalo_s: float = INTERVALO_S,
+                 ocioso_s: float = OCIOSO_S, otimizar_s: float = OTIMIZAR_S,
+                 vacuum_min_paginas: int = VACUUM_MIN_PAGINAS):
+        self.db_path = db_path
+        self.intervalo_s = intervalo_s
+        self.ocioso_s = ocioso_s
+        self.otimizar_s = otimizar_s
+        self.vacuum_min_paginas = vacuum_min_paginas
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self._data_version: Optional[int] = None
+        self._ultimo_commit = time.monotonic()
+        self._ultima_otimizacao: Optional[float] = None
+        self._truncado_desde_commit = False
+        self.estado: Dict[str, Any] = {
+            'rodadas': 0,
+            'ultimo_checkpoint': None,
+            'ultimo_truncate': None,
+            'wal_pendentes': None,
+            'ultima_otimizacao': None,
+            'paginas_liberadas': 0,
+            'ultimo_erro': None
+        }
+
+    # ==================== CICLO DE VIDA ====================
+
+    def iniciar(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name='manutencao-sqlite', daemon=True)
+        self._thread.start()
+
+    def parar(self, timeout: float = 5.0) -> None:
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _executar(self) -> None:
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                self.rodada()
+            except Exception as e:
+                self.estado['ultimo_erro'] = f"{type(e).__name__}: {e}"
+                logger.warning(f"Manutenção do SQLite falhou: {e}")
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Autocommit: nenhuma leitura fica aberta segurando snapshot
+            self._conn = sqlite3.connect(self.db_path, timeout=0.1, isolation_level=None,
+                                         check_same_thread=False)
+        return self._conn
+
+    # ==================== TAREFAS ====================
+
+    def rodada(self, agora: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Uma rodada: PASSIVE sempre; TRUNCATE, optimize e vacuum se ocioso
+
+        Returns:
+            Tarefas executadas nesta rodada
+        """
+        agora = time.monotonic() if agora is None else agora
+        executadas: Dict[str, Any] = {}
+
+        with self._lock:
+            conn = self._conexao()
+
+            versao = conn.execute("PRAGMA data_version").fetchone()[0]
+            if versao != self._data_version:
+                self._data_version = versao
+                self._ultimo_commit = agora
+                self._truncado_desde_commit = False
+            ocioso = agora - self._ultimo_commit >= self.ocioso_s
+
+            # optimize e vacuum escrevem no WAL: rodam antes do checkpoint
+            if ocioso and (self._ultima_otimizacao is None
+                           or agora - self._ultima_otimizacao >= self.otimizar_s):
+                executadas['otimizar'] = self.otimizar()
+                if not executadas['otimizar']['bloqueado']:
+                    self._ultima_otimizacao = agora
+
+            paginas = self.vacuum_incremental()
+            if paginas:
+                executadas['vacuum_paginas'] = paginas
+
+            if ocioso and not self._truncado_desde_commit:
+                executadas['truncate'] = self.checkpoint('TRUNCATE')
+                self._truncado_desde_commit = not executadas['truncate']['bloqueado']
+            else:
+                executadas['passive'] = self.checkpoint('PASSIVE')
+
+            db_wal_bytes.set(self.tamanho_wal())
+            self.estado['rodadas'] += 1
+
+        return executadas
+
+    def checkpoint(self, modo: str = 'PASSIVE') -> Dict[str, Any]:
+        """
+        Executa wal_checkpoint(modo) e atualiza as métricas
+
+        PASSIVE copia o que for possível sem esperar leitores/escritores;
+        TRUNCATE também zera o -wal, mas só quando ninguém está usando.
+        """
+        inicio = time.perf_counter()
+        try:
+            ocupado, frames, copiados = self._conexao().execute(
+                f"PRAGMA wal_checkpoint({modo})"
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            # Busy timeout curto: escritor ativo, tenta na próxima rodada
+            db_checkpoints_total.inc(modo=modo.lower(), resultado='bloqueado')
+            return {'bloqueado': True, 'erro': str(e)}
+        finally:
+            db_maintenance_duration_seconds.observe(time.perf_counter() - inicio, tarefa=modo.lower())
+
+        pendentes = max(frames - copiados, 0) if frames >= 0 else 0
+        completo = not ocupado and pendentes == 0
+        db_checkpoints_total.inc(modo=modo.lower(), resultado='ok' if completo else 'parcial')
+        db_wal_pending_frames.set(pendentes)
+        self.estado['wal_pendentes'] = pendentes
+
+        if completo:
+            agora = time.time()
+            db_last_checkpoint_timestamp_seconds.set(agora)
+            self.estado['ultimo_checkpoint'] = agora
+            if modo == 'TRUNCATE':
+                self.estado['ultimo_truncate'] = agora
+
+        return {'bloqueado': bool(ocupado), 'frames': max(frames, 0), 'pendentes': pendentes}
+
+    def otimizar(self) -> Dict[str, Any]:
+        """
+        Atualiza estatísticas do planejador
+
+        analysis_limit mantém o ANALYZE aproximado e rápido. Antes do
+        SQLite 3.46 o PRAGMA optimize só analisa tabelas usadas pela
+        própria conexão, então a manutenção roda ANALYZE direto.
+
+        ANALYZE escreve em sqlite_stat1: com um escritor ativo o busy
+        timeout curto estoura e a otimização fica para a próxima rodada
+        (o checkpoint da rodada roda do mesmo jeito).
+        """
+        conn = self._conexao()
+        inicio = time.perf_counter()
+        try:
+            conn.execute("PRAGMA analysis_limit=400")
+            if _OPTIMIZE_COMPLETO:
+                conn.execute("PRAGMA optimize=0x10002")
+            else:
+                conn.execute("ANALYZE")
+        except sqlite3.OperationalError as e:
+            db_optimize_total.inc(resultado='bloqueado')
+            return {'bloqueado': True, 'erro': str(e)}
+        finally:
+            duracao = time.perf_counter() - inicio
+            db_maintenance_duration_seconds.observe(duracao, tarefa='optimize')
+        db_optimize_total.inc(resultado='ok')
+        self.estado['ultima_otimizacao'] = time.time()
+        return {'bloqueado': False, 'duracao_ms': round(duracao * 1000, 2)}
+
+    def vacuum_incremental(self) -> int:
+        """
+        Devolve páginas livres ao sistema após deleções grandes
+
+        Só em bancos criados com auto_vacuum=INCREMENTAL (ver
+        LeadsDatabase._migrar_schema); bancos antigos precisariam de um
+        VACUUM completo para mudar o modo e são ignorados.
+        """
+        conn = self._conexao()
+        livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        db_freelist_pages.set(livres)
+
+        if livres < self.vacuum_min_paginas:
+            return 0
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+
+        inicio = time.perf_counter()
+        liberadas = 0
+        try:
+            # Lotes curtos: cada um é uma transação de escrita própria
+            while livres > 0 and not self._parar.is_set():
+                conn.execute(f"PRAGMA incremental_vacuum({VACUUM_LOTE_PAGINAS})").fetchall()
+                restantes = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if restantes >= livres:
+                    break
+                liberadas += livres - restantes
+                livres = restantes
+        except sqlite3.OperationalError as e:
+            logger.info(f"incremental_vacuum adiado: {e}")
+        finally:
+            db_maintenance_duration_seconds.observe(time.perf_counter() - inicio, tarefa='vacuum')
+
+        db_freelist_pages.set(livres)
+        self.estado['paginas_liberadas'] += liberadas
+        return liberadas
+
+    def tamanho_wal(self) -> int:
+        caminho = f"{self.db_path}-wal"
+        return os.path.getsize(caminho) if os.path.exists(caminho) else 0
+
+    def resumo(self) -> Dict[str, Any]:
+        return {
+            **self.estado,
+            'wal_bytes': self.tamanho_wal(),
+            'ativa': bool(self._thread and self._thread.is_alive())
+        }
@@ -0,0 +1,218 @@
+"""
+Introspecção de Memória
+Tamanho das estruturas em memória (rate limiter, caches) e diffs de
+snapshots do tracemalloc para caçar vazamentos sob tráfego contínuo
+"""
+import gc
+import sys
+import tracemalloc
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+# Snapshots guardados (os mais antigos são descartados)
+MAX_SNAPSHOTS = 5
+
+
+def tamanho_profundo(obj: Any, limite: int = 1_000_000) -> int:
+    """
+    Bytes aproximados do objeto e de tudo que ele contém
+
+    Percorre dicts, listas, tuplas e sets (sem contar objetos repetidos);
+    para após `limite` objetos para não travar em estruturas gigantes.
+    """
+    vistos = set()
+    pendentes = [obj]
+    total = 0
+
+    while pendentes and len(vistos) < limite:
+        atual = pendentes.pop()
+        if id(atual) in vistos:
+            continue
+        vistos.add(id(atual))
+        total += sys.getsizeof(atual)
+
+        if isinstance(atual, dict):
+            pendentes.extend(atual.keys())
+            pendentes.extend(atual.values())
+        elif isinstance(atual, (list, tuple, set, frozenset)):
+            pendentes.extend(atual)
+
+    return total
+
+
+def rss_bytes() -> Optional[int]:
+    """Memória residente do processo (Linux /proc; pico via getrusage como fallback)"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for linha in f:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class MonitorMemoria:
+    """
+    Registro de estruturas em memória + snapshots do tracemalloc
+
+    Usage:
+        memoria.registrar('rate_limiter.requests', lambda: dict(rate_limiter.requests))
+        memoria.estruturas()  # {'rate_limiter.requests': {'itens': 12, 'bytes': 4096}}
+    """
+
+    def __init__(self):
+        self._estruturas: Dict[str, Callable[[], Any]] = {}
+        self._snapshots: 'OrderedDict[int, tracemalloc.Snapshot]' = OrderedDict()
+        self._proximo_id = 1
+        self._lock = Lock()
+
+    def registrar(self, nome: str, obter: Callable[[], Any]) -> None:
+        """
+        Acompanha uma estrutura
+
+        Args:
+            nome: Nome exibido no relatório
+            obter: Retorna a estrutura (ou uma cópia rasa feita sob o lock
+                   dela, para não iterar durante escrita de outra thread)
+        """
+        self._estruturas[nome] = obter
+
+    def estruturas(self) -> Dict[str, Dict[str, Any]]:
+        """Itens e bytes aproximados de cada estrutura registrada"""
+        relatorio = {}
+        for nome, obter in sorted(self._estruturas.items()):
+            try:
+                estrutura = obter()
+                relatorio[nome] = {
+                    'itens': len(estrutura) if hasattr(estrutura, '__len__') else None,
+                    'bytes': tamanho_profundo(estrutura)
+                }
+            except Exception as e:
+                relatorio[nome] = {'erro': str(e)}
+        return relatorio
+
+    def contagens(self) -> Dict[str, Optional[int]]:
+        """Só a quantidade de itens de cada estrutura (barato para probes)"""
+        contagens = {}
+        for nome, obter in sorted(self._estruturas.items()):
+            try:
+                estrutura = obter()
+                contagens[nome] = len(estrutura) if hasattr(estrutura, '__len__') else None
+            except Exception:
+                contagens[nome] = None
+        return contagens
+
+    def resumo(self) -> Dict[str, Any]:
+        """RSS, coletor de lixo, estruturas e estado do tracemalloc"""
+        resumo = {
+            'rss_bytes': rss_bytes(),
+            'gc': {
+                'contagens': gc.get_count(),
+                'objetos_rastreados': len(gc.get_objects())
+            },
+            'estruturas': self.estruturas(),
+            'tracemalloc': {'ativo': tracemalloc.is_tracing()}
+        }
+        if tracemalloc.is_tracing():
+            atual, pico = tracemalloc.get_traced_memory()
+            resumo['tracemalloc'].update({
+                'atual_bytes': atual,
+                'pico_bytes': pico,
+                'frames': tracemalloc.get_traceback_limit(),
+                'snapshots': list(self._snapshots)
+            })
+        return resumo
+
+    def snapshot(self, frames: int = 10) -> Dict[str, Any]:
+        """
+        Tira um snapshot (inicia o tracemalloc se necessário)
+
+        O primeiro snapshot só marca a linha de base: alocações feitas antes
+        do tracemalloc iniciar não aparecem nos diffs.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, min(frames, 50)))
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+
+        with self._lock:
+            snapshot_id = self._proximo_id
+            self._proximo_id += 1
+            self._snapshots[snapshot_id] = snapshot
+            while len(self._snapshots) > MAX_SNAPSHOTS:
+                self._snapshots.popitem(last=False)
+
+        atual, pico = tracemalloc.get_traced_memory()
+        return {
+            'snapshot_id': snapshot_id,
+            'atual_bytes': atual,
+            'pico_bytes': pico,
+            'snapshots': list(self._snapshots)
+        }
+
+    def diff(self, de: Optional[int] = None, ate: Optional[int] = None,
+             top: int = 20, agrupar: str = 'lineno') -> Dict[str, Any]:
+        """
+        Maiores diferenças de alocação entre dois snapshots
+
+        Args:
+            de, ate: IDs dos snapshots (padrão: os dois últimos)
+            top: Quantidade de linhas
+            agrupar: 'lineno', 'filename' ou 'traceback'
+
+        Raises:
+            ValueError: snapshots inexistentes ou agrupamento inválido
+        """
+        if agrupar not in ('lineno', 'filename', 'traceback'):
+            raise ValueError("agrupar deve ser lineno, filename ou traceback")
+
+        with self._lock:
+            ids = list(self._snapshots)
+            if de is None and ate is None:
+                if len(ids) < 2:
+                    raise ValueError("São necessários dois snapshots para comparar")
+                de, ate = ids[-2], ids[-1]
+            antigo = self._snapshots.get(de)
+            novo = self._snapshots.get(ate)
+
+        if antigo is None or novo is None:
+            raise ValueError(f"Snapshot inexistente (disponíveis: {ids})")
+
+        estatisticas = novo.compare_to(antigo, agrupar)
+        return {
+            'de': de,
+            'ate': ate,
+            'diferenca_total_bytes': sum(e.size_diff for e in estatisticas),
+            'alocacoes': [self._formatar(e) for e in estatisticas[:top]]
+        }
+
+    @staticmethod
+    def _formatar(estatistica: tracemalloc.StatisticDiff) -> Dict[str, Any]:
+        return {
+            'origem': [f"{frame.filename}:{frame.lineno}" for frame in estatistica.traceback],
+            'bytes': estatistica.size,
+            'diferenca_bytes': estatistica.size_diff,
+            'blocos': estatistica.count,
+            'diferenca_blocos': estatistica.count_diff
+        }
+
+    def parar(self) -> None:
+        """Descarta snapshots e desliga o tracemalloc (remove o overhead)"""
+        with self._lock:
+            self._snapshots.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+# Instância global (compartilhada entre requisições)
+memoria = MonitorMemoria()
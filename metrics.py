@@ -0,0 +1,258 @@
+"""
+Métricas da API no formato Prometheus
+Contadores e histogramas de buckets fixos, seguros para threads Flask
+"""
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import Flask, g, request
+
+# Buckets de latência (segundos) - cobrem de 5ms até o timeout do n8n
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LE_INF = 'le="+Inf"'
+
+
+def _escapar(valor: str) -> str:
+    """Escapa valor de label conforme o formato texto do Prometheus"""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_labels(nomes: Sequence[str], valores: Tuple, extra: str = '') -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _formatar_numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+class Counter:
+    """Contador monotônico com labels"""
+
+    tipo = 'counter'
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self._valores: Dict[Tuple, float] = {}
+        self._lock = Lock()
+
+    def inc(self, valor: float = 1, **labels) -> None:
+        chave = tuple(str(labels.get(nome, '')) for nome in self.labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **labels) -> float:
+        chave = tuple(str(labels.get(nome, '')) for nome in self.labels)
+        return self._valores.get(chave, 0)
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            valores = list(self._valores.items())
+        return [
+            f"{self.nome}{_formatar_labels(self.labels, chave)} {_formatar_numero(v)}"
+            for chave, v in sorted(valores)
+        ]
+
+
+class Gauge:
+    """Valor instantâneo (definido diretamente ou lido de uma função)"""
+
+    tipo = 'gauge'
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = (),
+                 funcao: Optional[Callable[[], float]] = None):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self.funcao = funcao
+        self._valores: Dict[Tuple, float] = {}
+        self._lock = Lock()
+
+    def set(self, valor: float, **labels) -> None:
+        chave = tuple(str(labels.get(nome, '')) for nome in self.labels)
+        with self._lock:
+            self._valores[chave] = valor
+
+    def valor(self, **labels) -> float:
+        if self.funcao:
+            return self.funcao()
+        chave = tuple(str(labels.get(nome, '')) for nome in self.labels)
+        return self._valores.get(chave, 0)
+
+    def exportar(self) -> List[str]:
+        if self.funcao:
+            try:
+                return [f"{self.nome} {_formatar_numero(self.funcao())}"]
+            except Exception:
+                return []
+        with self._lock:
+            valores = list(self._valores.items())
+        return [
+            f"{self.nome}{_formatar_labels(self.labels, chave)} {_formatar_numero(v)}"
+            for chave, v in sorted(valores)
+        ]
+
+
+class Histogram:
+    """
+    Histograma de buckets fixos
+
+    O bucket é calculado fora do lock (bisect); dentro do lock só há
+    incrementos de inteiros, então a contenção entre threads é mínima.
+    """
+
+    tipo = 'histogram'
+
+    def __init__(self, nome: str, descricao: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = BUCKETS_LATENCIA):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # {labels: [contagens por bucket (+Inf no fim), soma, total]}
+        self._series: Dict[Tuple, list] = {}
+        self._lock = Lock()
+
+    def observe(self, valor: float, **labels) -> None:
+        chave = tuple(str(labels.get(nome, '')) for nome in self.labels)
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def quantil(self, q: float, **labels) -> Optional[float]:
+        """Estimativa do quantil q (0-1) pelo limite superior do bucket"""
+        chave = tuple(str(labels.get(nome, '')) for nome in self.labels)
+        with self._lock:
+            serie = self._series.get(chave)
+            if not serie or not serie[2]:
+                return None
+            contagens, total = list(serie[0]), serie[2]
+
+        alvo = q * total
+        acumulado = 0
+        for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float('inf')
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            series = [(chave, list(s[0]), s[1], s[2]) for chave, s in self._series.items()]
+
+        linhas = []
+        for chave, contagens, soma, total in sorted(series):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                le = f'le="{_formatar_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_labels(self.labels, chave, le)} {acumulado}")
+            linhas.append(f"{self.nome}_bucket{_formatar_labels(self.labels, chave, LE_INF)} {total}")
+            linhas.append(f"{self.nome}_sum{_formatar_labels(self.labels, chave)} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_formatar_labels(self.labels, chave)} {total}")
+        return linhas
+
+
+class MetricsRegistry:
+    """Registro de métricas exportadas em /metrics"""
+
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._lock = Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            existente = self._metricas.get(metrica.nome)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nome] = metrica
+            return metrica
+
+    def counter(self, nome: str, descricao: str, labels: Sequence[str] = ()) -> Counter:
+        return self._registrar(Counter(nome, descricao, labels))
+
+    def gauge(self, nome: str, descricao: str, labels: Sequence[str] = (),
+              funcao: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._registrar(Gauge(nome, descricao, labels, funcao))
+
+    def histogram(self, nome: str, descricao: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histogram:
+        return self._registrar(Histogram(nome, descricao, labels, buckets))
+
+    def obter(self, nome: str):
+        return self._metricas.get(nome)
+
+    def exportar(self) -> str:
+        """Gera o texto no formato de exposição do Prometheus (v0.0.4)"""
+        with self._lock:
+            metricas = list(self._metricas.values())
+
+        linhas = []
+        for metrica in sorted(metricas, key=lambda m: m.nome):
+            linhas.append(f"# HELP {metrica.nome} {metrica.descricao}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.exportar())
+        return '\n'.join(linhas) + '\n'
+
+
+# Instância global (compartilhada entre requisições)
+metrics = MetricsRegistry()
+
+http_requests_total = metrics.counter(
+    'http_requests_total', 'Total de requisições HTTP', ('route', 'method', 'status')
+)
+http_request_duration_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'Latência das requisições HTTP', ('route', 'method', 'status')
+)
+rate_limit_rejections_total = metrics.counter(
+    'rate_limit_rejections_total', 'Requisições recusadas pelo rate limit (429)', ('route',)
+)
+duplicate_rejections_total = metrics.counter(
+    'duplicate_rejections_total', 'Requisições recusadas por deduplicação (409)', ('route',)
+)
+db_lock_failures_total = metrics.counter(
+    'db_lock_failures_total', 'Requisições que falharam com database locked (503)', ('route',)
+)
+
+
+def rota_atual() -> str:
+    """Rota da requisição (regra, não o path) para manter a cardinalidade baixa"""
+    return request.url_rule.rule if request.url_rule else 'nao_mapeada'
+
+
+def init_metrics(app: Flask) -> None:
+    """
+    Registra hooks de medição de latência na aplicação
+
+    Usage:
+        app = Flask(__name__)
+        init_metrics(app)
+    """
+    @app.before_request
+    def _iniciar_cronometro():
+        g.inicio_requisicao = time.perf_counter()
+
+    @app.after_request
+    def _registrar_requisicao(response):
+        inicio = g.pop('inicio_requisicao', None)
+        if inicio is not None:
+            labels = {
+                'route': rota_atual(),
+                'method': request.method,
+                'status': response.status_code
+            }
+            http_requests_total.inc(**labels)
+            http_request_duration_seconds.observe(time.perf_counter() - inicio, **labels)
+        return response
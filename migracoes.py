@@ -0,0 +1,284 @@
+"""
+Migrações Versionadas do Schema
+Migrações numeradas aplicadas uma única vez, em transação, com a versão
+guardada em PRAGMA user_version. Com o schema em dia, o boot é só a
+leitura desse PRAGMA
+"""
+import logging
+import sqlite3
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from disponibilidade import CHAVE_REGRAS, GradeAgenda, bitmap_para_blob
+
+logger = logging.getLogger(__name__)
+
+# (versão, descrição, função(cursor, db)); `db` é o LeadsDatabase dono do arquivo
+# Cada migração traz o próprio SQL: métodos do `db` mudam junto com o schema atual
+Migracao = Tuple[int, str, Callable[[sqlite3.Cursor, Any], None]]
+
+
+def _colunas(cursor: sqlite3.Cursor, tabela: str) -> List[str]:
+    return [linha[1] for linha in cursor.execute(f"PRAGMA table_info({tabela})").fetchall()]
+
+
+def _m1_tabelas_base(cursor: sqlite3.Cursor, db: Any) -> None:
+    # Tabela principal de leads
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            whatsapp TEXT UNIQUE NOT NULL,
+            nome TEXT NOT NULL,
+            imovel_id INTEGER,
+            score INTEGER CHECK(score >= 0 AND score <= 100) DEFAULT 0,
+            agendou_visita BOOLEAN DEFAULT 0,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Histórico de mudanças de score
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS score_historico (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            whatsapp TEXT NOT NULL,
+            score_anterior INTEGER,
+            score_novo INTEGER,
+            motivo TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (whatsapp) REFERENCES leads(whatsapp)
+        )
+    """)
+
+    # Tabela de agendamentos
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS agendamentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome_cliente TEXT NOT NULL,
+            whatsapp TEXT NOT NULL,
+            imovel_id INTEGER NOT NULL,
+            data_visita DATE NOT NULL,
+            hora_visita TIME NOT NULL,
+            status TEXT CHECK(status IN ('agendado', 'confirmado', 'realizado', 'cancelado')) DEFAULT 'agendado',
+            observacoes TEXT,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Tabela de configurações (para observações da agenda)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS configuracoes (
+            chave TEXT PRIMARY KEY,
+            valor TEXT,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_whatsapp ON leads(whatsapp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_score ON leads(score)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_imovel ON leads(imovel_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agendou ON leads(agendou_visita)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agendamentos_status ON agendamentos(status)")
+
+
+def _m2_usuarios(cursor: sqlite3.Cursor, db: Any) -> None:
+    # Usuários OAuth (auth/models.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            google_id TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            name TEXT,
+            picture TEXT,
+            access_token TEXT,
+            refresh_token TEXT,
+            token_expires_at TIMESTAMP,
+            approved INTEGER DEFAULT 0,
+            is_admin INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+    """)
+
+    # Bancos criados antes da aprovação de usuários - ANTES dos índices
+    colunas = _colunas(cursor, 'users')
+    if 'approved' not in colunas:
+        cursor.execute("ALTER TABLE users ADD COLUMN approved INTEGER DEFAULT 0")
+    if 'is_admin' not in colunas:
+        cursor.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER DEFAULT 0")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_google_id ON users(google_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email ON users(email)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_approved ON users(approved)")
+
+
+def _m3_indices_agenda(cursor: sqlite3.Cursor, db: Any) -> None:
+    # Índices compostos na ordem de listar_agendamentos (data, hora):
+    # consultas por período e por imóvel+período saem ordenadas do índice.
+    # idx_agendamentos_data_hora substitui o antigo idx_agendamentos_data
+    cursor.execute("DROP INDEX IF EXISTS idx_agendamentos_data")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agendamentos_data_hora ON agendamentos(data_visita, hora_visita)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agendamentos_imovel_data ON agendamentos(imovel_id, data_visita, hora_visita)")
+
+
+def _m4_slot_ativo_unico(cursor: sqlite3.Cursor, db: Any) -> None:
+    # Impede double-booking no banco: um único agendamento ativo por
+    # imóvel/data/hora. Bancos antigos com duplicatas têm as repetições
+    # canceladas antes (fica o agendamento mais antigo de cada horário),
+    # senão o índice nunca seria criado justamente onde faz falta
+    mantidos: Dict[Tuple[Any, Any, Any], int] = {}
+    duplicados: List[Tuple[int, int]] = []
+    for agendamento_id, imovel_id, data_visita, hora_visita in cursor.execute("""
+        SELECT id, imovel_id, data_visita, hora_visita FROM agendamentos
+        WHERE status != 'cancelado' ORDER BY id
+    """).fetchall():
+        mantido = mantidos.setdefault((imovel_id, data_visita, hora_visita), agendamento_id)
+        if mantido != agendamento_id:
+            duplicados.append((agendamento_id, mantido))
+
+    for agendamento_id, mantido in duplicados:
+        cursor.execute("""
+            UPDATE agendamentos
+            SET status = 'cancelado',
+                observacoes = TRIM(COALESCE(observacoes, '') || ' ' || ?)
+            WHERE id = ?
+        """, (f"[cancelado na migração 4: mesmo horário do agendamento #{mantido}]", agendamento_id))
+    if duplicados:
+        logger.warning(
+            f"Migração 4: {len(duplicados)} agendamento(s) duplicado(s) cancelado(s): "
+            + ', '.join(f"#{agendamento_id} (mantido #{mantido})" for agendamento_id, mantido in duplicados)
+        )
+
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_agendamentos_slot_ativo
+        ON agendamentos(imovel_id, data_visita, hora_visita)
+        WHERE status != 'cancelado'
+    """)
+
+
+def _m5_agenda_slots(cursor: sqlite3.Cursor, db: Any) -> None:
+    # Bitmap de slots ocupados por imóvel/dia (ver disponibilidade.py)
+    # Mantido a cada escrita em agendamentos
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS agenda_slots (
+            imovel_id INTEGER NOT NULL,
+            data_visita DATE NOT NULL,
+            ocupados BLOB NOT NULL,
+            PRIMARY KEY (imovel_id, data_visita)
+        ) WITHOUT ROWID
+    """)
+
+    # Backfill congelado no schema da versão 5 (não chamar o LeadsDatabase:
+    # a versão atual pode depender de colunas de migrações posteriores)
+    linha = cursor.execute(
+        "SELECT valor FROM configuracoes WHERE chave = ?", (CHAVE_REGRAS,)
+    ).fetchone()
+    grade = GradeAgenda.de_json(linha[0] if linha else None)
+
+    horas_por_dia: Dict[Tuple[int, str], List[str]] = {}
+    for imovel_id, data_visita, hora_visita in cursor.execute("""
+        SELECT imovel_id, data_visita, hora_visita FROM agendamentos
+        WHERE status != 'cancelado'
+    """).fetchall():
+        horas_por_dia.setdefault((imovel_id, data_visita), []).append(hora_visita)
+
+    cursor.execute("DELETE FROM agenda_slots")
+    cursor.executemany(
+        "INSERT INTO agenda_slots (imovel_id, data_visita, ocupados) VALUES (?, ?, ?)",
+        [
+            (imovel_id, data_visita, bitmap_para_blob(grade.ocupacao(horas)))
+            for (imovel_id, data_visita), horas in horas_por_dia.items()
+        ]
+    )
+
+
+def _m6_agenda_ocupacao(cursor: sqlite3.Cursor, db: Any) -> None:
+    # Rollup de ocupação por dia/status (calendário e estatísticas da agenda)
+    # Mantido a cada escrita em agendamentos
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS agenda_ocupacao (
+            data_visita DATE NOT NULL,
+            status TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (data_visita, status)
+        ) WITHOUT ROWID
+    """)
+
+    # Backfill congelado no schema da versão 6
+    cursor.execute("DELETE FROM agenda_ocupacao")
+    cursor.execute("""
+        INSERT INTO agenda_ocupacao (data_visita, status, total)
+        SELECT data_visita, status, COUNT(*)
+        FROM agendamentos
+        GROUP BY data_visita, status
+    """)
+
+
+# Só acrescentar no fim: uma migração aplicada nunca muda de número.
+# Todas usam IF NOT EXISTS porque bancos anteriores ao user_version
+# (versão 0) já têm parte do schema
+MIGRACOES: List[Migracao] = [
+    (1, 'tabelas de leads, histórico, agendamentos e configurações', _m1_tabelas_base),
+    (2, 'tabela de usuários OAuth', _m2_usuarios),
+    (3, 'índices compostos da agenda', _m3_indices_agenda),
+    (4, 'índice único de slot ativo', _m4_slot_ativo_unico),
+    (5, 'bitmaps de slots da agenda', _m5_agenda_slots),
+    (6, 'rollup de ocupação da agenda', _m6_agenda_ocupacao),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+def versao_schema(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar(conn: sqlite3.Connection, db: Any,
+           migracoes: Optional[List[Migracao]] = None) -> Dict[str, Any]:
+    """
+    Aplica as migrações pendentes numa única transação
+
+    Com o schema em dia, custa só a leitura do user_version. Pendências
+    rodam sob BEGIN IMMEDIATE e a versão é relida dentro do lock: se
+    outro worker migrou enquanto este esperava, nada é reaplicado. Em
+    caso de erro a transação inteira é desfeita (DDL no SQLite é
+    transacional), inclusive o user_version.
+
+    Args:
+        conn: Conexão de escrita (isolation_level padrão)
+        db: LeadsDatabase passado às migrações
+        migracoes: Lista ordenada (padrão: MIGRACOES)
+
+    Returns:
+        Dict com versao_anterior, versao e aplicadas
+    """
+    migracoes = MIGRACOES if migracoes is None else migracoes
+    alvo = migracoes[-1][0] if migracoes else 0
+
+    versao = versao_schema(conn)
+    if versao >= alvo:
+        if versao > alvo:
+            logger.warning(f"Schema na versão {versao}, mais nova que a do código ({alvo})")
+        return {'versao_anterior': versao, 'versao': versao, 'aplicadas': []}
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        versao = versao_schema(conn)
+        cursor = conn.cursor()
+        aplicadas = []
+        for numero, descricao, funcao in migracoes:
+            if numero <= versao:
+                continue
+            funcao(cursor, db)
+            aplicadas.append(numero)
+            logger.info(f"Migração {numero} aplicada: {descricao}")
+
+        if aplicadas:
+            # PRAGMA user_version não aceita parâmetro; número vem da lista
+            conn.execute(f"PRAGMA user_version = {int(aplicadas[-1])}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {'versao_anterior': versao, 'versao': max([versao] + aplicadas), 'aplicadas': aplicadas}
@@ -0,0 +1,137 @@
+"""
+Pool de Conexões Somente Leitura
+Conexões abertas com mode=ro e PRAGMA query_only para os métodos de
+leitura: leituras pesadas do dashboard nunca pegam lock de escrita
+"""
+import os
+import queue
+import sqlite3
+import weakref
+from typing import Any, Dict, Optional
+
+from metrics import metrics
+from query_stats import ConexaoInstrumentada, registrar_conexao_obtida
+
+# Conexões ociosas mantidas abertas (0 desliga o pool)
+TAMANHO_POOL = int(os.getenv('DB_READ_POOL_SIZE', '8'))
+
+# Busy timeout das leituras: em WAL só esperam em recuperação/checkpoint RESTART
+TIMEOUT_LEITURA_S = float(os.getenv('DB_READ_TIMEOUT_S', '5'))
+
+db_read_connections_total = metrics.counter(
+    'db_read_connections_total', 'Conexões de leitura entregues pelo pool', ('origem',)
+)
+
+
+class ConexaoLeitura(ConexaoInstrumentada):
+    """
+    Conexão do pool: close() devolve ao pool em vez de fechar
+
+    Mantém o padrão `conn = ...; ...; conn.close()` dos métodos do
+    LeadsDatabase sem mudar o corpo deles. Os cursores abertos ficam
+    registrados para serem fechados na devolução (ver fechar_cursores).
+    """
+
+    _pool: Optional['PoolLeitura'] = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursores: 'weakref.WeakSet[sqlite3.Cursor]' = weakref.WeakSet()
+
+    def cursor(self, *args, **kwargs):
+        cursor = super().cursor(*args, **kwargs)
+        self._cursores.add(cursor)
+        return cursor
+
+    def fechar_cursores(self) -> None:
+        """
+        Fecha os cursores ainda vivos: um SELECT lido pela metade mantém o
+        statement ativo e, com ele, o snapshot do WAL, mesmo fora de
+        transação (autocommit)
+        """
+        for cursor in list(self._cursores):
+            cursor.close()
+        self._cursores.clear()
+
+    def close(self):
+        if self._pool is None:
+            return super().close()
+        self._pool._devolver(self)
+
+    def fechar(self):
+        """Fecha de verdade (usado pelo pool)"""
+        super().close()
+
+
+class PoolLeitura:
+    """
+    Pool LIFO de conexões somente leitura para um arquivo SQLite
+
+    O pool guarda só as conexões ociosas: quem pede com o pool vazio
+    recebe uma conexão nova, e conexões que não voltam (exceção antes do
+    close) não travam o pool. Acima de `tamanho`, as devolvidas são fechadas.
+
+    Usage:
+        pool = PoolLeitura('data/dashboard.db')
+        conn = pool.obter()
+        conn.execute("SELECT ...").fetchall()
+        conn.close()  # volta para o pool
+    """
+
+    def __init__(self, db_path: str, tamanho: int = TAMANHO_POOL,
+                 timeout: float = TIMEOUT_LEITURA_S):
+        self.db_path = db_path
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self._ociosas: 'queue.LifoQueue[ConexaoLeitura]' = queue.LifoQueue()
+        self._fechado = False
+
+    def _abrir(self) -> ConexaoLeitura:
+        caminho = os.path.abspath(self.db_path)
+        conn = sqlite3.connect(
+            f"file:{caminho}?mode=ro",
+            uri=True,
+            timeout=self.timeout,
+            check_same_thread=False,  # Conexão migra entre threads do Flask
+            factory=ConexaoLeitura
+        )
+        # Cursor base: o PRAGMA de setup não entra nas contagens da requisição
+        sqlite3.Cursor(conn).execute("PRAGMA query_only=1")
+        conn.row_factory = sqlite3.Row
+        conn._pool = self
+        return conn
+
+    def obter(self) -> ConexaoLeitura:
+        """Conexão ociosa do pool ou uma nova"""
+        try:
+            conn = self._ociosas.get_nowait()
+            registrar_conexao_obtida()
+            db_read_connections_total.inc(origem='pool')
+            return conn
+        except queue.Empty:
+            db_read_connections_total.inc(origem='nova')
+            return self._abrir()
+
+    def _devolver(self, conn: ConexaoLeitura) -> None:
+        # Encerra leituras pendentes para não segurar o snapshot do WAL
+        # (o que atrasaria checkpoints) enquanto a conexão está ociosa:
+        # statements abertos por cursores não consumidos e transações
+        conn.fechar_cursores()
+        if conn.in_transaction:
+            conn.rollback()
+        if self._fechado or self._ociosas.qsize() >= self.tamanho:
+            conn.fechar()
+            return
+        self._ociosas.put(conn)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {'tamanho': self.tamanho, 'ociosas': self._ociosas.qsize()}
+
+    def fechar(self) -> None:
+        """Fecha as conexões ociosas (as emprestadas fecham ao voltar)"""
+        self._fechado = True
+        while True:
+            try:
+                self._ociosas.get_nowait().fechar()
+            except queue.Empty:
+                return
@@ -0,0 +1,141 @@
+"""
+Profiler por Amostragem
+Amostra as pilhas de todas as threads (sys._current_frames) sem instrumentar
+o código; saída em collapsed stacks (flamegraph) ou tabela de funções
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+# Limites do endpoint (duração e intervalo entre amostras)
+MAX_SEGUNDOS = 60
+INTERVALO_PADRAO_MS = 10
+
+# Threads paradas nestes módulos estão ociosas (aguardando socket/fila/lock)
+_MODULOS_OCIOSOS = ('threading.py', 'selectors.py', 'socketserver.py', 'queue.py', 'socket.py')
+
+Frame = Tuple[str, str, int]  # (arquivo, função, linha da definição)
+
+
+class ProfileEmAndamento(Exception):
+    """Já existe uma amostragem rodando"""
+
+
+def _pilha(frame) -> Tuple[Frame, ...]:
+    """Pilha do frame até a raiz, da raiz para a folha"""
+    pilha = []
+    while frame is not None:
+        codigo = frame.f_code
+        pilha.append((codigo.co_filename, codigo.co_name, codigo.co_firstlineno))
+        frame = frame.f_back
+    pilha.reverse()
+    return tuple(pilha)
+
+
+def _rotulo(frame: Frame) -> str:
+    arquivo, funcao, linha = frame
+    return f"{funcao} ({os.path.basename(arquivo)}:{linha})"
+
+
+class Profiler:
+    """
+    Amostrador de pilhas com execução única
+
+    A thread que chama amostrar() lê sys._current_frames() a cada intervalo
+    e conta pilhas idênticas. O custo fica nessa thread (segura o GIL por
+    alguns µs por amostra); as threads de requisição não são instrumentadas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def em_andamento(self) -> bool:
+        return self._lock.locked()
+
+    def amostrar(self, segundos: float, intervalo_ms: float = INTERVALO_PADRAO_MS,
+                 incluir_ociosas: bool = False) -> Dict[str, Any]:
+        """
+        Amostra todas as threads por `segundos` (bloqueia o chamador)
+
+        Raises:
+            ProfileEmAndamento: se outra amostragem estiver rodando
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfileEmAndamento()
+
+        try:
+            segundos = min(max(segundos, 0.1), MAX_SEGUNDOS)
+            intervalo = min(max(intervalo_ms, 1), 100) / 1000
+            ignorar = {threading.get_ident()}
+
+            pilhas: Counter = Counter()
+            amostras = 0
+            inicio = time.perf_counter()
+            fim = inicio + segundos
+
+            while time.perf_counter() < fim:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id in ignorar:
+                        continue
+                    pilha = _pilha(frame)
+                    if not incluir_ociosas and pilha and os.path.basename(pilha[-1][0]) in _MODULOS_OCIOSOS:
+                        continue
+                    pilhas[pilha] += 1
+                amostras += 1
+                time.sleep(intervalo)
+
+            return {
+                'segundos': round(time.perf_counter() - inicio, 3),
+                'intervalo_ms': intervalo * 1000,
+                'amostras': amostras,
+                'pilhas': pilhas
+            }
+        finally:
+            self._lock.release()
+
+
+def collapsed(pilhas: Counter) -> str:
+    """Formato 'raiz;...;folha contagem' (flamegraph.pl, speedscope)"""
+    linhas = [
+        f"{';'.join(_rotulo(frame) for frame in pilha)} {contagem}"
+        for pilha, contagem in pilhas.most_common()
+    ]
+    return '\n'.join(linhas) + '\n' if linhas else ''
+
+
+def top_funcoes(pilhas: Counter, n: int = 30) -> List[Dict[str, Any]]:
+    """
+    Funções com mais amostras
+
+    'proprio' conta amostras com a função na folha (CPU na própria função);
+    'inclusivo' conta amostras com a função em qualquer ponto da pilha.
+    """
+    total = sum(pilhas.values()) or 1
+    proprio: Counter = Counter()
+    inclusivo: Counter = Counter()
+
+    for pilha, contagem in pilhas.items():
+        if not pilha:
+            continue
+        proprio[pilha[-1]] += contagem
+        for frame in set(pilha):
+            inclusivo[frame] += contagem
+
+    return [
+        {
+            'funcao': _rotulo(frame),
+            'proprio': proprio[frame],
+            'inclusivo': contagem,
+            'proprio_pct': round(proprio[frame] * 100 / total, 1),
+            'inclusivo_pct': round(contagem * 100 / total, 1)
+        }
+        for frame, contagem in sorted(inclusivo.items(), key=lambda item: (proprio[item[0]], item[1]), reverse=True)[:n]
+    ]
+
+
+# Instância global (uma amostragem por processo)
+profiler = Profiler()
@@ -0,0 +1,147 @@
+"""
+Probe de Prontidão (readiness)
+Verifica banco, WAL, disco, catálogo e estruturas em memória; 503 com os
+motivos quando algum limite é ultrapassado
+"""
+import os
+import shutil
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from memoria import memoria
+
+# Limites (sobrescrevíveis por variável de ambiente)
+MAX_LATENCIA_DB_MS = float(os.getenv('READY_MAX_DB_MS', '500'))
+MAX_WAL_MB = float(os.getenv('READY_MAX_WAL_MB', '256'))
+MAX_WAL_PENDENTES = int(os.getenv('READY_MAX_WAL_PENDENTES', '50000'))
+MIN_DISCO_MB = float(os.getenv('READY_MIN_DISCO_MB', '100'))
+MAX_ITENS_ESTRUTURA = int(os.getenv('READY_MAX_ITENS', '100000'))
+
+# Cada verificação retorna (detalhes, motivos de falha)
+Verificacao = Callable[[], Tuple[Dict[str, Any], List[str]]]
+
+
+def verificar_banco(db, manutencao=None) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    SELECT 1, tamanho do WAL e frames pendentes de checkpoint
+
+    Não executa checkpoint: os frames pendentes e a idade do último
+    checkpoint completo vêm do estado da ManutencaoBanco (None enquanto
+    ela não rodou).
+    """
+    try:
+        detalhes = db.diagnostico_armazenamento()
+    except Exception as e:
+        return {'erro': str(e)}, [f"banco inacessível: {e}"]
+
+    if manutencao is not None:
+        estado = manutencao.estado
+        ultimo = estado['ultimo_checkpoint']
+        detalhes['wal_pendentes'] = estado['wal_pendentes']
+        detalhes['checkpoint_atraso_s'] = round(time.time() - ultimo, 1) if ultimo else None
+
+    motivos = []
+    if detalhes['latencia_ms'] > MAX_LATENCIA_DB_MS:
+        motivos.append(f"SELECT 1 levou {detalhes['latencia_ms']}ms (limite {MAX_LATENCIA_DB_MS:g}ms)")
+    if detalhes['wal_bytes'] > MAX_WAL_MB * 1024 * 1024:
+        motivos.append(f"WAL com {detalhes['wal_bytes'] / 1024 / 1024:.1f}MB (limite {MAX_WAL_MB:g}MB)")
+    if (detalhes.get('wal_pendentes') or 0) > MAX_WAL_PENDENTES:
+        motivos.append(f"{detalhes['wal_pendentes']} frames do WAL sem checkpoint (limite {MAX_WAL_PENDENTES})")
+    return detalhes, motivos
+
+
+def verificar_disco(diretorio: str) -> Tuple[Dict[str, Any], List[str]]:
+    """Espaço livre no diretório de dados"""
+    try:
+        uso = shutil.disk_usage(diretorio)
+    except OSError as e:
+        return {'erro': str(e)}, [f"disco inacessível: {e}"]
+
+    livre_mb = uso.free / 1024 / 1024
+    detalhes = {'livre_mb': round(livre_mb, 1), 'total_mb': round(uso.total / 1024 / 1024, 1)}
+    if livre_mb < MIN_DISCO_MB:
+        return detalhes, [f"disco com {livre_mb:.0f}MB livres (mínimo {MIN_DISCO_MB:g}MB)"]
+    return detalhes, []
+
+
+def verificar_catalogo(contar_imoveis: Callable[[], int]) -> Tuple[Dict[str, Any], List[str]]:
+    """Catálogo (INDICE.json ou snapshot) legível; contar_imoveis retorna o total"""
+    try:
+        total = contar_imoveis()
+    except Exception as e:
+        return {'erro': str(e)}, [f"catálogo ilegível: {e}"]
+    return {'imoveis': total}, []
+
+
+def verificar_aquecimento(aquecimento) -> Tuple[Dict[str, Any], List[str]]:
+    """Caches do boot carregados (ver aquecimento.py); None = desativado"""
+    if aquecimento is None:
+        return {'estado': 'desativado'}, []
+    estado = aquecimento.estado()
+    if not aquecimento.concluido:
+        return estado, [f"aquecimento {estado['estado']}"]
+    return estado, []
+
+
+def verificar_estruturas() -> Tuple[Dict[str, Any], List[str]]:
+    """Quantidade de itens no rate limiter e caches registrados"""
+    contagens = memoria.contagens()
+    motivos = [
+        f"{nome} com {itens} itens (limite {MAX_ITENS_ESTRUTURA})"
+        for nome, itens in contagens.items()
+        if itens is not None and itens > MAX_ITENS_ESTRUTURA
+    ]
+    return contagens, motivos
+
+
+class ProbeProntidao:
+    """
+    Executa as verificações e guarda o resultado por `ttl` segundos
+
+    Probes frequentes (traefik, docker) reutilizam o último resultado;
+    só uma thread recalcula quando o cache expira.
+
+    Usage:
+        probe = ProbeProntidao()
+        probe.registrar('banco', lambda: verificar_banco(db))
+        pronto, relatorio = probe.verificar()
+    """
+
+    def __init__(self, ttl: float = 1.0):
+        self.ttl = ttl
+        self._verificacoes: Dict[str, Verificacao] = {}
+        self._resultado: Optional[Tuple[bool, Dict[str, Any]]] = None
+        self._expira_em = 0.0
+        self._lock = Lock()
+
+    def registrar(self, nome: str, verificacao: Verificacao) -> None:
+        self._verificacoes[nome] = verificacao
+        self._expira_em = 0.0
+
+    def verificar(self) -> Tuple[bool, Dict[str, Any]]:
+        """(pronto, relatório com detalhes por verificação e motivos)"""
+        with self._lock:
+            agora = time.monotonic()
+            if self._resultado is not None and agora < self._expira_em:
+                return self._resultado
+
+            inicio = time.perf_counter()
+            verificacoes = {}
+            motivos = []
+            for nome, verificacao in self._verificacoes.items():
+                try:
+                    detalhes, falhas = verificacao()
+                except Exception as e:
+                    detalhes, falhas = {'erro': str(e)}, [f"{nome}: {e}"]
+                verificacoes[nome] = {'ok': not falhas, **detalhes}
+                motivos.extend(falhas)
+
+            relatorio = {
+                'verificacoes': verificacoes,
+                'motivos': motivos,
+                'duracao_ms': round((time.perf_counter() - inicio) * 1000, 2)
+            }
+            self._resultado = (not motivos, relatorio)
+            self._expira_em = time.monotonic() + self.ttl
+            return self._resultado
@@ -0,0 +1,393 @@
+"""
+Instrumentação de Consultas SQLite
+Mede cada statement, agrega por SQL normalizado e registra consultas lentas
+"""
+import logging
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional
+
+from flask import Flask, g
+
+import timing
+from memoria import memoria
+from metrics import metrics, rota_atual
+
+logger = logging.getLogger(__name__)
+
+# Statements acima deste tempo são logados com EXPLAIN QUERY PLAN
+LIMITE_LENTO_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+
+db_query_duration_seconds = metrics.histogram(
+    'db_query_duration_seconds', 'Latência dos statements SQLite', ('operacao',),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+db_slow_queries_total = metrics.counter(
+    'db_slow_queries_total', 'Statements acima do limite de consulta lenta', ('operacao',)
+)
+http_request_db_queries = metrics.histogram(
+    'http_request_db_queries', 'Statements SQL executados por requisição', ('route',),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+http_request_db_connections = metrics.histogram(
+    'http_request_db_connections', 'Conexões SQLite obtidas por requisição (novas ou do pool de leitura)', ('route',),
+    buckets=(0, 1, 2, 3, 5, 10)
+)
+
+HEADER_CONSULTAS = 'X-DB-Queries'
+HEADER_CONEXOES = 'X-DB-Connections'
+
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACOS = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def normalizar_sql(sql: str) -> str:
+    """
+    Normaliza SQL para agregação: colapsa espaços e troca literais por ?
+
+    Os statements do LeadsDatabase são strings constantes com parâmetros,
+    então o cache acerta praticamente sempre e o custo por chamada é O(1).
+    """
+    return _ESPACOS.sub(' ', _LITERAIS.sub('?', sql)).strip()
+
+
+@lru_cache(maxsize=1024)
+def _operacao(sql_normalizado: str) -> str:
+    return sql_normalizado.split(' ', 1)[0].upper() if sql_normalizado else ''
+
+
+class QueryStats:
+    """
+    Agregado de tempo por SQL normalizado
+
+    Cada entrada guarda chamadas, tempo total, tempo máximo e (para
+    consultas lentas) o último plano de execução observado.
+    """
+
+    def __init__(self, limite_lento_ms: float = LIMITE_LENTO_MS):
+        self.limite_lento_ms = limite_lento_ms
+        self.habilitado = os.getenv('SQL_STATS', '1') != '0'
+        self._consultas: Dict[str, list] = {}
+        self._planos: Dict[str, str] = {}
+        self._lock = Lock()
+
+    def registrar(self, sql_normalizado: str, segundos: float, nova_chamada: bool = True) -> None:
+        """Soma tempo ao statement (nova_chamada=False para tempo de fetch)"""
+        with self._lock:
+            entrada = self._consultas.get(sql_normalizado)
+            if entrada is None:
+                entrada = self._consultas[sql_normalizado] = [0, 0.0, 0.0]
+            if nova_chamada:
+                entrada[0] += 1
+            entrada[1] += segundos
+            if segundos > entrada[2]:
+                entrada[2] = segundos
+
+        if nova_chamada:
+            db_query_duration_seconds.observe(segundos, operacao=_operacao(sql_normalizado))
+
+    def registrar_lenta(self, conn: sqlite3.Connection, sql: str, sql_normalizado: str,
+                        params: Any, segundos: float) -> None:
+        """Loga consulta lenta com EXPLAIN QUERY PLAN"""
+        db_slow_queries_total.inc(operacao=_operacao(sql_normalizado))
+
+        plano = self._planos.get(sql_normalizado)
+        if plano is None:
+            plano = self._explicar(conn, sql, params)
+            with self._lock:
+                self._planos[sql_normalizado] = plano
+
+        logger.warning(
+            f"Slow query ({segundos * 1000:.1f}ms): {sql_normalizado}\n"
+            f"  Plano: {plano}"
+        )
+
+    def _explicar(self, conn: sqlite3.Connection, sql: str, params: Any) -> str:
+        if not sql.lstrip().upper().startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')):
+            return ''
+        try:
+            # Cursor base (não instrumentado) para não medir o próprio EXPLAIN
+            cursor = sqlite3.Cursor(conn)
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())
+            return ' | '.join(row[3] for row in cursor.fetchall())
+        except sqlite3.Error as e:
+            return f"(indisponível: {e})"
+
+    def top(self, n: int = 20, ordem: str = 'total') -> List[Dict[str, Any]]:
+        """
+        Statements mais custosos
+
+        Args:
+            n: Quantidade de statements
+            ordem: 'total', 'media', 'max' ou 'chamadas'
+        """
+        with self._lock:
+            itens = [(sql, list(valores)) for sql, valores in self._consultas.items()]
+            planos = dict(self._planos)
+
+        linhas = [
+            {
+                'sql': sql,
+                'chamadas': chamadas,
+                'total_ms': round(total * 1000, 3),
+                'media_ms': round(total * 1000 / chamadas, 3) if chamadas else 0,
+                'max_ms': round(maximo * 1000, 3),
+                'plano': planos.get(sql)
+            }
+            for sql, (chamadas, total, maximo) in itens
+        ]
+
+        chave = {'total': 'total_ms', 'media': 'media_ms', 'max': 'max_ms', 'chamadas': 'chamadas'}.get(ordem, 'total_ms')
+        linhas.sort(key=lambda linha: linha[chave], reverse=True)
+        return linhas[:n]
+
+    def copiar_consultas(self) -> Dict[str, list]:
+        """Cópia do agregado (sob o lock: registrar pode inserir em paralelo)"""
+        with self._lock:
+            return dict(self._consultas)
+
+    def copiar_planos(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._planos)
+
+    def resetar(self) -> None:
+        with self._lock:
+            self._consultas.clear()
+            self._planos.clear()
+
+
+# Instância global (compartilhada entre conexões)
+query_stats = QueryStats()
+
+memoria.registrar('query_stats.consultas', query_stats.copiar_consultas)
+memoria.registrar('query_stats.planos', query_stats.copiar_planos)
+
+
+# ==================== CONTAGEM POR REQUISIÇÃO ====================
+
+class ContagemConsultas:
+    """
+    Statements e conexões de uma requisição (ou de um bloco em testes)
+
+    Contagens aninhadas também somam na externa: um teste envolvendo uma
+    chamada do test client vê as consultas feitas dentro da requisição.
+    """
+
+    __slots__ = ('consultas', 'conexoes', 'sql', 'externa')
+
+    def __init__(self, detalhar: bool = False, externa: Optional['ContagemConsultas'] = None):
+        self.consultas = 0
+        self.conexoes = 0
+        self.sql: Optional[List[str]] = [] if detalhar else None
+        self.externa = externa
+
+
+_contagem_atual: ContextVar[Optional[ContagemConsultas]] = ContextVar('contagem_consultas', default=None)
+
+
+def _contar_consulta(sql: str) -> None:
+    contagem = _contagem_atual.get()
+    while contagem is not None:
+        contagem.consultas += 1
+        if contagem.sql is not None:
+            contagem.sql.append(normalizar_sql(sql))
+        contagem = contagem.externa
+
+
+def registrar_conexao_obtida() -> None:
+    """Conta uma conexão obtida (chamado ao abrir e ao reaproveitar do pool)"""
+    contagem = _contagem_atual.get()
+    while contagem is not None:
+        contagem.conexoes += 1
+        contagem = contagem.externa
+
+
+@contextmanager
+def contar_consultas(detalhar: bool = False) -> Iterator[ContagemConsultas]:
+    """
+    Conta statements e conexões executados no bloco (mesma thread/contexto)
+
+    Usage:
+        with contar_consultas() as contagem:
+            db.buscar_lead(whatsapp)
+        contagem.consultas  # 1
+    """
+    contagem = ContagemConsultas(detalhar, _contagem_atual.get())
+    token = _contagem_atual.set(contagem)
+    try:
+        yield contagem
+    finally:
+        _contagem_atual.reset(token)
+
+
+@contextmanager
+def limite_consultas(maximo: int, conexoes: Optional[int] = None) -> Iterator[ContagemConsultas]:
+    """
+    Falha (AssertionError) se o bloco executar mais statements que `maximo`
+
+    Usado nos testes para travar o número de consultas por rota/método;
+    a mensagem lista os statements para achar o N+1.
+
+    Usage:
+        with limite_consultas(2, conexoes=1):
+            client.get('/api/leads/5531...')
+    """
+    with contar_consultas(detalhar=True) as contagem:
+        yield contagem
+
+    excessos = []
+    if contagem.consultas > maximo:
+        excessos.append(f"{contagem.consultas} statements (máximo {maximo})")
+    if conexoes is not None and contagem.conexoes > conexoes:
+        excessos.append(f"{contagem.conexoes} conexões (máximo {conexoes})")
+    if excessos:
+        raise AssertionError(
+            f"{' e '.join(excessos)}:\n  " + '\n  '.join(contagem.sql)
+        )
+
+
+def init_contagem_consultas(app: Flask) -> None:
+    """
+    Conta statements/conexões de cada requisição
+
+    Alimenta os histogramas por rota e, quando os headers de diagnóstico
+    estão ativos (ver timing.MODO_HEADER), responde X-DB-Queries e
+    X-DB-Connections.
+
+    Usage:
+        app = Flask(__name__)
+        init_contagem_consultas(app)
+    """
+    @app.before_request
+    def _iniciar_contagem():
+        g.contagem_consultas_token = _contagem_atual.set(ContagemConsultas(externa=_contagem_atual.get()))
+
+    @app.after_request
+    def _emitir_contagem(response):
+        contagem = _contagem_atual.get()
+        if contagem is None or 'contagem_consultas_token' not in g:
+            return response
+
+        rota = rota_atual()
+        http_request_db_queries.observe(contagem.consultas, route=rota)
+        http_request_db_connections.observe(contagem.conexoes, route=rota)
+
+        if timing.header_debug_ativo():
+            response.headers[HEADER_CONSULTAS] = str(contagem.consultas)
+            response.headers[HEADER_CONEXOES] = str(contagem.conexoes)
+        return response
+
+    @app.teardown_request
+    def _encerrar_contagem(exc=None):
+        token = g.pop('contagem_consultas_token', None)
+        if token is not None:
+            _contagem_atual.reset(token)
+
+
+# ==================== CURSOR E CONEXÃO ====================
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """
+    Cursor que mede execute/executemany e o tempo de fetch do statement
+
+    O mesmo tempo alimenta a fase 'db' do Server-Timing (ver timing.py),
+    mesmo com SQL_STATS=0.
+    """
+
+    _sql_normalizado: Optional[str] = None
+    _execucao: float = 0.0
+
+    def _medir(self, metodo, sql: str, params: Any):
+        if not query_stats.habilitado:
+            if not timing.ativo():
+                return metodo(sql, params)
+            with timing.fase('db'):
+                return metodo(sql, params)
+
+        normalizado = normalizar_sql(sql)
+        inicio = time.perf_counter()
+        try:
+            resultado = metodo(sql, params)
+        except BaseException:
+            # Falhas (ex.: BEGIN IMMEDIATE esperando o busy timeout) não entram
+            # no agregado nem no log de lentas: a contenção é medida em
+            # database.py e um EXPLAIN na conexão que falhou não diz nada
+            timing.registrar('db', time.perf_counter() - inicio)
+            self._sql_normalizado = None
+            raise
+
+        decorrido = time.perf_counter() - inicio
+        timing.registrar('db', decorrido)
+        self._sql_normalizado = normalizado
+        self._execucao = decorrido
+        query_stats.registrar(normalizado, decorrido)
+
+        if decorrido * 1000 >= query_stats.limite_lento_ms:
+            query_stats.registrar_lenta(self.connection, sql, normalizado, params, decorrido)
+        return resultado
+
+    def execute(self, sql: str, params: Any = ()):
+        _contar_consulta(sql)
+        return self._medir(super().execute, sql, params)
+
+    def executemany(self, sql: str, params: Any):
+        _contar_consulta(sql)
+        return self._medir(super().executemany, sql, params)
+
+    def _medir_fetch(self, metodo, *args):
+        if self._sql_normalizado is None:
+            if not timing.ativo():
+                return metodo(*args)
+            with timing.fase('db'):
+                return metodo(*args)
+
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            decorrido = time.perf_counter() - inicio
+            timing.registrar('db', decorrido)
+            query_stats.registrar(self._sql_normalizado, decorrido, nova_chamada=False)
+
+    def fetchone(self):
+        return self._medir_fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._medir_fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._medir_fetch(super().fetchall)
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """
+    Conexão cujos cursores são instrumentados
+
+    Usage:
+        conn = sqlite3.connect(path, factory=ConexaoInstrumentada)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        registrar_conexao_obtida()
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql: str, params: Any = ()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, params: Any):
+        return self.cursor().executemany(sql, params)
+
+    def commit(self):
+        # fsync do WAL entra na fase 'db' da requisição
+        with timing.fase('db'):
+            return super().commit()
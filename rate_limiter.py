@@ -8,6 +8,8 @@ from threading import Lock
 from typing import Dict, Tuple, Optional
 import hashlib
 
+from memoria import memoria
+
 
 class RateLimiter:
     """
@@ -162,3 +164,17 @@ rate_limiter = RateLimiter(
     window_seconds=1,
     dedup_window_seconds=5  # 5s dedup window
 )
+
+# Cópias rasas sob o lock: o relatório não itera enquanto outra thread escreve
+def _copiar_requests():
+    with rate_limiter.rate_lock:
+        return dict(rate_limiter.requests)
+
+
+def _copiar_recent_requests():
+    with rate_limiter.dedup_lock:
+        return dict(rate_limiter.recent_requests)
+
+
+memoria.registrar('rate_limiter.requests', _copiar_requests)
+memoria.registrar('rate_limiter.recent_requests', _copiar_recent_requests)
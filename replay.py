@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Gravação e Replay de Requisições
+Grava o tráfego real em JSONL e o reproduz contra uma instância local (ou o
+test client do Flask) com concorrência e compressão de tempo configuráveis
+
+Formato do log (uma requisição por linha):
+    {"ts": 1731000000.123, "method": "GET", "path": "/api/leads/score",
+     "query": "whatsapp=5531...&score=45", "json": null}
+
+Uso:
+    # Gravar (no servidor): REQUEST_LOG=data/requisicoes.jsonl python app.py
+    python replay.py data/requisicoes.jsonl --app --concorrencia 8 --velocidade 10
+    python replay.py data/requisicoes.jsonl --url http://localhost:5000 --saida run.json
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+API_KEY = os.getenv('API_KEY', 'dev-token-12345')
+
+_SEGMENTO_NUMERICO = re.compile(r'/\d+(?=/|$)')
+
+
+# ==================== GRAVAÇÃO ====================
+
+def init_gravacao(app, arquivo: str) -> None:
+    """
+    Grava cada requisição da API no formato de replay
+
+    Headers (API key, cookies) não são gravados; o replay injeta a API key.
+    """
+    from flask import request
+
+    lock = threading.Lock()
+    os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+    saida = open(arquivo, 'a', encoding='utf-8')
+
+    @app.before_request
+    def _gravar_requisicao():
+        if not request.path.startswith('/api/'):
+            return
+        linha = json.dumps({
+            'ts': round(time.time(), 3),
+            'method': request.method,
+            'path': request.path,
+            'query': request.query_string.decode('utf-8', 'replace'),
+            'json': request.get_json(silent=True)
+        }, ensure_ascii=False)
+        with lock:
+            saida.write(linha + '\n')
+            saida.flush()
+
+
+# ==================== REPLAY ====================
+
+def carregar_log(arquivo: str) -> List[Dict[str, Any]]:
+    """Lê o log ordenado por timestamp (linhas inválidas são ignoradas)"""
+    registros = []
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(registro, dict) and registro.get('path'):
+                registros.append(registro)
+    registros.sort(key=lambda r: r.get('ts', 0))
+    return registros
+
+
+def rota_do_path(metodo: str, path: str) -> str:
+    """Agrupa paths com IDs numéricos (/api/imoveis/3 -> /api/imoveis/{id})"""
+    return f"{metodo} {_SEGMENTO_NUMERICO.sub('/{id}', path)}"
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil por nearest-rank (valores já ordenados)"""
+    if not valores:
+        return None
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def resumir(latencias: List[float], status: Dict[str, int], duracao: float) -> Dict[str, Any]:
+    ordenadas = sorted(latencias)
+    return {
+        'requisicoes': len(ordenadas),
+        'throughput_rps': round(len(ordenadas) / duracao, 2) if duracao > 0 else None,
+        'latencia_ms': {
+            'p50': _ms(percentil(ordenadas, 50)),
+            'p95': _ms(percentil(ordenadas, 95)),
+            'p99': _ms(percentil(ordenadas, 99)),
+            'max': _ms(ordenadas[-1] if ordenadas else None),
+            'media': _ms(sum(ordenadas) / len(ordenadas) if ordenadas else None)
+        },
+        'status': dict(sorted(status.items()))
+    }
+
+
+def _ms(segundos: Optional[float]) -> Optional[float]:
+    return round(segundos * 1000, 2) if segundos is not None else None
+
+
+class ClienteHTTP:
+    """Envia requisições para uma instância rodando (requests.Session por thread)"""
+
+    def __init__(self, url: str, api_key: str):
+        import requests
+        self._requests = requests
+        self.url = url.rstrip('/')
+        self.headers = {'Authorization': f'Bearer {api_key}'}
+        self._local = threading.local()
+
+    def enviar(self, registro: Dict[str, Any]) -> int:
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None:
+            sessao = self._local.sessao = self._requests.Session()
+        url = f"{self.url}{registro['path']}"
+        if registro.get('query'):
+            url += f"?{registro['query']}"
+        resposta = sessao.request(registro['method'], url, json=registro.get('json'),
+                                  headers=self.headers, timeout=60)
+        return resposta.status_code
+
+
+class ClienteFlask:
+    """Envia requisições pelo test client (sem rede; inclui o app inteiro)"""
+
+    def __init__(self, app, api_key: str):
+        self.app = app
+        self.headers = {'Authorization': f'Bearer {api_key}'}
+        self._local = threading.local()
+
+    def enviar(self, registro: Dict[str, Any]) -> int:
+        cliente = getattr(self._local, 'cliente', None)
+        if cliente is None:
+            cliente = self._local.cliente = self.app.test_client()
+        resposta = cliente.open(registro['path'], method=registro['method'],
+                                query_string=registro.get('query') or None,
+                                json=registro.get('json'), headers=self.headers)
+        return resposta.status_code
+
+
+def reproduzir(registros: Iterable[Dict[str, Any]], cliente, concorrencia: int = 4,
+               velocidade: float = 1.0) -> Dict[str, Any]:
+    """
+    Reproduz o log respeitando os intervalos originais divididos por `velocidade`
+
+    velocidade=0 dispara tudo o mais rápido possível (limitado pela
+    concorrência). 'atraso_ms' mede quanto o envio ficou atrás do
+    agendado: se cresce, a concorrência não acompanha a carga.
+    """
+    registros = list(registros)
+    lock = threading.Lock()
+    latencias: List[float] = []
+    atrasos: List[float] = []
+    por_rota: Dict[str, List[float]] = defaultdict(list)
+    status_total: Dict[str, int] = defaultdict(int)
+    status_rota: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def executar(registro: Dict[str, Any], agendado: float):
+        inicio = time.perf_counter()
+        try:
+            status = str(cliente.enviar(registro))
+        except Exception as e:
+            status = f"erro:{type(e).__name__}"
+        decorrido = time.perf_counter() - inicio
+        rota = rota_do_path(registro['method'], registro['path'])
+        with lock:
+            latencias.append(decorrido)
+            atrasos.append(max(inicio - agendado, 0))
+            por_rota[rota].append(decorrido)
+            status_total[status] += 1
+            status_rota[rota][status] += 1
+
+    ts0 = registros[0].get('ts', 0) if registros else 0
+    inicio_replay = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, concorrencia)) as executor:
+        for registro in registros:
+            agendado = inicio_replay
+            if velocidade > 0:
+                agendado += (registro.get('ts', ts0) - ts0) / velocidade
+                espera = agendado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+            executor.submit(executar, registro, agendado)
+
+    duracao = time.perf_counter() - inicio_replay
+    relatorio = resumir(latencias, status_total, duracao)
+    relatorio.update({
+        'config': {'concorrencia': concorrencia, 'velocidade': velocidade},
+        'duracao_s': round(duracao, 3),
+        'atraso_ms': {'p50': _ms(percentil(sorted(atrasos), 50)),
+                      'p99': _ms(percentil(sorted(atrasos), 99))},
+        'rotas': {
+            rota: resumir(por_rota[rota], status_rota[rota], duracao)
+            for rota in sorted(por_rota)
+        }
+    })
+    return relatorio
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay de log de requisições com relatório de latência')
+    parser.add_argument('log', help='Arquivo JSONL gravado com REQUEST_LOG')
+    alvo = parser.add_mutually_exclusive_group(required=True)
+    alvo.add_argument('--url', help='Instância alvo (ex: http://localhost:5000)')
+    alvo.add_argument('--app', action='store_true', help='Usa o test client do Flask (importa app.py)')
+    parser.add_argument('--concorrencia', type=int, default=4)
+    parser.add_argument('--velocidade', type=float, default=1.0,
+                        help='Compressão de tempo (10 = 10x mais rápido; 0 = sem pausas)')
+    parser.add_argument('--api-key', default=API_KEY)
+    parser.add_argument('--saida', help='Grava o relatório JSON neste arquivo')
+    args = parser.parse_args(argv)
+
+    registros = carregar_log(args.log)
+    if not registros:
+        print(f"Nenhuma requisição em {args.log}", file=sys.stderr)
+        return 1
+
+    if args.app:
+        from app import app
+        cliente = ClienteFlask(app, args.api_key)
+    else:
+        cliente = ClienteHTTP(args.url, args.api_key)
+
+    relatorio = reproduzir(registros, cliente, args.concorrencia, args.velocidade)
+    relatorio['config']['log'] = args.log
+    relatorio['config']['alvo'] = 'flask-test-client' if args.app else args.url
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    print(texto)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Snapshot Compilado do Catálogo
+Compila INDICE.json, FAQ.txt e links.json num único arquivo binário que
+os workers abrem com mmap somente leitura: as páginas ficam no page cache
+do sistema, compartilhadas entre processos, em vez de um parse por heap
+
+Uso:
+    python snapshot_catalogo.py                    # data/ -> data/catalogo.snap
+    python snapshot_catalogo.py --dados data --saida /tmp/catalogo.snap
+
+Formato (little-endian):
+    cabeçalho   magic, formato, n, n_ids, meta, ids, tabela
+    meta        JSON das chaves do INDICE.json fora de "imoveis"
+    tabela      n entradas na ordem do INDICE.json:
+                id, registro (off, len), FAQ (off, len), links (off, len)
+    ids         (id, posição na tabela) ordenado por id, para busca binária
+    dados       registros e links em JSON compacto, FAQs em UTF-8
+
+off == 0 marca arquivo ausente (FAQ.txt ou links.json que não existia).
+"""
+import argparse
+import json
+from contextlib import contextmanager
+import mmap
+import os
+import struct
+import sys
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: só o lock entre threads
+    fcntl = None
+
+MAGIC = b'LFCATSN\x00'
+FORMATO = 1
+
+CABECALHO = struct.Struct('<8sIIIQIQQ')   # magic, formato, n, n_ids, meta_off, meta_len, ids_off, tabela_off
+ENTRADA = struct.Struct('<qQIQIQI')       # id, registro, faq, links (off, len)
+ID = struct.Struct('<qI')                 # id, posição na tabela
+
+ARQUIVO_PADRAO = os.path.join('data', 'catalogo.snap')
+
+
+def _ler_arquivo(caminho: str) -> Optional[bytes]:
+    try:
+        with open(caminho, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+_lock_compilacao = threading.Lock()
+
+
+@contextmanager
+def _trava_compilacao(destino: str) -> Iterator[None]:
+    """
+    Uma compilação por destino de cada vez, entre threads e entre workers
+
+    Sem isso uma compilação que leu as fontes antigas pode fazer o
+    os.replace depois de outra mais nova e voltar o snapshot no tempo.
+    """
+    with _lock_compilacao:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{destino}.lock", 'a') as trava:
+            fcntl.flock(trava.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(trava.fileno(), fcntl.LOCK_UN)
+
+
+def compilar(dados_dir: str = 'data', destino: str = ARQUIVO_PADRAO) -> Dict[str, Any]:
+    """
+    Gera o snapshot a partir de dados_dir e troca o arquivo atomicamente
+
+    Grava num temporário ao lado do destino e faz os.replace: leitores
+    com o snapshot antigo mapeado continuam lendo o inode antigo até
+    perceberem a troca (ver SnapshotCatalogo). Leitura das fontes, escrita
+    e troca rodam sob `destino.lock` (ver _trava_compilacao).
+
+    Returns:
+        imoveis, bytes e destino
+    """
+    pasta_destino = os.path.dirname(destino) or '.'
+    os.makedirs(pasta_destino, exist_ok=True)
+    with _trava_compilacao(destino):
+        return _compilar(dados_dir, destino)
+
+
+def _compilar(dados_dir: str, destino: str) -> Dict[str, Any]:
+    caminho_indice = os.path.join(dados_dir, 'INDICE.json')
+    bruto = _ler_arquivo(caminho_indice)
+    indice = json.loads(bruto) if bruto is not None else {'versao': '1.0', 'total_imoveis': 0, 'imoveis': []}
+    imoveis = indice.get('imoveis', [])
+    meta = json.dumps({k: v for k, v in indice.items() if k != 'imoveis'},
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    posicao_meta = CABECALHO.size
+    posicao_tabela = posicao_meta + len(meta)
+    posicao_ids = posicao_tabela + ENTRADA.size * len(imoveis)
+
+    # Primeira ocorrência de cada id vence, como no next(...) das rotas
+    primeiros: Dict[int, int] = {}
+    for posicao, imovel in enumerate(imoveis):
+        primeiros.setdefault(int(imovel['id']), posicao)
+    ids = sorted(primeiros.items())
+
+    dados = bytearray()
+    inicio_dados = posicao_ids + ID.size * len(ids)
+
+    def anexar(blob: Optional[bytes]) -> Tuple[int, int]:
+        if blob is None:
+            return 0, 0
+        off = inicio_dados + len(dados)
+        dados.extend(blob)
+        return off, len(blob)
+
+    entradas = []
+    for imovel in imoveis:
+        registro = json.dumps(imovel, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        pasta = os.path.join(dados_dir, 'imoveis', str(imovel.get('slug', '')))
+        links = _ler_arquivo(os.path.join(pasta, 'links.json'))
+        if links is not None:
+            links = json.dumps(json.loads(links), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        entradas.append(ENTRADA.pack(
+            int(imovel['id']),
+            *anexar(registro),
+            *anexar(_ler_arquivo(os.path.join(pasta, 'FAQ.txt'))),
+            *anexar(links)
+        ))
+
+    cabecalho = CABECALHO.pack(MAGIC, FORMATO, len(imoveis), len(ids),
+                               posicao_meta, len(meta), posicao_ids, posicao_tabela)
+
+    temporario = f"{destino}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(temporario, 'wb') as f:
+        f.write(cabecalho)
+        f.write(meta)
+        f.write(b''.join(entradas))
+        f.write(b''.join(ID.pack(id_, posicao) for id_, posicao in ids))
+        f.write(dados)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, destino)
+
+    return {'imoveis': len(imoveis), 'bytes': inicio_dados + len(dados), 'destino': destino}
+
+
+class MapaSnapshot:
+    """
+    Um snapshot aberto: mmap + cabeçalho decodificado
+
+    Imutável enquanto o inode for o mesmo: quem precisa de várias leituras
+    numa requisição resolve o mapa uma vez (SnapshotCatalogo.mapa) e evita
+    um stat por acesso. Nada decodificado fica guardado aqui: o catálogo
+    vive só nas páginas do mmap, compartilhadas entre os workers.
+    """
+
+    def __init__(self, caminho: str):
+        with open(caminho, 'rb') as f:
+            info = os.fstat(f.fileno())
+            self.versao = (info.st_ino, info.st_mtime_ns, info.st_size)
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, formato, self.n, self.n_ids, meta_off, meta_len, self.ids_off, self.tabela_off = \
+            CABECALHO.unpack_from(self.mm, 0)
+        if magic != MAGIC or formato != FORMATO:
+            self.mm.close()
+            raise ValueError(f"{caminho} não é um snapshot do catálogo (formato {FORMATO})")
+        self.meta = json.loads(self.mm[meta_off:meta_off + meta_len])
+        self.view = memoryview(self.mm)
+
+    def entrada(self, posicao: int) -> Tuple[int, int, int, int, int, int, int]:
+        return ENTRADA.unpack_from(self.mm, self.tabela_off + posicao * ENTRADA.size)
+
+    def posicao(self, imovel_id: int) -> Optional[int]:
+        """Busca binária na tabela de ids"""
+        baixo, alto = 0, self.n_ids
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            id_, posicao = ID.unpack_from(self.mm, self.ids_off + meio * ID.size)
+            if id_ == imovel_id:
+                return posicao
+            if id_ < imovel_id:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return None
+
+    def fatia(self, off: int, tamanho: int) -> Optional[memoryview]:
+        return None if off == 0 else self.view[off:off + tamanho]
+
+    def _registro(self, posicao: int) -> Dict[str, Any]:
+        _, off, tamanho, *_ = self.entrada(posicao)
+        return json.loads(self.view[off:off + tamanho].tobytes())
+
+    def imovel(self, imovel_id: int) -> Optional[Dict[str, Any]]:
+        posicao = self.posicao(imovel_id)
+        return None if posicao is None else self._registro(posicao)
+
+    def imoveis(self) -> Iterator[Dict[str, Any]]:
+        """Registros na ordem do INDICE.json, decodificados um a um"""
+        for posicao in range(self.n):
+            yield self._registro(posicao)
+
+    def indice(self) -> Dict[str, Any]:
+        """
+        Mesmo formato do INDICE.json, decodificado a cada chamada
+
+        Não é guardado: listagens devem percorrer imoveis() e manter só o
+        que passa nos filtros (ver app.filtrar_imoveis).
+        """
+        return {**self.meta, 'imoveis': list(self.imoveis())}
+
+    def faq_bytes(self, imovel_id: int) -> Optional[memoryview]:
+        posicao = self.posicao(imovel_id)
+        if posicao is None:
+            return None
+        _, _, _, off, tamanho, _, _ = self.entrada(posicao)
+        return self.fatia(off, tamanho)
+
+    def faq(self, imovel_id: int, padrao: Optional[str] = None) -> Optional[str]:
+        conteudo = self.faq_bytes(imovel_id)
+        return padrao if conteudo is None else str(conteudo, 'utf-8')
+
+    def links(self, imovel_id: int, padrao: Any = None) -> Any:
+        posicao = self.posicao(imovel_id)
+        fatia = None
+        if posicao is not None:
+            _, _, _, _, _, off, tamanho = self.entrada(posicao)
+            fatia = self.fatia(off, tamanho)
+        return padrao if fatia is None else json.loads(fatia.tobytes())
+
+
+class SnapshotCatalogo:
+    """
+    Leitor do snapshot compilado
+
+    Cada mapa() faz um stat do arquivo: se o inode/mtime mudou (nova
+    compilação trocada com os.replace), o arquivo novo é mapeado. O mmap
+    antigo não é fechado explicitamente: fatias ainda em uso numa
+    requisição o mantêm vivo até serem liberadas.
+
+    Usage:
+        snapshot = SnapshotCatalogo('data/catalogo.snap')
+        snapshot.imovel(12)        # dict do INDICE.json
+        snapshot.faq_bytes(12)     # memoryview sobre o mmap (sem cópia)
+
+        mapa = snapshot.mapa()     # várias leituras com um único stat
+        mapa.imovel(12), mapa.faq(12), mapa.links(12)
+    """
+
+    def __init__(self, caminho: str = ARQUIVO_PADRAO):
+        self.caminho = caminho
+        self._mapa: Optional[MapaSnapshot] = None
+        self._lock = threading.Lock()
+        self.trocas = 0
+
+    def mapa(self) -> MapaSnapshot:
+        """Mapa do arquivo atual (levanta OSError/ValueError se ilegível)"""
+        info = os.stat(self.caminho)
+        mapa = self._mapa
+        if mapa is not None and mapa.versao == (info.st_ino, info.st_mtime_ns, info.st_size):
+            return mapa
+        with self._lock:
+            mapa = self._mapa
+            if mapa is None or mapa.versao != (info.st_ino, info.st_mtime_ns, info.st_size):
+                if mapa is not None:
+                    self.trocas += 1
+                mapa = self._mapa = MapaSnapshot(self.caminho)
+        return mapa
+
+    def mapa_ou_none(self) -> Optional[MapaSnapshot]:
+        try:
+            return self.mapa()
+        except (OSError, ValueError):
+            return None
+
+    def disponivel(self) -> bool:
+        return self.mapa_ou_none() is not None
+
+    def imovel(self, imovel_id: int) -> Optional[Dict[str, Any]]:
+        return self.mapa().imovel(imovel_id)
+
+    def imoveis(self) -> Iterator[Dict[str, Any]]:
+        return self.mapa().imoveis()
+
+    def indice(self) -> Dict[str, Any]:
+        return self.mapa().indice()
+
+    def faq_bytes(self, imovel_id: int) -> Optional[memoryview]:
+        return self.mapa().faq_bytes(imovel_id)
+
+    def faq(self, imovel_id: int, padrao: Optional[str] = None) -> Optional[str]:
+        return self.mapa().faq(imovel_id, padrao)
+
+    def links(self, imovel_id: int, padrao: Any = None) -> Any:
+        return self.mapa().links(imovel_id, padrao)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        mapa = self.mapa()
+        return {'arquivo': self.caminho, 'imoveis': mapa.n, 'bytes': len(mapa.mm), 'trocas': self.trocas}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Compila o catálogo (INDICE.json, FAQs e links) num snapshot binário')
+    parser.add_argument('--dados', default='data', help='Diretório com INDICE.json e imoveis/')
+    parser.add_argument('--saida', default=None, help='Arquivo gerado (padrão: <dados>/catalogo.snap)')
+    args = parser.parse_args(argv)
+
+    resultado = compilar(args.dados, args.saida or os.path.join(args.dados, 'catalogo.snap'))
+    print(f"{resultado['imoveis']} imóveis, {resultado['bytes']} bytes -> {resultado['destino']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Stress de Concorrência do Banco
+Reproduz "database is locked" com N threads e M processos escrevendo no
+mesmo arquivo SQLite (registrar_lead, criar_agendamento e leituras) e mede
+retries, erros de lock e latência de escrita em vários níveis de concorrência
+
+Uso:
+    python stress_db.py --niveis 1x0,4x0,8x0,4x2,8x4 --duracao 10
+    python stress_db.py --niveis 8x4 --leads 50 --escritas 0.8 --saida stress.json
+
+Cada nível "TxP" roda T threads no processo principal e P processos (uma
+thread cada) simultaneamente, sempre em um banco novo.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import LeadsDatabase, contador_lock
+from replay import percentil
+
+# Folga para os processos subirem antes do início sincronizado
+ATRASO_INICIO_S = 1.0
+
+ESCRITAS = ('registrar_lead', 'criar_agendamento')
+LEITURAS = ('buscar_lead', 'listar_leads', 'obter_estatisticas', 'listar_agendamentos')
+
+
+def parse_niveis(texto: str) -> List[Tuple[int, int]]:
+    """'1x0,4x2' -> [(1, 0), (4, 2)]"""
+    niveis = []
+    for parte in texto.split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        threads, _, processos = parte.partition('x')
+        nivel = (int(threads), int(processos or 0))
+        if nivel[0] < 0 or nivel[1] < 0 or sum(nivel) == 0:
+            raise ValueError(f"Nível inválido: {parte}")
+        niveis.append(nivel)
+    return niveis
+
+
+def _classificar_erro(erro: Any) -> str:
+    texto = str(erro).lower()
+    if 'locked' in texto or 'busy' in texto:
+        return 'locked'
+    if isinstance(erro, Exception):
+        return type(erro).__name__
+    return 'erro'
+
+
+def trabalhador(db_path: str, inicio: float, fim: float, semente: int,
+                leads: int, escritas: float) -> Dict[str, Any]:
+    """
+    Executa operações aleatórias entre `inicio` e `fim` (time.time())
+
+    Erros de lock podem vir como exceção (registrar_lead, após os retries)
+    ou como {"success": False} (criar_agendamento); ambos são contados.
+    Conflitos de horário são respostas esperadas, não erros.
+    """
+    rng = random.Random(semente)
+    db = LeadsDatabase(db_path)
+    latencias: Dict[str, List[float]] = {nome: [] for nome in ESCRITAS + LEITURAS}
+    erros: Counter = Counter()
+    conflitos = 0
+    dia0 = date(2025, 1, 1)
+
+    espera = inicio - time.time()
+    if espera > 0:
+        time.sleep(espera)
+
+    while time.time() < fim:
+        lead = rng.randrange(leads)
+        whatsapp = f"55219{lead:08d}"
+        if rng.random() < escritas:
+            operacao = rng.choice(ESCRITAS)
+        else:
+            operacao = rng.choice(LEITURAS)
+
+        t0 = time.perf_counter()
+        try:
+            if operacao == 'registrar_lead':
+                resultado = db.registrar_lead(whatsapp, f"Stress {lead}", 1 + lead % 10,
+                                              rng.randint(0, 100), rng.random() < 0.2)
+            elif operacao == 'criar_agendamento':
+                dia = dia0 + timedelta(days=rng.randrange(60))
+                resultado = db.criar_agendamento(f"Stress {lead}", whatsapp, 1 + lead % 10,
+                                                 dia.isoformat(), f"{rng.randint(8, 17):02d}:00")
+            elif operacao == 'buscar_lead':
+                resultado = db.buscar_lead(whatsapp)
+            elif operacao == 'listar_leads':
+                resultado = db.listar_leads({'score_min': rng.randint(50, 100)})
+            elif operacao == 'obter_estatisticas':
+                resultado = db.obter_estatisticas()
+            else:
+                resultado = db.listar_agendamentos(limite=50)
+        except Exception as e:
+            erros[_classificar_erro(e)] += 1
+            continue
+        decorrido = time.perf_counter() - t0
+
+        if isinstance(resultado, dict) and resultado.get('success') is False:
+            if resultado.get('conflito'):
+                conflitos += 1
+            else:
+                erros[_classificar_erro(resultado.get('error'))] += 1
+                continue
+        latencias[operacao].append(decorrido)
+
+    return {'latencias': latencias, 'erros': dict(erros), 'conflitos': conflitos}
+
+
+def _processo(args: tuple) -> Dict[str, Any]:
+    """Entrada dos processos: inclui os retries contados neste processo"""
+    contador_lock.resetar()
+    resultado = trabalhador(*args)
+    resultado['lock'] = contador_lock.snapshot()
+    return resultado
+
+
+def _latencias_ms(valores: List[float]) -> Dict[str, Optional[float]]:
+    ordenados = sorted(valores)
+
+    def ms(v):
+        return round(v * 1000, 2) if v is not None else None
+
+    return {
+        'p50': ms(percentil(ordenados, 50)),
+        'p95': ms(percentil(ordenados, 95)),
+        'p99': ms(percentil(ordenados, 99)),
+        'max': ms(ordenados[-1] if ordenados else None)
+    }
+
+
+def rodar_nivel(db_path: str, threads: int, processos: int, duracao: float,
+                leads: int = 200, escritas: float = 0.7, semente: int = 1) -> Dict[str, Any]:
+    """Roda um nível de concorrência e consolida os resultados de todos os trabalhadores"""
+    LeadsDatabase(db_path)  # schema criado antes dos trabalhadores
+    contador_lock.resetar()
+
+    inicio = time.time() + (ATRASO_INICIO_S if processos else 0.05)
+    fim = inicio + duracao
+    argumentos = [(db_path, inicio, fim, semente * 1000 + i, leads, escritas)
+                  for i in range(threads + processos)]
+
+    futuros_processos = []
+    executor_processos = None
+    if processos:
+        # spawn: fork com threads vivas (tracing, pool de threads) não é seguro
+        executor_processos = ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context('spawn'))
+        futuros_processos = [executor_processos.submit(_processo, a) for a in argumentos[threads:]]
+
+    with ThreadPoolExecutor(max_workers=max(threads, 1)) as executor_threads:
+        futuros_threads = [executor_threads.submit(trabalhador, *a) for a in argumentos[:threads]]
+        resultados = [f.result() for f in futuros_threads]
+
+    lock_total = Counter(contador_lock.snapshot())
+    if executor_processos:
+        for futuro in futuros_processos:
+            resultado = futuro.result()
+            lock_total.update(resultado.pop('lock'))
+            resultados.append(resultado)
+        executor_processos.shutdown()
+    duracao_real = max(time.time() - inicio, duracao)
+
+    latencias: Dict[str, List[float]] = {nome: [] for nome in ESCRITAS + LEITURAS}
+    erros: Counter = Counter()
+    conflitos = 0
+    for resultado in resultados:
+        for nome, valores in resultado['latencias'].items():
+            latencias[nome].extend(valores)
+        erros.update(resultado['erros'])
+        conflitos += resultado['conflitos']
+
+    escritas_ok = [v for nome in ESCRITAS for v in latencias[nome]]
+    leituras_ok = [v for nome in LEITURAS for v in latencias[nome]]
+    return {
+        'threads': threads,
+        'processos': processos,
+        'duracao_s': round(duracao_real, 2),
+        'escritas': {
+            'ok': len(escritas_ok),
+            'ops_s': round(len(escritas_ok) / duracao_real, 1),
+            'latencia_ms': _latencias_ms(escritas_ok)
+        },
+        'leituras': {
+            'ok': len(leituras_ok),
+            'ops_s': round(len(leituras_ok) / duracao_real, 1),
+            'latencia_ms': _latencias_ms(leituras_ok)
+        },
+        'por_operacao': {nome: {'ok': len(v), 'latencia_ms': _latencias_ms(v)}
+                         for nome, v in latencias.items()},
+        'retries': lock_total['retries'],
+        'retries_esgotados': lock_total['esgotados'],
+        'erros': dict(sorted(erros.items())),
+        'conflitos_agenda': conflitos
+    }
+
+
+def varrer(niveis: List[Tuple[int, int]], duracao: float, leads: int = 200,
+           escritas: float = 0.7, diretorio: Optional[str] = None, log=print) -> Dict[str, Any]:
+    """Roda cada nível em um banco novo"""
+    temporario = None if diretorio else tempfile.TemporaryDirectory(prefix='stress_db_')
+    base = diretorio or temporario.name
+    os.makedirs(base, exist_ok=True)
+
+    resultados = []
+    try:
+        for threads, processos in niveis:
+            db_path = os.path.join(base, f"stress_{threads}x{processos}.db")
+            for sufixo in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + sufixo):
+                    os.remove(db_path + sufixo)
+
+            resultado = rodar_nivel(db_path, threads, processos, duracao, leads, escritas)
+            resultados.append(resultado)
+            log(f"  {threads:>3}t x {processos:>2}p  "
+                f"escritas {resultado['escritas']['ops_s']:>8}/s "
+                f"p99 {resultado['escritas']['latencia_ms']['p99']}ms  "
+                f"retries {resultado['retries']}  erros {resultado['erros'] or '-'}")
+    finally:
+        if temporario:
+            temporario.cleanup()
+
+    return {
+        'config': {'duracao_s': duracao, 'leads': leads, 'escritas': escritas,
+                   'sqlite': sqlite3.sqlite_version},
+        'niveis': resultados
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Stress de concorrência no SQLite (threads e processos)')
+    parser.add_argument('--niveis', default='1x0,4x0,8x0,4x2',
+                        help='Níveis THREADSxPROCESSOS separados por vírgula')
+    parser.add_argument('--duracao', type=float, default=10.0, help='Segundos por nível')
+    parser.add_argument('--leads', type=int, default=200,
+                        help='Whatsapps distintos (menos = mais disputa pelas mesmas linhas)')
+    parser.add_argument('--escritas', type=float, default=0.7, help='Fração de operações de escrita')
+    parser.add_argument('--dados', help='Mantém os bancos neste diretório para inspeção')
+    parser.add_argument('--saida', help='Grava o relatório JSON neste arquivo')
+    parser.add_argument('--max-erros', type=int,
+                        help='Falha (exit 1) se algum nível tiver mais erros que isto')
+    args = parser.parse_args(argv)
+
+    relatorio = varrer(parse_niveis(args.niveis), args.duracao, args.leads, args.escritas, args.dados)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"Relatório gravado em {args.saida}")
+
+    if args.max_erros is not None:
+        piores = max(sum(n['erros'].values()) for n in relatorio['niveis'])
+        if piores > args.max_erros:
+            print(f"Erros acima do limite: {piores} > {args.max_erros}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+Testes da Agenda de Visitas
+Valida detecção de conflitos, alternativas e motor de disponibilidade
+"""
+import threading
+from datetime import date, datetime
+
+import pytest
+
+from app import create_app
+from database import LeadsDatabase
+from disponibilidade import GradeAgenda
+
+
+DATA = "2099-03-10"
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Banco isolado por teste"""
+    return LeadsDatabase(str(tmp_path / "dashboard.db"))
+
+
+def agendar(db, hora, imovel_id=1, data=DATA, **kwargs):
+    return db.criar_agendamento(
+        nome_cliente="Cliente Teste",
+        whatsapp="5531999887766",
+        imovel_id=imovel_id,
+        data_visita=data,
+        hora_visita=hora,
+        **kwargs
+    )
+
+
+class TestConflitos:
+    """Testes de prevenção de double-booking"""
+
+    def test_bloqueia_mesmo_imovel_e_horario(self, db):
+        """Mesmo imóvel no mesmo horário deve ser recusado"""
+        assert agendar(db, "14:00")["success"] is True
+
+        resultado = agendar(db, "14:00")
+        assert resultado["success"] is False
+        assert resultado["conflito"] is True
+        assert resultado["conflito_com"]["hora_visita"] == "14:00"
+
+    def test_respeita_duracao_da_visita(self, db):
+        """Visitas sobrepostas (menos de 1h de diferença) conflitam"""
+        agendar(db, "14:00")
+
+        assert agendar(db, "14:30")["conflito"] is True
+        assert agendar(db, "15:00")["success"] is True
+
+    def test_normaliza_formato_da_hora(self, db):
+        """'14:00:00' e '14:00' são o mesmo horário"""
+        agendar(db, "14:00:00")
+
+        assert agendar(db, "14:00")["conflito"] is True
+
+    def test_normaliza_formato_da_data(self, db):
+        """'20990310' e a semana ISO são o mesmo dia que '2099-03-10'"""
+        ano, semana, dia = date.fromisoformat(DATA).isocalendar()
+        compacta = agendar(db, "14:00", data=DATA.replace("-", ""))
+        assert compacta["success"] is True
+
+        assert agendar(db, "14:00", data=f"{ano}-W{semana:02d}-{dia}")["conflito"] is True
+        assert agendar(db, "14:30")["conflito"] is True
+        assert db.listar_agendamentos({"data_inicio": DATA, "data_fim": DATA})[0]["data_visita"] == DATA
+
+        outro_id = agendar(db, "16:00", data="2099-03-11")["agendamento_id"]
+        resultado = db.atualizar_agendamento(outro_id, {"data_visita": "20990310", "hora_visita": "14:00"})
+        assert resultado["conflito"] is True
+
+    def test_imoveis_diferentes_nao_conflitam(self, db):
+        """Mesmo horário em imóveis diferentes é permitido"""
+        agendar(db, "14:00", imovel_id=1)
+
+        assert agendar(db, "14:00", imovel_id=2)["success"] is True
+
+    def test_cancelado_libera_horario(self, db):
+        """Agendamento cancelado não ocupa o horário"""
+        agendamento_id = agendar(db, "14:00")["agendamento_id"]
+        db.atualizar_agendamento(agendamento_id, {"status": "cancelado"})
+
+        assert agendar(db, "14:00")["success"] is True
+
+    def test_atualizacao_verifica_conflito(self, db):
+        """Mover agendamento para horário ocupado deve ser recusado"""
+        agendar(db, "14:00")
+        outro_id = agendar(db, "16:00")["agendamento_id"]
+
+        resultado = db.atualizar_agendamento(outro_id, {"hora_visita": "14:30"})
+        assert resultado["conflito"] is True
+
+        # Atualizar o próprio agendamento não conflita consigo mesmo
+        assert db.atualizar_agendamento(outro_id, {"hora_visita": "16:30"})["success"] is True
+
+    def test_hora_invalida(self, db):
+        """Hora fora do formato deve retornar erro, não exceção"""
+        resultado = agendar(db, "amanhã")
+        assert resultado["success"] is False
+        assert "conflito" not in resultado
+
+
+class TestAlternativas:
+    """Testes da sugestão de horários livres"""
+
+    def test_sugere_horarios_proximos_livres(self, db):
+        """Alternativas devem ser os horários livres mais próximos"""
+        agendar(db, "14:00")
+
+        alternativas = agendar(db, "14:00")["alternativas"]
+
+        assert len(alternativas) == 3
+        assert {"data": DATA, "hora": "13:00"} in alternativas
+        assert {"data": DATA, "hora": "15:00"} in alternativas
+        assert all(a["hora"] != "14:00" or a["data"] != DATA for a in alternativas)
+
+
+class TestDisponibilidade:
+    """Testes do motor de disponibilidade (bitmaps de slots)"""
+
+    def test_grade_respeita_funcionamento_e_duracao(self):
+        """Visita de 1h só pode começar se couber antes do fechamento"""
+        grade = GradeAgenda({
+            'duracao_slot_min': 30,
+            'duracao_visita_min': 60,
+            'dias': {'ter': [['08:00', '10:00']]}
+        })
+        terca = date.fromisoformat(DATA)
+
+        assert grade.horarios(grade.inicios_livres(terca)) == ['08:00', '08:30', '09:00']
+        assert grade.inicios_livres(date(2099, 3, 12)) == 0  # quinta fechada
+
+    def test_bitmap_atualizado_na_criacao(self, db):
+        """Criar agendamento remove o horário dos livres"""
+        antes = db.horarios_livres(1, date.fromisoformat(DATA), 0)[DATA]
+        agendar(db, "14:00")
+        depois = db.horarios_livres(1, date.fromisoformat(DATA), 0)[DATA]
+
+        assert set(antes) - set(depois) == {"13:30", "14:00", "14:30"}
+
+    def test_bitmap_atualizado_na_remocao_e_mudanca(self, db):
+        """Deletar/mover agendamento libera o horário antigo"""
+        agendamento_id = agendar(db, "14:00")["agendamento_id"]
+
+        db.atualizar_agendamento(agendamento_id, {"hora_visita": "09:00"})
+        livres = db.horarios_livres(1, date.fromisoformat(DATA), 0)[DATA]
+        assert "14:00" in livres and "09:00" not in livres
+
+        db.deletar_agendamento(agendamento_id)
+        livres = db.horarios_livres(1, date.fromisoformat(DATA), 0)[DATA]
+        assert "09:00" in livres
+
+    def test_salvar_regras_recompila_bitmaps(self, db):
+        """Mudar duração da visita recompila os bitmaps existentes"""
+        agendar(db, "14:00")
+
+        resultado = db.salvar_regras_agenda({
+            'duracao_slot_min': 30,
+            'duracao_visita_min': 120,
+            'dias': {'ter': [['08:00', '18:00']]}
+        })
+        assert resultado["success"] is True
+
+        livres = db.horarios_livres(1, date.fromisoformat(DATA), 0)[DATA]
+        assert "12:00" in livres
+        assert "12:30" not in livres and "15:30" not in livres
+        assert "16:00" in livres
+
+    def test_regras_invalidas(self, db):
+        """Regras mal formadas devem ser recusadas"""
+        resultado = db.salvar_regras_agenda({'duracao_slot_min': 7})
+        assert resultado["success"] is False
+
+
+class TestProximosHorarios:
+    """Testes da busca dos próximos N horários livres"""
+
+    def test_pula_horarios_ocupados(self, db):
+        """Deve começar no instante pedido e pular visitas agendadas"""
+        agendar(db, "09:00")
+
+        horarios = db.proximos_horarios([1], datetime.fromisoformat(f"{DATA}T08:15"), n=3)
+
+        assert [h["hora"] for h in horarios] == ["10:00", "10:30", "11:00"]
+        assert all(h["data"] == DATA and h["imovel_id"] == 1 for h in horarios)
+
+    def test_avanca_para_dias_seguintes(self, db):
+        """Sem horários no dia, continua nos dias seguintes"""
+        horarios = db.proximos_horarios([1], datetime.fromisoformat(f"{DATA}T17:30"), n=2)
+
+        assert horarios == [
+            {"imovel_id": 1, "data": "2099-03-11", "hora": "08:00"},
+            {"imovel_id": 1, "data": "2099-03-11", "hora": "08:30"},
+        ]
+
+    def test_intercala_varios_imoveis(self, db):
+        """Com vários imóveis, resultado fica em ordem cronológica"""
+        agendar(db, "08:00", imovel_id=1)
+
+        horarios = db.proximos_horarios([1, 2], datetime.fromisoformat(f"{DATA}T08:00"), n=3)
+
+        assert horarios[0] == {"imovel_id": 2, "data": DATA, "hora": "08:00"}
+        assert [h["imovel_id"] for h in horarios[1:]] == [2, 1]
+
+
+class TestListagem:
+    """Testes de listar_agendamentos (ordem, projeção, paginação e plano)"""
+
+    def test_ordem_cronologica_e_paginacao(self, db):
+        """Resultado sai ordenado por data/hora e respeita limite/offset"""
+        agendar(db, "16:00")
+        agendar(db, "08:00", data="2099-03-11")
+        agendar(db, "09:00")
+
+        todos = db.listar_agendamentos()
+        assert [(a["data_visita"], a["hora_visita"]) for a in todos] == [
+            (DATA, "09:00"), (DATA, "16:00"), ("2099-03-11", "08:00")
+        ]
+
+        pagina = db.listar_agendamentos(limite=1, offset=1, colunas=["hora_visita"])
+        assert pagina == [{"hora_visita": "16:00"}]
+
+    def test_coluna_invalida(self, db):
+        """Projeção só aceita colunas conhecidas"""
+        with pytest.raises(ValueError):
+            db.listar_agendamentos(colunas=["id; DROP TABLE agendamentos"])
+
+    @pytest.mark.parametrize("filtros", [
+        {"data_inicio": DATA, "data_fim": "2099-03-17"},
+        {"data_inicio": DATA, "data_fim": "2099-03-17", "imovel_id": 1},
+        {"data_inicio": DATA, "data_fim": "2099-03-17", "status": "agendado"},
+    ])
+    def test_plano_sem_ordenacao_temporaria(self, db, filtros):
+        """Caminho do agente usa índice e não ordena em memória (sem TEMP B-TREE)"""
+        query, params = db._montar_consulta_agendamentos(
+            filtros, colunas=["data_visita", "hora_visita", "nome_cliente", "imovel_id", "status"]
+        )
+
+        conn = db._get_connection()
+        plano = [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+        conn.close()
+
+        assert not any("TEMP B-TREE" in passo for passo in plano), plano
+        assert any("USING INDEX" in passo for passo in plano), plano
+
+
+class TestOcupacao:
+    """Testes do rollup de ocupação (calendário e estatísticas)"""
+
+    def test_calendario_acompanha_escritas(self, db):
+        """Criar, mudar status e deletar mantêm o rollup consistente"""
+        primeiro = agendar(db, "09:00")["agendamento_id"]
+        agendar(db, "11:00")
+        agendar(db, "09:00", data="2099-04-01")
+
+        db.atualizar_agendamento(primeiro, {"status": "confirmado"})
+
+        calendario = db.obter_calendario(2099, 3)
+        assert calendario == {DATA: {"total": 2, "agendado": 1, "confirmado": 1}}
+
+        db.deletar_agendamento(primeiro)
+        assert db.obter_calendario(2099, 3) == {DATA: {"total": 1, "agendado": 1}}
+
+    def test_mudanca_de_data_move_contagem(self, db):
+        """Mover visita de dia transfere a contagem"""
+        agendamento_id = agendar(db, "09:00")["agendamento_id"]
+        db.atualizar_agendamento(agendamento_id, {"data_visita": "2099-03-20"})
+
+        assert list(db.obter_calendario(2099, 3)) == ["2099-03-20"]
+
+    def test_estatisticas_batem_com_agendamentos(self, db):
+        """Estatísticas do rollup devem bater com a contagem real"""
+        agendar(db, "09:00")
+        cancelado = agendar(db, "11:00")["agendamento_id"]
+        db.atualizar_agendamento(cancelado, {"status": "cancelado"})
+
+        stats = db.obter_estatisticas_agenda()
+
+        assert stats["total"] == len(db.listar_agendamentos()) == 2
+        assert stats["por_status"] == {"agendado": 1, "cancelado": 1}
+
+    def test_rollup_reconstruido_em_banco_existente(self, tmp_path):
+        """Banco anterior ao rollup é preenchido na inicialização"""
+        caminho = str(tmp_path / "legado.db")
+        db = LeadsDatabase(caminho)
+        agendar(db, "09:00")
+
+        # Volta o arquivo para a versão anterior à migração do rollup
+        conn = db._get_connection()
+        conn.execute("DROP TABLE agenda_ocupacao")
+        conn.execute("PRAGMA user_version = 5")
+        conn.commit()
+        conn.close()
+
+        assert LeadsDatabase(caminho).obter_calendario(2099, 3) == {DATA: {"total": 1, "agendado": 1}}
+
+
+class TestConcorrencia:
+    """Testes de agendamentos simultâneos"""
+
+    def test_apenas_um_agendamento_vence(self, db):
+        """Requisições simultâneas para o mesmo horário: só uma é aceita"""
+        resultados = []
+
+        def tentar():
+            resultados.append(agendar(db, "10:00"))
+
+        threads = [threading.Thread(target=tentar) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sum(1 for r in resultados if r["success"]) == 1
+        assert sum(1 for r in resultados if r.get("conflito")) == 7
+
+
+class TestRotasAgente:
+    """Rotas do agente com a mesma gramática de data do banco"""
+
+    API_KEY = {'Authorization': 'Bearer dev-token-12345'}
+
+    @pytest.fixture
+    def cliente(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        app = create_app({'DB_PATH': str(tmp_path / 'dashboard.db'), 'DB_MAINTENANCE': False, 'WARMUP': False})
+        yield app.test_client()
+        app.extensions['armazenamento'].fechar()
+
+    def agendar(self, cliente, data, hora="14:00"):
+        return cliente.post('/api/agente/agendar-visita', headers=self.API_KEY, json={
+            'nome_cliente': 'Ana', 'whatsapp': '5531999887766', 'imovel_id': 1,
+            'data_visita': data, 'hora_visita': hora
+        })
+
+    def test_data_compacta(self, cliente):
+        resposta = self.agendar(cliente, DATA.replace("-", ""), "14:00:00")
+        assert resposta.status_code == 201
+        assert resposta.json['detalhes'] == {
+            'cliente': 'Ana', 'whatsapp': '5531999887766', 'imovel_id': 1, 'data': '10/03/2099', 'hora': '14:00'
+        }
+
+        resposta = cliente.get('/api/agenda/agendamentos?data_inicio=20990310&data_fim=20990310')
+        assert [a['data_visita'] for a in resposta.json['agendamentos']] == [DATA]
+
+        resposta = cliente.get('/api/agente/horarios-livres?imovel_id=1&data=20990310&dias=0', headers=self.API_KEY)
+        assert resposta.status_code == 200
+
+    def test_data_invalida_nao_grava(self, cliente):
+        resposta = self.agendar(cliente, "10/03/2099")
+        assert resposta.status_code == 400
+        assert 'instrucao_agente' in resposta.json
+        assert cliente.get('/api/agenda/agendamentos').json['total'] == 0
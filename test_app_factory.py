@@ -0,0 +1,85 @@
+"""
+Testes do create_app
+Valida que criar a app não faz I/O, banco criado na primeira requisição
+de cada processo e OAuth registrado só no primeiro uso
+"""
+import json
+import os
+
+import pytest
+
+import app as modulo_app
+from app import create_app
+
+API_KEY = {'Authorization': f'Bearer {modulo_app.API_KEY}'}
+
+
+@pytest.fixture
+def criar(tmp_path, monkeypatch):
+    """create_app com banco e data/ isolados no tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    apps = []
+
+    def criar(**config):
+        config.setdefault('DB_PATH', str(tmp_path / 'dashboard.db'))
+        config.setdefault('DB_MAINTENANCE', False)
+        config.setdefault('WARMUP', False)
+        app = create_app(config)
+        apps.append(app)
+        return app
+
+    yield criar
+    for app in apps:
+        app.extensions['armazenamento'].fechar()
+
+
+class TestCreateApp:
+    """Testes da inicialização preguiçosa"""
+
+    def test_banco_criado_na_primeira_requisicao(self, criar, tmp_path):
+        app = criar()
+        cliente = app.test_client()
+        assert not (tmp_path / 'dashboard.db').exists()
+
+        assert cliente.get('/api/health').status_code == 200
+        assert not (tmp_path / 'dashboard.db').exists()
+
+        assert cliente.get('/api/leads', headers=API_KEY).status_code == 200
+        assert (tmp_path / 'dashboard.db').exists()
+        assert (tmp_path / 'data' / 'imoveis').is_dir()
+
+    def test_armazenamento_recriado_apos_fork(self, criar, monkeypatch):
+        app = criar()
+        armazenamento = app.extensions['armazenamento']
+        db_pai = armazenamento.db
+        assert armazenamento.db is db_pai
+
+        monkeypatch.setattr(os, 'getpid', lambda: -1)
+        assert armazenamento.db is not db_pai
+
+    def test_redirecionamentos_do_blueprint(self, criar):
+        cliente = criar().test_client()
+        resposta = cliente.get('/')
+        assert resposta.status_code == 302
+        assert resposta.headers['Location'] == '/login'
+
+
+class TestOAuthPreguicoso:
+    """Testes do registro do OAuth no primeiro uso"""
+
+    def test_credenciais_lidas_so_no_primeiro_uso(self, criar, tmp_path):
+        credenciais = tmp_path / 'oauth.json'
+        credenciais.write_text(json.dumps({'web': {'client_id': 'id', 'client_secret': 'segredo'}}))
+        app = criar(OAUTH_CREDENTIALS_FILE=str(credenciais))
+
+        app.test_client().get('/login')
+        assert 'google_oauth' not in app.extensions
+
+        with app.app_context():
+            cliente = modulo_app.google_oauth._get_current_object()
+            assert cliente.client_id == 'id'
+            assert modulo_app.google_oauth._get_current_object() is cliente
+
+    def test_sem_credenciais_app_sobe(self, criar, tmp_path):
+        app = criar(OAUTH_CREDENTIALS_FILE=str(tmp_path / 'nao_existe.json'))
+        assert app.test_client().get('/api/health').status_code == 200
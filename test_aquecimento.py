@@ -0,0 +1,169 @@
+"""
+Testes do Aquecimento do Boot
+Valida tarefas em segundo plano, /api/ready até concluir e os caches
+de catálogo e estatísticas
+"""
+import json
+import os
+import threading
+
+import pytest
+
+import app as modulo_app
+from app import create_app
+from aquecimento import Aquecimento
+from catalogo import CacheArquivos, cache_arquivos
+from database import LeadsDatabase
+from query_stats import contar_consultas
+
+
+@pytest.fixture
+def catalogo(tmp_path, monkeypatch):
+    """data/ com dois imóveis no tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    cache_arquivos.limpar()
+    imoveis = [{'id': i, 'slug': f'imovel-{i:03d}', 'titulo': f'Imóvel {i}'} for i in (1, 2)]
+    for imovel in imoveis:
+        pasta = tmp_path / 'data' / 'imoveis' / imovel['slug']
+        pasta.mkdir(parents=True)
+        (pasta / 'FAQ.txt').write_text(f"FAQ {imovel['id']}", encoding='utf-8')
+        (pasta / 'links.json').write_text(json.dumps({'fotos': [f"{imovel['id']}.jpg"]}), encoding='utf-8')
+    (tmp_path / 'data' / 'INDICE.json').write_text(json.dumps({'imoveis': imoveis}), encoding='utf-8')
+    yield tmp_path
+    cache_arquivos.limpar()
+
+
+class TestAquecimento:
+    """Testes da execução das tarefas"""
+
+    def test_tarefas_executadas_uma_vez_por_processo(self):
+        chamadas = []
+        aquecimento = Aquecimento()
+        aquecimento.registrar('a', lambda: chamadas.append('a'))
+        aquecimento.registrar('b', lambda: chamadas.append('b') or {'itens': 2})
+
+        assert aquecimento.estado() == {'estado': 'pendente'}
+        assert aquecimento.iniciar() is True
+        assert aquecimento.iniciar() is False
+        assert aquecimento.aguardar(5)
+
+        assert chamadas == ['a', 'b']
+        assert aquecimento.concluido
+        assert aquecimento.estado()['tarefas']['b']['detalhes'] == {'itens': 2}
+
+    def test_falha_nao_interrompe_as_demais(self):
+        def falhar():
+            raise OSError("disco")
+
+        aquecimento = Aquecimento()
+        aquecimento.registrar('falha', falhar)
+        aquecimento.registrar('ok', lambda: None)
+        aquecimento.iniciar()
+        aquecimento.aguardar(5)
+
+        tarefas = aquecimento.estado()['tarefas']
+        assert tarefas['falha']['ok'] is False
+        assert tarefas['falha']['erro'] == 'OSError: disco'
+        assert tarefas['ok']['ok'] is True
+        assert aquecimento.concluido
+
+
+class TestProntidao:
+    """/api/ready durante e depois do aquecimento"""
+
+    def test_indisponivel_ate_concluir(self, catalogo):
+        app = create_app({'DB_PATH': str(catalogo / 'dashboard.db'), 'DB_MAINTENANCE': False, 'WARMUP': True})
+        app.extensions['prontidao'].ttl = 0
+        liberar = threading.Event()
+        aquecimento = app.extensions['aquecimento']
+        aquecimento.registrar('bloqueio', lambda: liberar.wait(5))
+        cliente = app.test_client()
+
+        try:
+            resposta = cliente.get('/api/ready')
+            assert resposta.status_code == 503
+            assert 'aquecimento executando' in resposta.json['motivos']
+        finally:
+            liberar.set()
+            assert aquecimento.aguardar(5)
+
+        resposta = cliente.get('/api/ready')
+        assert resposta.status_code == 200
+        tarefas = resposta.json['verificacoes']['aquecimento']['tarefas']
+        assert tarefas['catalogo']['detalhes'] == {'imoveis': 2, 'arquivos': 5}
+        assert tarefas['estatisticas']['ok'] and tarefas['banco']['ok']
+        app.extensions['armazenamento'].fechar()
+
+    def test_probe_por_app(self, catalogo):
+        """Cada app tem o próprio cache de 1s (e o próprio banco)"""
+        config = {'DB_PATH': str(catalogo / 'dashboard.db'), 'DB_MAINTENANCE': False, 'WARMUP': False}
+        primeira, segunda = create_app(config), create_app(config)
+        assert primeira.extensions['prontidao'] is not segunda.extensions['prontidao']
+
+    def test_desativado(self, catalogo):
+        app = create_app({'DB_PATH': str(catalogo / 'dashboard.db'), 'DB_MAINTENANCE': False, 'WARMUP': False})
+        resposta = app.test_client().get('/api/ready')
+        assert resposta.json['verificacoes']['aquecimento']['estado'] == 'desativado'
+        app.extensions['armazenamento'].fechar()
+
+
+class TestCaches:
+    """Testes do cache de arquivos e do cache de estatísticas"""
+
+    def test_arquivo_recarregado_quando_muda(self, tmp_path):
+        cache = CacheArquivos()
+        caminho = tmp_path / 'FAQ.txt'
+        caminho.write_text('v1', encoding='utf-8')
+
+        assert cache.ler_texto(str(caminho)) == 'v1'
+        caminho.write_text('versão 2', encoding='utf-8')
+        assert cache.ler_texto(str(caminho)) == 'versão 2'
+
+        caminho.unlink()
+        assert cache.ler_texto(str(caminho), 'padrão') == 'padrão'
+        assert len(cache) == 0
+
+    def test_copia_nao_altera_o_cache(self, tmp_path):
+        cache = CacheArquivos()
+        caminho = str(tmp_path / 'INDICE.json')
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump({'imoveis': []}, f)
+
+        cache.ler_json(caminho, copia=True)['imoveis'].append({'id': 1})
+        assert cache.ler_json(caminho) == {'imoveis': []}
+
+    def test_rotas_de_escrita_nao_alteram_o_cache(self, catalogo):
+        app = create_app({'DB_PATH': str(catalogo / 'dashboard.db'), 'DB_MAINTENANCE': False, 'WARMUP': False})
+        with app.test_request_context():
+            indice = modulo_app.ler_indice()
+            modulo_app.ler_indice(copia=True)['imoveis'].clear()
+            assert len(modulo_app.ler_indice()['imoveis']) == 2
+            assert modulo_app.ler_indice() is indice
+
+    def test_estatisticas_reaproveitadas_ate_o_banco_mudar(self, tmp_path):
+        db = LeadsDatabase(str(tmp_path / 'dashboard.db'), pool_leitura=0)
+        db.registrar_lead("5531000000001", "Ana", 1, 80, False)
+        assert db.obter_estatisticas()['total_leads'] == 1
+
+        with contar_consultas() as contagem:
+            db.obter_estatisticas()['total_leads'] = 99
+            assert db.obter_estatisticas()['total_leads'] == 1
+        assert contagem.consultas == 0
+
+        # Escrita por outra conexão (outro worker) também invalida
+        outro = LeadsDatabase(db.db_path, pool_leitura=0)
+        outro.registrar_lead("5531000000002", "Bia", 1, 10, False)
+        assert db.obter_estatisticas()['total_leads'] == 2
+
+    def test_estatisticas_invalidadas_com_arquivo_aparentemente_igual(self, tmp_path, monkeypatch):
+        """Checkpoint reescreve o -wal com o mesmo tamanho; mtime grosso não muda"""
+        db = LeadsDatabase(str(tmp_path / 'dashboard.db'), pool_leitura=0)
+        db.registrar_lead("5531000000001", "Ana", 1, 80, False)
+        assert db.obter_estatisticas()['total_leads'] == 1
+
+        stat_original = os.stat
+        congelado = {caminho: stat_original(caminho) for caminho in (db.db_path, f"{db.db_path}-wal")}
+        monkeypatch.setattr(os, 'stat', lambda caminho, *a, **k: congelado.get(str(caminho)) or stat_original(caminho, *a, **k))
+
+        db.registrar_lead("5531000000002", "Bia", 1, 10, False)
+        assert db.obter_estatisticas()['total_leads'] == 2
@@ -0,0 +1,138 @@
+"""
+Testes do Pipeline de Assets
+Valida hash no nome, reescrita das referências no HTML, variantes
+pré-comprimidas, cache imutável e revalidação por ETag
+"""
+import gzip
+import os
+
+import pytest
+
+from app import create_app
+from assets import ManifestoAssets
+
+JS = "console.log('painel');\n" * 100
+
+
+@pytest.fixture
+def static(tmp_path):
+    pasta = tmp_path / 'static'
+    pasta.mkdir()
+    (pasta / 'app.js').write_text(JS, encoding='utf-8')
+    (pasta / 'style.css').write_text('body { color: red; }', encoding='utf-8')
+    (pasta / 'index.html').write_text(
+        '<link rel="stylesheet" href="/static/style.css">\n'
+        '<script src="/static/app.js?v=1762738405"></script>\n'
+        '<script src="/static/nao_existe.js"></script>\n'
+        '<script src="https://cdn.exemplo.com/lib.js"></script>\n', encoding='utf-8'
+    )
+    return pasta
+
+
+def reescrever(caminho, conteudo):
+    """Escreve e garante mtime diferente (sistemas com resolução grossa)"""
+    info = os.stat(caminho)
+    caminho.write_text(conteudo, encoding='utf-8')
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000))
+
+
+class TestManifesto:
+    """Testes do manifesto em memória"""
+
+    def test_url_com_hash(self, static):
+        manifesto = ManifestoAssets(str(static))
+        url = manifesto.url('app.js')
+
+        assert url.startswith('/static/app.') and url.endswith('.js')
+        assert manifesto.por_url(url[len('/static/'):]).conteudo == JS.encode('utf-8')
+        assert manifesto.url('nao_existe.js') == '/static/nao_existe.js'
+
+    def test_html_reescrito_e_cacheado(self, static):
+        manifesto = ManifestoAssets(str(static))
+        html = manifesto.html('index.html')
+        texto = html.conteudo.decode('utf-8')
+
+        assert f'href="{manifesto.url("style.css")}"' in texto
+        assert f'src="{manifesto.url("app.js")}"' in texto
+        assert '?v=' not in texto
+        assert 'src="/static/nao_existe.js"' in texto
+        assert 'https://cdn.exemplo.com/lib.js' in texto
+        assert manifesto.html('index.html') is html
+
+    def test_asset_editado_muda_hash_e_html(self, static):
+        manifesto = ManifestoAssets(str(static))
+        url_antiga = manifesto.url('app.js')
+        html = manifesto.html('index.html')
+
+        reescrever(static / 'app.js', JS + "console.log('novo');\n")
+        url_nova = manifesto.url('app.js')
+
+        assert url_nova != url_antiga
+        assert manifesto.por_url(url_antiga[len('/static/'):]) is None
+        novo_html = manifesto.html('index.html')
+        assert novo_html is not html
+        assert url_nova in novo_html.conteudo.decode('utf-8')
+
+    def test_variantes_pre_comprimidas(self, static):
+        asset = ManifestoAssets(str(static)).asset('app.js')
+
+        codificacao, corpo = asset.variante(['gzip'])
+        assert codificacao == 'gzip'
+        assert gzip.decompress(corpo) == asset.conteudo
+        assert asset.variante([]) == (None, asset.conteudo)
+
+    def test_arquivo_pequeno_sem_variantes(self, static):
+        asset = ManifestoAssets(str(static)).asset('style.css')
+        assert asset.codificacoes == []
+
+
+class TestRotas:
+    """Rotas servindo o manifesto global (static/ do repositório)"""
+
+    @pytest.fixture
+    def cliente(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        app = create_app({'DB_PATH': str(tmp_path / 'dashboard.db'), 'DB_MAINTENANCE': False, 'WARMUP': False})
+        cliente = app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao['user'] = {'email': 'admin@teste.com', 'approved': True, 'is_admin': True}
+        yield cliente
+        app.extensions['armazenamento'].fechar()
+
+    def test_index_com_urls_com_hash(self, cliente):
+        resposta = cliente.get('/', headers={'Accept-Encoding': 'gzip'})
+
+        assert resposta.status_code == 200
+        assert resposta.headers['Content-Encoding'] == 'gzip'
+        assert resposta.headers['Cache-Control'] == 'private, no-cache'
+        assert 'Accept-Encoding' in resposta.headers['Vary']
+        html = gzip.decompress(resposta.data).decode('utf-8')
+        assert 'leads_v2.js?v=' not in html
+
+        revalidacao = cliente.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': resposta.headers['ETag']})
+        assert revalidacao.status_code == 304
+
+    def test_html_nunca_em_cache_compartilhado(self, cliente):
+        anonimo = cliente.application.test_client()
+        for resposta in (cliente.get('/'), anonimo.get('/login')):
+            assert resposta.status_code == 200
+            assert resposta.headers['Cache-Control'] == 'private, no-cache'
+
+    def test_asset_com_hash_imutavel(self, cliente):
+        from assets import manifesto_assets
+        url = manifesto_assets.url('leads_v2.js')
+
+        resposta = cliente.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert resposta.status_code == 200
+        assert resposta.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert resposta.headers['Content-Encoding'] == 'gzip'
+
+        sem_compressao = cliente.get(url, headers={'Accept-Encoding': 'identity'})
+        assert 'Content-Encoding' not in sem_compressao.headers
+        assert gzip.decompress(resposta.data) == sem_compressao.data
+
+    def test_url_sem_hash_revalida(self, cliente):
+        resposta = cliente.get('/static/leads_v2.js')
+        assert resposta.status_code == 200
+        assert resposta.headers['Cache-Control'] == 'no-cache'
+        assert cliente.get('/static/nao_existe.js').status_code == 404
@@ -0,0 +1,80 @@
+"""
+Testes do Benchmark do LeadsDatabase
+Valida a execução dos casos e a detecção de regressões contra o baseline
+"""
+import json
+
+from benchmark_db import casos, comparar, executar, main
+
+
+def resultado_com(p50_por_caso, tamanho="1000"):
+    return {'resultados': {tamanho: {nome: {'p50_ms': p50} for nome, p50 in p50_por_caso.items()}}}
+
+
+class TestComparar:
+    """Testes da comparação com o baseline"""
+
+    def test_dentro_do_orcamento(self):
+        baseline = resultado_com({'obter_estatisticas': 2.0})
+        atual = resultado_com({'obter_estatisticas': 2.4})
+        assert comparar(atual, baseline, orcamento=0.25) == []
+
+    def test_regressao_acima_do_orcamento(self):
+        baseline = resultado_com({'obter_estatisticas': 2.0, 'buscar_lead': 1.0})
+        atual = resultado_com({'obter_estatisticas': 3.0, 'buscar_lead': 0.5})
+
+        regressoes = comparar(atual, baseline, orcamento=0.25)
+
+        assert len(regressoes) == 1
+        assert regressoes[0]['caso'] == 'obter_estatisticas'
+        assert regressoes[0]['variacao_pct'] == 50.0
+        assert regressoes[0]['tamanho'] == 1000
+
+    def test_orcamento_por_caso(self):
+        baseline = resultado_com({'obter_estatisticas': 2.0})
+        baseline['orcamentos'] = {'obter_estatisticas': 1.0}
+        atual = resultado_com({'obter_estatisticas': 3.0})
+        assert comparar(atual, baseline, orcamento=0.25) == []
+
+    def test_caso_novo_ou_tamanho_novo_ignorado(self):
+        baseline = resultado_com({'obter_estatisticas': 2.0})
+        atual = resultado_com({'listar_leads': 9.0})
+        atual['resultados']['5000'] = {'obter_estatisticas': {'p50_ms': 9.0}}
+        assert comparar(atual, baseline, orcamento=0.25) == []
+
+
+class TestExecucao:
+    """Execução real em banco pequeno"""
+
+    def test_cobre_metodos_publicos(self):
+        nomes = set(casos(100))
+        for metodo in ('registrar_lead.criar', 'registrar_lead.atualizar', 'obter_estatisticas',
+                       'listar_agendamentos', 'obter_historico', 'deletar_lead'):
+            assert metodo in nomes
+        for filtro in ('score_min', 'score_max', 'imovel_id', 'agendou_visita'):
+            assert f'listar_leads.{filtro}' in nomes
+
+    def test_executar_e_comparar_baseline(self, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        argumentos = ['--tamanhos', '100', '--tempo', '0.05', '--iteracoes', '5',
+                      '--dados', str(tmp_path / "dados")]
+
+        assert main(argumentos + ['--salvar', str(baseline)]) == 0
+        dados = json.loads(baseline.read_text())
+        resultados = dados['resultados']['100']
+        assert set(resultados) == set(casos(100))
+        assert all(r['iteracoes'] > 0 and r['p50_ms'] > 0 for r in resultados.values())
+
+        # Orçamento enorme: mesma máquina não deve regredir 100x
+        assert main(argumentos + ['--baseline', str(baseline), '--orcamento', '100']) == 0
+
+        # Baseline impossível de cumprir
+        for caso in resultados.values():
+            caso['p50_ms'] = 1e-9
+        baseline.write_text(json.dumps(dados))
+        assert main(argumentos + ['--baseline', str(baseline)]) == 1
+
+    def test_deletar_nao_passa_do_total_de_leads(self, tmp_path):
+        resultado = executar([20], tempo_max=1.0, iteracoes_max=1000, filtro='deletar_lead',
+                             log=lambda *_: None)
+        assert resultado['resultados']['20']['deletar_lead']['iteracoes'] == 10
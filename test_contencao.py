@@ -0,0 +1,183 @@
+"""
+Testes da Política de Contenção de Escrita
+Valida backoff com jitter, prazo por requisição, BEGIN IMMEDIATE nas
+escritas e o 503 com retry_after dinâmico
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import database
+from auth.models import UserModel
+from database import (
+    LeadsDatabase, contador_lock, db_lock_contention_total, prazo_escrita,
+    retry_on_db_lock, tempo_restante
+)
+from decorators import retry_on_lock
+
+
+@pytest.fixture
+def db(tmp_path):
+    contador_lock.resetar()
+    return LeadsDatabase(str(tmp_path / "dashboard.db"))
+
+
+@pytest.fixture
+def lock_externo(db):
+    """Outra conexão segurando o lock de escrita"""
+    conn = sqlite3.connect(db.db_path, isolation_level=None, check_same_thread=False)
+    conn.execute("BEGIN IMMEDIATE")
+    yield conn
+    conn.rollback()
+    conn.close()
+
+
+def sempre_locked():
+    raise sqlite3.OperationalError("database is locked")
+
+
+class TestBackoff:
+    """Testes do retry_on_db_lock"""
+
+    def setup_method(self):
+        contador_lock.resetar()
+
+    def test_jitter_limitado_pelo_teto(self, monkeypatch):
+        esperas = []
+        monkeypatch.setattr(database.time, 'sleep', esperas.append)
+
+        funcao = retry_on_db_lock(max_retries=6, backoff_ms=100, max_backoff_ms=300, prazo_s=60)(sempre_locked)
+        with pytest.raises(sqlite3.OperationalError):
+            funcao()
+
+        assert len(esperas) == 5
+        tetos = [0.1, 0.2, 0.3, 0.3, 0.3]
+        assert all(0 <= espera <= teto for espera, teto in zip(esperas, tetos))
+        assert len(set(esperas)) > 1
+
+    def test_prazo_limita_tentativas(self):
+        inicio = time.monotonic()
+        funcao = retry_on_db_lock(max_retries=1000, backoff_ms=50, prazo_s=0.2)(sempre_locked)
+        with pytest.raises(sqlite3.OperationalError):
+            funcao()
+
+        assert time.monotonic() - inicio < 1
+        assert contador_lock.snapshot()['esgotados'] == 1
+
+    def test_outros_erros_nao_tem_retry(self):
+        tentativas = []
+
+        @retry_on_db_lock()
+        def falha():
+            tentativas.append(1)
+            raise sqlite3.OperationalError("no such table: x")
+
+        with pytest.raises(sqlite3.OperationalError):
+            falha()
+        assert len(tentativas) == 1
+
+    def test_prazo_aninhado_nao_estende(self):
+        with prazo_escrita(0.5):
+            with prazo_escrita(10):
+                assert tempo_restante() <= 0.5
+        assert tempo_restante() is None
+
+
+class TestEscritasContendidas:
+    """Escritas reais com outra conexão segurando o lock"""
+
+    def test_lock_propaga_em_vez_de_virar_erro(self, db, lock_externo):
+        """Antes: {"success": False} depois de esperar 30s; agora falha no prazo"""
+        inicio = time.monotonic()
+        with prazo_escrita(0.3):
+            with pytest.raises(sqlite3.OperationalError):
+                db.salvar_configuracao('chave', 'valor')
+
+        assert time.monotonic() - inicio < 2
+        assert db_lock_contention_total.valor(metodo='salvar_configuracao', evento='esgotado') >= 1
+        assert contador_lock.retry_after() >= 1
+
+    def test_todas_as_escritas_tem_retry(self, db, lock_externo):
+        users = UserModel.__new__(UserModel)
+        users.db = db
+        escritas = [
+            lambda: db.registrar_lead("5531000000001", "Ana", 1, 10, False),
+            lambda: db.criar_agendamento("Ana", "5531000000001", 1, "2025-03-10", "10:00"),
+            lambda: db.atualizar_agendamento(1, {'status': 'confirmado'}),
+            lambda: db.deletar_agendamento(1),
+            lambda: db.deletar_lead("5531000000001"),
+            lambda: db.salvar_regras_agenda({}),
+            lambda: users.aprovar_usuario(1),
+            lambda: users.revogar_usuario(1),
+        ]
+        for escrita in escritas:
+            contador_lock.resetar()
+            with prazo_escrita(0.1):
+                with pytest.raises(sqlite3.OperationalError):
+                    escrita()
+            assert contador_lock.snapshot()['esgotados'] == 1
+
+    def test_escrita_conclui_quando_lock_e_liberado(self, db, lock_externo):
+        threading.Timer(0.2, lock_externo.rollback).start()
+        resultado = db.registrar_lead("5531000000001", "Ana", 1, 10, False)
+        assert resultado['success']
+
+    def test_retry_no_python_com_lock_liberado_no_meio_do_prazo(self, db, lock_externo):
+        """Busy timeout curto por tentativa: a espera é do backoff, não do SQLite"""
+        threading.Timer(0.4, lock_externo.rollback).start()
+        inicio = time.monotonic()
+        with prazo_escrita(3):
+            resultado = db.registrar_lead("5531000000001", "Ana", 1, 10, False)
+
+        assert resultado['success']
+        assert contador_lock.snapshot()['retries'] > 0
+        assert contador_lock.snapshot()['esgotados'] == 0
+        assert time.monotonic() - inicio < 3
+
+    def test_mesmo_whatsapp_em_paralelo(self, db):
+        """Check-then-insert sob BEGIN IMMEDIATE: sem IntegrityError"""
+        resultados, erros = [], []
+
+        def registrar(i):
+            try:
+                resultados.append(db.registrar_lead("5531000000009", "Ana", 1, i, False))
+            except Exception as e:
+                erros.append(e)
+
+        threads = [threading.Thread(target=registrar, args=(i,)) for i in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert erros == []
+        assert [r['acao'] for r in resultados].count('created') == 1
+        assert len(db.listar_leads()) == 1
+
+
+class TestRespostaHTTP:
+    """Testes do 503 do retry_on_lock"""
+
+    def test_503_com_retry_after_da_contencao(self, db, lock_externo):
+        app = Flask(__name__)
+
+        @app.route('/escrever', methods=['POST'])
+        @retry_on_lock(prazo_s=0.2)
+        def escrever():
+            db.salvar_configuracao('chave', 'valor')
+            return {'success': True}
+
+        contador_lock.registrar_espera(3.2)
+        resposta = app.test_client().post('/escrever')
+
+        assert resposta.status_code == 503
+        assert resposta.json['reason'] == 'database_busy'
+        assert resposta.json['retry_after'] == 2  # média de 3.2s e ~0.2s, arredondada para cima
+        assert resposta.headers['Retry-After'] == '2'
+
+    def test_retry_after_sem_contencao_recente(self):
+        contador_lock.resetar()
+        assert contador_lock.retry_after() == 1
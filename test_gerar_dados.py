@@ -0,0 +1,75 @@
+"""
+Testes do Gerador de Dados Sintéticos
+Valida determinismo, contagens e consistência dos agregados
+"""
+import json
+import sqlite3
+
+import pytest
+
+from database import LeadsDatabase
+from gerar_dados import gerar
+
+
+def gerar_em(diretorio, **kwargs):
+    parametros = dict(leads=200, agendamentos=150, imoveis=5, dias=30, log=lambda *_: None)
+    parametros.update(kwargs)
+    gerar(str(diretorio), **parametros)
+    return diretorio
+
+
+def despejar(diretorio, tabela):
+    conn = sqlite3.connect(str(diretorio / "dashboard.db"))
+    linhas = conn.execute(f"SELECT * FROM {tabela} ORDER BY id").fetchall()
+    conn.close()
+    return linhas
+
+
+class TestGerador:
+    """Testes do gerador"""
+
+    def test_mesma_semente_mesmos_dados(self, tmp_path):
+        a = gerar_em(tmp_path / "a", seed=7)
+        b = gerar_em(tmp_path / "b", seed=7)
+        c = gerar_em(tmp_path / "c", seed=8)
+
+        for tabela in ("leads", "score_historico", "agendamentos"):
+            assert despejar(a, tabela) == despejar(b, tabela)
+        assert despejar(a, "leads") != despejar(c, "leads")
+        assert (a / "INDICE.json").read_text() == (b / "INDICE.json").read_text()
+
+    def test_contagens_e_catalogo(self, tmp_path):
+        saida = gerar_em(tmp_path)
+
+        assert len(despejar(saida, "leads")) == 200
+        assert len(despejar(saida, "agendamentos")) == 150
+        assert len(despejar(saida, "score_historico")) >= 200
+
+        indice = json.loads((saida / "INDICE.json").read_text(encoding="utf-8"))
+        assert indice["total_imoveis"] == 5
+        slug = indice["imoveis"][0]["slug"]
+        assert (saida / "imoveis" / slug / "FAQ.txt").exists()
+        assert json.loads((saida / "imoveis" / slug / "links.json").read_text())["fotos"]
+
+    def test_agregados_consistentes(self, tmp_path):
+        """Rollup e bitmaps refletem os INSERTs em massa"""
+        saida = gerar_em(tmp_path)
+        db = LeadsDatabase(str(saida / "dashboard.db"))
+
+        stats = db.obter_estatisticas_agenda()
+        assert stats["total"] == 150
+
+        conn = sqlite3.connect(str(saida / "dashboard.db"))
+        dias_ocupados = conn.execute("""
+            SELECT COUNT(DISTINCT imovel_id || data_visita) FROM agendamentos WHERE status != 'cancelado'
+        """).fetchone()[0]
+        assert conn.execute("SELECT COUNT(*) FROM agenda_slots").fetchone()[0] == dias_ocupados
+        conn.close()
+
+    def test_recusa_banco_existente_e_capacidade(self, tmp_path):
+        gerar_em(tmp_path)
+        with pytest.raises(FileExistsError):
+            gerar_em(tmp_path)
+
+        with pytest.raises(ValueError):
+            gerar_em(tmp_path / "cheio", agendamentos=10_000, imoveis=1, dias=1)
@@ -0,0 +1,150 @@
+"""
+Testes da Manutenção do SQLite
+Valida checkpoints PASSIVE/TRUNCATE por ociosidade, optimize,
+incremental vacuum e métricas
+"""
+import os
+import sqlite3
+import time
+
+import pytest
+
+from database import LeadsDatabase
+from manutencao import ManutencaoBanco, db_last_checkpoint_timestamp_seconds, db_wal_bytes
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = LeadsDatabase(str(tmp_path / "dashboard.db"), pool_leitura=0)
+    for i in range(100):
+        db.registrar_lead(f"55310000{i:05d}", "Lead " + "x" * 2000, 1, i, False)
+    return db
+
+
+@pytest.fixture
+def manutencao(db):
+    manutencao = ManutencaoBanco(db.db_path, ocioso_s=60, otimizar_s=3600, vacuum_min_paginas=10)
+    yield manutencao
+    manutencao.parar()
+
+
+class TestCheckpoints:
+    """Testes dos checkpoints"""
+
+    def test_passive_com_escritas_recentes_e_truncate_quando_ocioso(self, db, manutencao):
+        # Mantém o -wal existindo entre as rodadas
+        leitor = sqlite3.connect(db.db_path)
+        leitor.execute("SELECT COUNT(*) FROM leads").fetchone()
+        db.registrar_lead("5531888888888", "Outro", 1, 10, False)
+
+        assert 'passive' in manutencao.rodada(agora=1000)
+        assert manutencao.tamanho_wal() > 0
+
+        executadas = manutencao.rodada(agora=1000 + 60)
+        assert executadas['truncate']['bloqueado'] is False
+        assert manutencao.tamanho_wal() == 0
+        assert db_wal_bytes.valor() == 0
+        assert db_last_checkpoint_timestamp_seconds.valor() > 0
+
+        # Já truncado e sem commits novos: volta ao PASSIVE
+        assert 'passive' in manutencao.rodada(agora=1000 + 120)
+
+        # Commit de outra conexão reinicia a contagem de ociosidade
+        db.registrar_lead("5531999999999", "Novo", 1, 10, False)
+        assert 'passive' in manutencao.rodada(agora=1000 + 180)
+        leitor.close()
+
+    def test_truncate_nao_espera_leitor_e_tenta_de_novo(self, db, manutencao):
+        manutencao.rodada(agora=0)
+
+        leitor = sqlite3.connect(db.db_path, isolation_level=None)
+        leitor.execute("BEGIN")
+        leitor.execute("SELECT COUNT(*) FROM leads").fetchone()
+        db.registrar_lead("5531999999999", "Novo", 1, 10, False)
+        manutencao.rodada(agora=1)
+
+        inicio = time.monotonic()
+        assert manutencao.rodada(agora=100)['truncate']['bloqueado'] is True
+        assert time.monotonic() - inicio < 2
+
+        leitor.execute("COMMIT")
+        assert manutencao.rodada(agora=200)['truncate']['bloqueado'] is False
+        leitor.close()
+
+
+class TestOtimizacao:
+    """Testes de optimize e incremental vacuum"""
+
+    def test_otimizar_gera_estatisticas(self, db, manutencao):
+        manutencao.otimizar()
+
+        conn = sqlite3.connect(db.db_path)
+        tabelas = {linha[0] for linha in conn.execute("SELECT tbl FROM sqlite_stat1")}
+        conn.close()
+        assert 'leads' in tabelas
+
+    def test_otimizar_so_quando_ocioso(self, db):
+        manutencao = ManutencaoBanco(db.db_path, ocioso_s=60, otimizar_s=0)
+        try:
+            assert 'otimizar' not in manutencao.rodada(agora=0)
+            assert 'otimizar' in manutencao.rodada(agora=60)
+        finally:
+            manutencao.parar()
+
+    def test_otimizar_com_escritor_ativo_nao_impede_checkpoint(self, db, manutencao):
+        manutencao.rodada(agora=0)
+        escritor = sqlite3.connect(db.db_path, isolation_level=None)
+        escritor.execute("BEGIN IMMEDIATE")
+        try:
+            executadas = manutencao.rodada(agora=60)
+            assert executadas['otimizar']['bloqueado'] is True
+            assert 'truncate' in executadas
+            assert manutencao.estado['ultima_otimizacao'] is None
+        finally:
+            escritor.rollback()
+            escritor.close()
+
+        # Não conta como feita: tenta de novo na próxima rodada ociosa
+        assert manutencao.rodada(agora=120)['otimizar']['bloqueado'] is False
+
+    def test_incremental_vacuum_apos_delecao(self, db, manutencao):
+        tamanho_antes = os.path.getsize(db.db_path)
+        for i in range(100):
+            db.deletar_lead(f"55310000{i:05d}")
+        manutencao.checkpoint('TRUNCATE')
+
+        liberadas = manutencao.vacuum_incremental()
+        manutencao.checkpoint('TRUNCATE')
+
+        assert liberadas > 0
+        assert manutencao.estado['paginas_liberadas'] == liberadas
+        assert os.path.getsize(db.db_path) < tamanho_antes
+
+    def test_banco_sem_auto_vacuum_e_ignorado(self, tmp_path):
+        caminho = str(tmp_path / "antigo.db")
+        conn = sqlite3.connect(caminho)
+        conn.execute("CREATE TABLE t (x TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?)", [("x" * 1000,) for _ in range(200)])
+        conn.execute("DELETE FROM t")
+        conn.commit()
+        conn.close()
+
+        manutencao = ManutencaoBanco(caminho, vacuum_min_paginas=10)
+        try:
+            assert manutencao.vacuum_incremental() == 0
+        finally:
+            manutencao.parar()
+
+
+class TestThread:
+    """Testes da thread"""
+
+    def test_iniciar_e_parar(self, manutencao):
+        manutencao.intervalo_s = 0.02
+        manutencao.iniciar()
+        time.sleep(0.2)
+        assert manutencao.resumo()['ativa'] is True
+        assert manutencao.estado['rodadas'] > 0
+
+        manutencao.parar()
+        assert manutencao.resumo()['ativa'] is False
@@ -0,0 +1,61 @@
+"""
+Testes da Introspecção de Memória
+Valida tamanho das estruturas e diffs do tracemalloc
+"""
+import pytest
+
+from memoria import MonitorMemoria, tamanho_profundo
+from rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def monitor():
+    monitor = MonitorMemoria()
+    yield monitor
+    monitor.parar()
+
+
+class TestEstruturas:
+    """Testes do relatório de estruturas registradas"""
+
+    def test_tamanho_cresce_com_clientes_do_limiter(self, monitor):
+        """Cada IP novo no rate limiter aparece em itens e bytes"""
+        limiter = RateLimiter()
+        monitor.registrar('requests', lambda: dict(limiter.requests))
+        antes = monitor.estruturas()['requests']
+
+        for i in range(100):
+            limiter.is_allowed(f"10.0.0.{i}")
+        depois = monitor.estruturas()['requests']
+
+        assert (antes['itens'], depois['itens']) == (0, 100)
+        assert depois['bytes'] > antes['bytes']
+
+    def test_tamanho_profundo_nao_conta_repetidos(self):
+        item = "x" * 1000
+        assert tamanho_profundo([item, item]) < tamanho_profundo([item, "y" * 1000])
+
+    def test_erro_na_estrutura_nao_derruba_relatorio(self, monitor):
+        monitor.registrar('quebrada', lambda: 1 / 0)
+        assert 'erro' in monitor.estruturas()['quebrada']
+
+
+class TestTracemalloc:
+    """Testes dos snapshots e diffs"""
+
+    def test_diff_aponta_alocacao_retida(self, monitor):
+        """Alocação feita entre snapshots aparece no topo do diff"""
+        monitor.snapshot()
+        retido = [bytearray(1024) for _ in range(2000)]
+        monitor.snapshot()
+
+        diff = monitor.diff(top=5)
+
+        assert diff['diferenca_total_bytes'] > 1024 * 2000 * 0.9
+        assert any('test_memoria.py' in a['origem'][0] for a in diff['alocacoes'])
+        assert retido
+
+    def test_diff_exige_dois_snapshots(self, monitor):
+        monitor.snapshot()
+        with pytest.raises(ValueError):
+            monitor.diff()
@@ -0,0 +1,96 @@
+"""
+Testes das Métricas da API
+Valida histogramas, formato Prometheus e hooks do Flask
+"""
+import uuid
+
+import pytest
+from flask import Flask, jsonify
+
+from decorators import deduplicate
+from metrics import (
+    MetricsRegistry, init_metrics, http_requests_total, http_request_duration_seconds,
+    duplicate_rejections_total
+)
+
+
+class TestHistograma:
+    """Testes do histograma de buckets fixos"""
+
+    def test_buckets_cumulativos_no_formato_prometheus(self):
+        """Exportação deve ter buckets cumulativos, +Inf, _sum e _count"""
+        registry = MetricsRegistry()
+        hist = registry.histogram('latencia', 'teste', ('route',), buckets=(0.1, 1.0))
+
+        hist.observe(0.05, route='/a')
+        hist.observe(0.5, route='/a')
+        hist.observe(5, route='/a')
+
+        texto = registry.exportar()
+
+        assert '# TYPE latencia histogram' in texto
+        assert 'latencia_bucket{route="/a",le="0.1"} 1' in texto
+        assert 'latencia_bucket{route="/a",le="1"} 2' in texto
+        assert 'latencia_bucket{route="/a",le="+Inf"} 3' in texto
+        assert 'latencia_sum{route="/a"} 5.55' in texto
+        assert 'latencia_count{route="/a"} 3' in texto
+
+    def test_quantil_estimado_pelo_bucket(self):
+        """p50/p99 devem cair no bucket correto"""
+        hist = MetricsRegistry().histogram('latencia', 'teste', buckets=(0.01, 0.1, 1.0))
+
+        for _ in range(98):
+            hist.observe(0.005)
+        hist.observe(0.5)
+        hist.observe(0.5)
+
+        assert hist.quantil(0.5) == 0.01
+        assert hist.quantil(0.99) == 1.0
+
+    def test_escapa_labels(self):
+        """Aspas e barras em labels devem ser escapadas"""
+        registry = MetricsRegistry()
+        registry.counter('total', 'teste', ('route',)).inc(route='/a"b')
+
+        assert 'total{route="/a\\"b"} 1' in registry.exportar()
+
+
+class TestHooksFlask:
+    """Testes da medição por rota via before/after_request"""
+
+    @pytest.fixture
+    def client(self):
+        app = Flask(__name__)
+        init_metrics(app)
+
+        @app.route('/itens/<int:item_id>')
+        def item(item_id):
+            return jsonify({'id': item_id})
+
+        @app.route('/dedup')
+        @deduplicate(window_seconds=5)
+        def dedup():
+            return jsonify({'ok': True})
+
+        return app.test_client()
+
+    def test_registra_por_regra_da_rota(self, client):
+        """Label route usa a regra (/itens/<int:item_id>), não o path"""
+        antes = http_requests_total.valor(route='/itens/<int:item_id>', method='GET', status=200)
+
+        client.get('/itens/1')
+        client.get('/itens/2')
+
+        assert http_requests_total.valor(route='/itens/<int:item_id>', method='GET', status=200) == antes + 2
+        assert http_request_duration_seconds.quantil(0.5, route='/itens/<int:item_id>', method='GET', status=200)
+
+    def test_conta_rejeicoes_por_duplicata(self, client):
+        """409 do deduplicate deve aparecer no contador específico"""
+        antes = duplicate_rejections_total.valor(route='/dedup')
+        chave = uuid.uuid4().hex
+
+        assert client.get(f'/dedup?id={chave}').status_code == 200
+        assert client.get(f'/dedup?id={chave}').status_code == 409
+
+        assert duplicate_rejections_total.valor(route='/dedup') == antes + 1
+        assert http_requests_total.valor(route='/dedup', method='GET', status=409) >= 1
@@ -0,0 +1,150 @@
+"""
+Testes das Migrações Versionadas
+Valida user_version, boot sem DDL com schema em dia, bancos anteriores
+ao versionamento, rollback de migração com erro e duplicatas na agenda
+"""
+import sqlite3
+
+import pytest
+
+from auth.models import UserModel
+from database import LeadsDatabase
+from migracoes import MIGRACOES, VERSAO_ATUAL, migrar, versao_schema
+from query_stats import contar_consultas
+
+
+def versao(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return versao_schema(conn)
+    finally:
+        conn.close()
+
+
+class TestMigracoes:
+    """Testes do runner"""
+
+    def test_banco_novo_vai_para_versao_atual(self, tmp_path):
+        caminho = str(tmp_path / "novo.db")
+        db = LeadsDatabase(caminho, pool_leitura=0)
+
+        assert versao(caminho) == VERSAO_ATUAL
+        UserModel(db).criar_ou_atualizar({'sub': 'g1', 'email': 'a@b.c'}, {})
+        assert db.registrar_lead("5531000000001", "Ana", 1, 10, False)['success']
+
+    def test_boot_com_schema_em_dia_so_le_user_version(self, tmp_path):
+        caminho = str(tmp_path / "dashboard.db")
+        LeadsDatabase(caminho, pool_leitura=0)
+
+        with contar_consultas(detalhar=True) as contagem:
+            db = LeadsDatabase(caminho, pool_leitura=0)
+            UserModel(db)
+
+        assert contagem.sql == ['PRAGMA user_version']
+
+    def test_banco_anterior_ao_versionamento(self, tmp_path):
+        """Versão 0 com tabelas antigas: migrações idempotentes completam o schema"""
+        caminho = str(tmp_path / "legado.db")
+        conn = sqlite3.connect(caminho)
+        conn.execute("""
+            CREATE TABLE users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                google_id TEXT UNIQUE NOT NULL,
+                email TEXT UNIQUE NOT NULL
+            )
+        """)
+        conn.execute("INSERT INTO users (google_id, email) VALUES ('g1', 'a@b.c')")
+        conn.commit()
+        conn.close()
+
+        db = LeadsDatabase(caminho, pool_leitura=0)
+
+        assert versao(caminho) == VERSAO_ATUAL
+        usuario = UserModel(db).buscar_por_email('a@b.c')
+        assert usuario['approved'] == 0 and usuario['is_admin'] == 0
+
+    def test_migracao_com_erro_desfaz_tudo(self, tmp_path):
+        caminho = str(tmp_path / "dashboard.db")
+        db = LeadsDatabase(caminho, pool_leitura=0)
+
+        def criar_tabela(cursor, db):
+            cursor.execute("CREATE TABLE nova (x INTEGER)")
+
+        def falhar(cursor, db):
+            raise sqlite3.OperationalError("falhou")
+
+        conn = sqlite3.connect(caminho)
+        with pytest.raises(sqlite3.OperationalError):
+            migrar(conn, db, MIGRACOES + [(VERSAO_ATUAL + 1, 'nova', criar_tabela),
+                                          (VERSAO_ATUAL + 2, 'erro', falhar)])
+
+        assert versao_schema(conn) == VERSAO_ATUAL
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'nova'").fetchone() is None
+        conn.close()
+
+    def test_so_pendentes_sao_aplicadas(self, tmp_path):
+        caminho = str(tmp_path / "dashboard.db")
+        db = LeadsDatabase(caminho, pool_leitura=0)
+        chamadas = []
+
+        conn = sqlite3.connect(caminho)
+        nova = (VERSAO_ATUAL + 1, 'nova', lambda cursor, db: chamadas.append(1))
+        resultado = migrar(conn, db, MIGRACOES + [nova])
+        migrar(conn, db, MIGRACOES + [nova])
+        conn.close()
+
+        assert resultado['aplicadas'] == [VERSAO_ATUAL + 1]
+        assert chamadas == [1]
+        assert versao(caminho) == VERSAO_ATUAL + 1
+
+    def test_duplicatas_canceladas_antes_do_indice_unico(self, tmp_path):
+        """Banco na versão 3 com o mesmo horário ativo duas vezes"""
+        caminho = str(tmp_path / "dashboard.db")
+        LeadsDatabase(caminho, pool_leitura=0)
+        conn = sqlite3.connect(caminho)
+        conn.execute("DROP INDEX idx_agendamentos_slot_ativo")
+        for nome in ('Ana', 'Bia', 'Caio'):
+            conn.execute("""
+                INSERT INTO agendamentos (nome_cliente, whatsapp, imovel_id, data_visita, hora_visita, status)
+                VALUES (?, '5531000000001', 1, '2099-03-10', '14:00', 'agendado')
+            """, (nome,))
+        conn.execute("PRAGMA user_version = 3")
+        conn.commit()
+        conn.close()
+
+        db = LeadsDatabase(caminho, pool_leitura=0)
+
+        assert versao(caminho) == VERSAO_ATUAL
+        agendamentos = {a['nome_cliente']: a for a in db.listar_agendamentos()}
+        assert agendamentos['Ana']['status'] == 'agendado'
+        assert agendamentos['Bia']['status'] == 'cancelado'
+        assert 'agendamento #1' in agendamentos['Caio']['observacoes']
+
+        conn = sqlite3.connect(caminho)
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("""
+                INSERT INTO agendamentos (nome_cliente, whatsapp, imovel_id, data_visita, hora_visita, status)
+                VALUES ('Duda', '5531000000001', 1, '2099-03-10', '14:00', 'agendado')
+            """)
+        conn.close()
+
+    def test_backfill_da_agenda_sem_o_leads_database(self, tmp_path):
+        """Migrações 5 e 6 recompõem slots e ocupação só com SQL da própria versão"""
+        caminho = str(tmp_path / "dashboard.db")
+        db = LeadsDatabase(caminho, pool_leitura=0)
+        db.criar_agendamento('Ana', '5531000000001', 1, '2099-03-10', '14:00')
+        db.criar_agendamento('Bia', '5531000000002', 2, '2099-03-10', '10:00')
+
+        conn = sqlite3.connect(caminho)
+        esperado = (conn.execute("SELECT * FROM agenda_slots ORDER BY 1, 2").fetchall(),
+                    conn.execute("SELECT * FROM agenda_ocupacao ORDER BY 1, 2").fetchall())
+        conn.execute("DROP TABLE agenda_slots")
+        conn.execute("DROP TABLE agenda_ocupacao")
+        conn.execute("PRAGMA user_version = 4")
+        conn.commit()
+
+        assert migrar(conn, None)['aplicadas'] == [5, 6]
+        assert (conn.execute("SELECT * FROM agenda_slots ORDER BY 1, 2").fetchall(),
+                conn.execute("SELECT * FROM agenda_ocupacao ORDER BY 1, 2").fetchall()) == esperado
+        assert len(esperado[0]) == 2
+        conn.close()
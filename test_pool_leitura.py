@@ -0,0 +1,107 @@
+"""
+Testes do Pool de Conexões Somente Leitura
+Valida uso automático pelos métodos de leitura, isolamento do lock de
+escrita, liberação do snapshot e dimensionamento
+"""
+import sqlite3
+import time
+
+import pytest
+
+from auth.models import UserModel
+from database import LeadsDatabase
+from pool_leitura import PoolLeitura
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = LeadsDatabase(str(tmp_path / "dashboard.db"), pool_leitura=2)
+    db.registrar_lead("5531000000001", "Ana", 1, 50, False)
+    yield db
+    db.pool_leitura.fechar()
+
+
+class TestPoolLeitura:
+    """Testes do pool"""
+
+    def test_leituras_reaproveitam_conexao(self, db):
+        db.listar_leads()
+        db.buscar_lead("5531000000001")
+        db.obter_estatisticas()
+        db.listar_agendamentos()
+
+        assert db.pool_leitura.estatisticas()['ociosas'] == 1
+
+    def test_conexao_somente_leitura(self, db):
+        conn = db.pool_leitura.obter()
+        try:
+            with pytest.raises(sqlite3.OperationalError, match="readonly|query_only"):
+                conn.execute("DELETE FROM leads")
+        finally:
+            conn.close()
+        assert db.buscar_lead("5531000000001") is not None
+
+    def test_leitura_nao_espera_escritor(self, db):
+        escritor = sqlite3.connect(db.db_path, isolation_level=None)
+        escritor.execute("BEGIN IMMEDIATE")
+        escritor.execute("UPDATE leads SET score = 99")
+        try:
+            inicio = time.monotonic()
+            lead = db.buscar_lead("5531000000001")
+            assert time.monotonic() - inicio < 1
+            assert lead['score'] == 50  # snapshot anterior ao commit
+        finally:
+            escritor.rollback()
+            escritor.close()
+
+    def test_conexao_ociosa_nao_segura_checkpoint(self, db):
+        db.listar_leads()
+        db.registrar_lead("5531000000002", "Bia", 1, 10, False)
+
+        conn = sqlite3.connect(db.db_path)
+        ocupado, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        conn.close()
+        assert ocupado == 0
+
+    def test_cursor_lido_pela_metade_nao_segura_checkpoint(self, db):
+        db.registrar_lead("5531000000002", "Bia", 1, 10, False)
+        conn = db.pool_leitura.obter()
+        cursor = conn.execute("SELECT * FROM leads")
+        cursor.fetchone()  # statement ainda ativo
+        conn.close()       # volta ao pool com o cursor vivo
+
+        db.registrar_lead("5531000000003", "Caio", 1, 10, False)
+        checkpoint = sqlite3.connect(db.db_path, timeout=0.1)
+        ocupado, _, _ = checkpoint.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        checkpoint.close()
+
+        assert ocupado == 0
+        with pytest.raises(sqlite3.ProgrammingError):
+            cursor.fetchone()
+
+    def test_excedentes_sao_fechados(self, db):
+        conexoes = [db.pool_leitura.obter() for _ in range(4)]
+        for conn in conexoes:
+            conn.close()
+        assert db.pool_leitura.estatisticas() == {'tamanho': 2, 'ociosas': 2}
+
+    def test_sem_pool(self, tmp_path):
+        db = LeadsDatabase(str(tmp_path / "sem_pool.db"), pool_leitura=0)
+        db.registrar_lead("5531000000001", "Ana", 1, 50, False)
+        assert db.pool_leitura is None
+        assert len(db.listar_leads()) == 1
+
+    def test_consultas_de_usuario_usam_pool(self, db):
+        users = UserModel(db)
+        users.criar_ou_atualizar({'sub': 'g1', 'email': 'a@b.c'}, {})
+        while db.pool_leitura.estatisticas()['ociosas']:
+            db.pool_leitura.obter().fechar()
+
+        assert users.buscar_por_email('a@b.c')['google_id'] == 'g1'
+        assert len(users.listar_pendentes()) == 1
+        assert db.pool_leitura.estatisticas()['ociosas'] == 1
+
+    def test_arquivo_inexistente(self, tmp_path):
+        pool = PoolLeitura(str(tmp_path / "nao_existe.db"))
+        with pytest.raises(sqlite3.OperationalError):
+            pool.obter()
@@ -0,0 +1,70 @@
+"""
+Testes do Profiler por Amostragem
+Valida captura de pilhas, formatos de saída e execução única
+"""
+import threading
+from collections import Counter
+
+import pytest
+
+from profiler import Profiler, ProfileEmAndamento, collapsed, top_funcoes
+
+
+def ocupar_cpu(parar):
+    """Função identificável na pilha amostrada"""
+    while not parar.is_set():
+        sum(i * i for i in range(1000))
+
+
+@pytest.fixture
+def thread_ocupada():
+    parar = threading.Event()
+    thread = threading.Thread(target=ocupar_cpu, args=(parar,), daemon=True)
+    thread.start()
+    yield
+    parar.set()
+    thread.join()
+
+
+class TestAmostragem:
+    """Testes do amostrador de pilhas"""
+
+    def test_captura_funcao_em_execucao(self, thread_ocupada):
+        """Thread ocupada aparece nas pilhas coletadas"""
+        resultado = Profiler().amostrar(0.3, intervalo_ms=5)
+
+        assert resultado['amostras'] > 10
+        assert 'ocupar_cpu (test_profiler.py:' in collapsed(resultado['pilhas'])
+
+    def test_apenas_um_profile_por_vez(self):
+        """Segunda amostragem simultânea é recusada"""
+        profiler = Profiler()
+        em_execucao = threading.Thread(target=profiler.amostrar, args=(0.3,))
+        em_execucao.start()
+        while not profiler.em_andamento:
+            pass
+
+        with pytest.raises(ProfileEmAndamento):
+            profiler.amostrar(0.1)
+        em_execucao.join()
+
+        assert not profiler.em_andamento
+
+
+class TestFormatos:
+    """Testes das saídas collapsed e top"""
+
+    PILHAS = Counter({
+        (('app.py', 'rota', 10), ('db.py', 'consulta', 5)): 3,
+        (('app.py', 'rota', 10),): 1,
+    })
+
+    def test_collapsed_da_raiz_para_folha(self):
+        assert collapsed(self.PILHAS) == "rota (app.py:10);consulta (db.py:5) 3\nrota (app.py:10) 1\n"
+
+    def test_top_separa_proprio_e_inclusivo(self):
+        funcoes = {f['funcao']: f for f in top_funcoes(self.PILHAS)}
+
+        assert funcoes['consulta (db.py:5)']['proprio'] == 3
+        assert funcoes['rota (app.py:10)']['proprio'] == 1
+        assert funcoes['rota (app.py:10)']['inclusivo_pct'] == 100.0
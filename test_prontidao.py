@@ -0,0 +1,107 @@
+"""
+Testes do Probe de Prontidão
+Valida verificações de armazenamento, limites e cache do resultado
+"""
+import sqlite3
+
+import pytest
+
+import prontidao
+from database import LeadsDatabase
+from manutencao import ManutencaoBanco
+from prontidao import ProbeProntidao, verificar_banco, verificar_catalogo, verificar_disco
+
+
+@pytest.fixture
+def db(tmp_path):
+    return LeadsDatabase(str(tmp_path / "dashboard.db"))
+
+
+class TestVerificacoes:
+    """Testes de cada verificação isolada"""
+
+    def test_banco_saudavel(self, db):
+        db.registrar_lead("5531999887766", "Teste", 1, 10, False)
+        manutencao = ManutencaoBanco(db.db_path)
+
+        detalhes, motivos = verificar_banco(db, manutencao)
+        assert motivos == []
+        assert detalhes["latencia_ms"] >= 0
+        assert detalhes["wal_pendentes"] is None  # manutenção ainda não rodou
+
+        manutencao.checkpoint()
+        detalhes, _ = verificar_banco(db, manutencao)
+        assert detalhes["wal_pendentes"] == 0  # checkpoint PASSIVE sem leitores
+        assert detalhes["checkpoint_atraso_s"] >= 0
+        manutencao.parar()
+
+    def test_probe_nao_escreve_no_banco(self, db, monkeypatch):
+        """Checkpoint fica com a manutenção: o probe só lê"""
+        statements = []
+        conectar = sqlite3.connect
+
+        def conectar_rastreado(*args, **kwargs):
+            conn = conectar(*args, **kwargs)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        monkeypatch.setattr(sqlite3, "connect", conectar_rastreado)
+        verificar_banco(db)
+
+        assert statements == ["SELECT 1"]
+
+    def test_banco_inacessivel(self, tmp_path):
+        db = LeadsDatabase(str(tmp_path / "dashboard.db"))
+        db.db_path = str(tmp_path / "nao-existe" / "x.db")
+
+        _, motivos = verificar_banco(db)
+
+        assert motivos and "banco inacessível" in motivos[0]
+
+    def test_limite_de_wal(self, db, monkeypatch):
+        monkeypatch.setattr(prontidao, "MAX_WAL_MB", 0)
+        # Conexão aberta: sem ela o SQLite apaga o WAL ao fechar a última
+        conexao = db._get_connection()
+        conexao.execute("SELECT COUNT(*) FROM leads").fetchone()
+        db.registrar_lead("5531999887766", "Teste", 1, 10, False)
+
+        _, motivos = verificar_banco(db)
+        conexao.close()
+
+        assert any("WAL" in m for m in motivos)
+
+    def test_disco_abaixo_do_minimo(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(prontidao, "MIN_DISCO_MB", float("inf"))
+
+        assert verificar_disco(str(tmp_path))[1]
+
+    def test_catalogo_ilegivel(self):
+        def contar_imoveis():
+            raise ValueError("JSON inválido")
+
+        assert verificar_catalogo(contar_imoveis)[1] == ["catálogo ilegível: JSON inválido"]
+
+
+class TestProbe:
+    """Testes da agregação e do cache do resultado"""
+
+    def test_motivos_tornam_indisponivel(self):
+        probe = ProbeProntidao()
+        probe.registrar('ok', lambda: ({}, []))
+        probe.registrar('ruim', lambda: ({'x': 1}, ['x acima do limite']))
+
+        pronto, relatorio = probe.verificar()
+
+        assert pronto is False
+        assert relatorio['motivos'] == ['x acima do limite']
+        assert relatorio['verificacoes']['ruim'] == {'ok': False, 'x': 1}
+
+    def test_resultado_em_cache_durante_ttl(self):
+        chamadas = []
+        probe = ProbeProntidao(ttl=60)
+        probe.registrar('contador', lambda: (chamadas.append(1) or {}, []))
+
+        probe.verificar()
+        probe.verificar()
+
+        assert len(chamadas) == 1
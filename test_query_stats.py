@@ -0,0 +1,156 @@
+"""
+Testes da Instrumentação de Consultas SQLite
+Valida normalização, agregação, log de consultas lentas e contagem por requisição
+"""
+import logging
+import sqlite3
+import threading
+
+import pytest
+from flask import Flask, jsonify
+
+from database import LeadsDatabase, prazo_escrita
+from query_stats import (
+    contar_consultas, http_request_db_queries, init_contagem_consultas,
+    limite_consultas, normalizar_sql, query_stats
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    query_stats.resetar()
+    yield LeadsDatabase(str(tmp_path / "dashboard.db"))
+    query_stats.resetar()
+
+
+class TestNormalizacao:
+    """Testes da normalização de SQL"""
+
+    def test_troca_literais_e_colapsa_espacos(self):
+        sql = """
+            SELECT * FROM leads
+            WHERE score >= 30 AND nome = 'João'
+        """
+        assert normalizar_sql(sql) == "SELECT * FROM leads WHERE score >= ? AND nome = ?"
+
+    def test_preserva_identificadores_com_digitos(self):
+        assert normalizar_sql("SELECT * FROM t1 INDEXED BY idx_2") == "SELECT * FROM t1 INDEXED BY idx_2"
+
+
+class TestAgregacao:
+    """Testes da agregação por statement"""
+
+    def test_agrega_chamadas_do_mesmo_statement(self, db):
+        """Mesma consulta com parâmetros diferentes vira uma linha"""
+        db.buscar_lead("5531000000001")
+        db.buscar_lead("5531000000002")
+
+        linha = next(c for c in query_stats.top(50) if c["sql"] == "SELECT * FROM leads WHERE whatsapp = ?")
+
+        assert linha["chamadas"] == 2
+        assert linha["total_ms"] >= linha["max_ms"] > 0
+
+    def test_loga_consulta_lenta_com_plano(self, db, caplog, monkeypatch):
+        """Acima do limite, loga o statement com EXPLAIN QUERY PLAN"""
+        monkeypatch.setattr(query_stats, "limite_lento_ms", 0)
+
+        with caplog.at_level(logging.WARNING, logger="query_stats"):
+            db.buscar_lead("5531000000001")
+
+        assert any("Slow query" in r.message and "USING INDEX" in r.message for r in caplog.records)
+
+        linha = next(c for c in query_stats.top(50) if c["sql"] == "SELECT * FROM leads WHERE whatsapp = ?")
+        assert "USING INDEX" in linha["plano"]
+
+    def test_lock_de_escrita_nao_conta_como_lenta(self, db, caplog, monkeypatch):
+        """BEGIN IMMEDIATE esperando o busy timeout não vira slow query nem EXPLAIN"""
+        def chamadas_begin():
+            return sum(c["chamadas"] for c in query_stats.top(50) if c["sql"] == "BEGIN IMMEDIATE")
+
+        antes = chamadas_begin()
+        monkeypatch.setattr(query_stats, "limite_lento_ms", 0)
+        externo = sqlite3.connect(db.db_path, isolation_level=None)
+        externo.execute("BEGIN IMMEDIATE")
+        try:
+            with caplog.at_level(logging.WARNING, logger="query_stats"), prazo_escrita(0.3):
+                with pytest.raises(sqlite3.OperationalError):
+                    db.salvar_configuracao("chave", "valor")
+        finally:
+            externo.rollback()
+            externo.close()
+
+        assert not any("Slow query" in r.message for r in caplog.records)
+        assert chamadas_begin() == antes
+
+    def test_copia_para_memoria_sob_o_lock(self, db):
+        """/api/admin/memoria copia o agregado sem disputar com registrar"""
+        db.buscar_lead("5531000000001")
+        copias = []
+
+        with query_stats._lock:
+            thread = threading.Thread(target=lambda: copias.append(query_stats.copiar_consultas()))
+            thread.start()
+            thread.join(0.1)
+            assert copias == []   # esperando o lock
+        thread.join(1)
+
+        assert "SELECT * FROM leads WHERE whatsapp = ?" in copias[0]
+        assert copias[0] is not query_stats._consultas
+
+
+class TestContagemConsultas:
+    """Orçamento de statements por método e por rota (pega N+1)"""
+
+    @pytest.fixture
+    def client(self, db):
+        app = Flask(__name__)
+        init_contagem_consultas(app)
+
+        @app.route('/lead/<whatsapp>')
+        def lead(whatsapp):
+            return jsonify({'lead': db.buscar_lead(whatsapp), 'historico': db.obter_historico(whatsapp)})
+
+        return app.test_client()
+
+    def test_orcamento_dos_metodos(self, db):
+        # BEGIN IMMEDIATE + SELECT + INSERT/UPDATE + histórico
+        with limite_consultas(4, conexoes=1):
+            db.registrar_lead("5531000000001", "Ana", 1, 10, False)
+        with limite_consultas(5, conexoes=1):
+            db.registrar_lead("5531000000001", "Ana", 1, 20, False)
+        with limite_consultas(1, conexoes=1):
+            db.buscar_lead("5531000000001")
+
+    def test_excesso_lista_os_statements(self, db):
+        with pytest.raises(AssertionError) as erro:
+            with limite_consultas(1):
+                db.buscar_lead("5531000000001")
+                db.obter_historico("5531000000001")
+
+        assert "2 statements (máximo 1)" in str(erro.value)
+        assert "FROM score_historico" in str(erro.value)
+
+    def test_contagens_aninhadas_somam_na_externa(self, db):
+        with contar_consultas() as externa:
+            db.buscar_lead("5531000000001")
+            with contar_consultas() as interna:
+                db.obter_historico("5531000000001")
+
+        assert (interna.consultas, interna.conexoes) == (1, 1)
+        assert (externa.consultas, externa.conexoes) == (2, 2)
+
+    def test_headers_so_com_debug(self, client):
+        assert 'X-DB-Queries' not in client.get('/lead/1').headers
+
+        resposta = client.get('/lead/1', headers={'X-Debug-Timing': '1'})
+        assert resposta.headers['X-DB-Queries'] == '2'
+        assert resposta.headers['X-DB-Connections'] == '2'
+
+    def test_limite_por_rota_via_test_client(self, client):
+        with limite_consultas(2, conexoes=2) as contagem:
+            client.get('/lead/1')
+        assert contagem.consultas == 2
+
+    def test_alimenta_histograma(self, client):
+        client.get('/lead/1')
+        assert http_request_db_queries.quantil(0.5, route='/lead/<whatsapp>') is not None
@@ -0,0 +1,79 @@
+"""
+Testes do Replay de Requisições
+Valida gravação, agendamento com compressão de tempo e relatório
+"""
+import json
+import time
+
+from flask import Flask, jsonify, request
+
+from replay import ClienteFlask, carregar_log, init_gravacao, percentil, reproduzir, rota_do_path
+
+
+def criar_app():
+    app = Flask(__name__)
+
+    @app.route('/api/itens/<int:item_id>', methods=['GET', 'POST'])
+    def item(item_id):
+        if request.headers.get('Authorization') != 'Bearer chave':
+            return jsonify({'success': False}), 401
+        return jsonify({'id': item_id}), 404 if item_id > 100 else 200
+
+    return app
+
+
+class TestGravacao:
+    """Testes do log gravado pelo servidor"""
+
+    def test_grava_e_recarrega_em_ordem(self, tmp_path):
+        arquivo = tmp_path / "requisicoes.jsonl"
+        app = criar_app()
+        init_gravacao(app, str(arquivo))
+        cliente = app.test_client()
+
+        cliente.get('/api/itens/1?x=1')
+        cliente.post('/api/itens/2', json={'score': 45})
+        cliente.get('/nao-api')
+
+        registros = carregar_log(str(arquivo))
+
+        assert [(r['method'], r['path'], r['query']) for r in registros] == [
+            ('GET', '/api/itens/1', 'x=1'), ('POST', '/api/itens/2', '')
+        ]
+        assert registros[1]['json'] == {'score': 45}
+
+
+class TestReplay:
+    """Testes do replay e do relatório"""
+
+    def test_relatorio_por_rota_e_status(self):
+        registros = [
+            {'ts': 0, 'method': 'GET', 'path': f'/api/itens/{i}', 'query': ''}
+            for i in (1, 2, 3, 200)
+        ]
+
+        relatorio = reproduzir(registros, ClienteFlask(criar_app(), 'chave'), concorrencia=2, velocidade=0)
+
+        assert relatorio['requisicoes'] == 4
+        assert relatorio['status'] == {'200': 3, '404': 1}
+        rota = relatorio['rotas']['GET /api/itens/{id}']
+        assert rota['requisicoes'] == 4
+        assert rota['latencia_ms']['p99'] >= rota['latencia_ms']['p50'] > 0
+        json.dumps(relatorio)  # comparável entre execuções
+
+    def test_compressao_de_tempo(self):
+        """2s de log com velocidade 10 devem levar ~0.2s"""
+        registros = [
+            {'ts': 1000.0, 'method': 'GET', 'path': '/api/itens/1'},
+            {'ts': 1002.0, 'method': 'GET', 'path': '/api/itens/1'},
+        ]
+
+        inicio = time.perf_counter()
+        reproduzir(registros, ClienteFlask(criar_app(), 'chave'), velocidade=10)
+
+        assert 0.15 < time.perf_counter() - inicio < 1.0
+
+    def test_percentil_e_rotas(self):
+        assert percentil(list(range(1, 101)), 95) == 95
+        assert percentil([], 50) is None
+        assert rota_do_path('PUT', '/api/agenda/agendamentos/12') == 'PUT /api/agenda/agendamentos/{id}'
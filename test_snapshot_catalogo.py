@@ -0,0 +1,192 @@
+"""
+Testes do Snapshot Compilado do Catálogo
+Valida compilação, busca binária por id, fatias sem cópia, troca atômica
+e uso pelas rotas do catálogo
+"""
+import fcntl
+import json
+import threading
+
+import pytest
+
+from app import create_app
+from catalogo import cache_arquivos
+from snapshot_catalogo import SnapshotCatalogo, compilar
+
+API_KEY = {'Authorization': 'Bearer dev-token-12345'}
+
+
+def escrever_catalogo(dados, imoveis, faqs=None, links=None):
+    (dados / 'imoveis').mkdir(parents=True, exist_ok=True)
+    (dados / 'INDICE.json').write_text(
+        json.dumps({'versao': '2.0', 'total_imoveis': len(imoveis), 'imoveis': imoveis}), encoding='utf-8'
+    )
+    for imovel in imoveis:
+        pasta = dados / 'imoveis' / imovel['slug']
+        pasta.mkdir(exist_ok=True)
+        if (faqs or {}).get(imovel['id']) is not None:
+            (pasta / 'FAQ.txt').write_text(faqs[imovel['id']], encoding='utf-8')
+        if (links or {}).get(imovel['id']) is not None:
+            (pasta / 'links.json').write_text(json.dumps(links[imovel['id']]), encoding='utf-8')
+
+
+def imovel(id_, titulo=None):
+    return {'id': id_, 'slug': f'imovel-{id_:03d}', 'titulo': titulo or f'Imóvel {id_}',
+            'tipo': 'casa', 'cidade': 'BH', 'status': 'disponivel'}
+
+
+@pytest.fixture
+def dados(tmp_path):
+    dados = tmp_path / 'data'
+    escrever_catalogo(
+        dados,
+        [imovel(i) for i in (7, 3, 12, 1)],
+        faqs={7: 'FAQ sete ç', 3: 'FAQ três', 1: ''},
+        links={7: {'fotos': ['a.jpg', 'b.jpg']}}
+    )
+    return dados
+
+
+class TestSnapshot:
+    """Testes do formato e do leitor"""
+
+    def test_busca_por_id(self, dados):
+        destino = str(dados / 'catalogo.snap')
+        assert compilar(str(dados), destino)['imoveis'] == 4
+        snapshot = SnapshotCatalogo(destino)
+
+        assert snapshot.imovel(12)['slug'] == 'imovel-012'
+        assert [snapshot.imovel(i)['id'] for i in (1, 3, 7, 12)] == [1, 3, 7, 12]
+        assert snapshot.imovel(5) is None
+        assert snapshot.imovel(100) is None
+
+    def test_faq_e_links(self, dados):
+        destino = str(dados / 'catalogo.snap')
+        compilar(str(dados), destino)
+        snapshot = SnapshotCatalogo(destino)
+
+        faq = snapshot.faq_bytes(7)
+        assert isinstance(faq, memoryview)
+        assert str(faq, 'utf-8') == 'FAQ sete ç'
+        assert snapshot.faq(1, 'padrão') == ''          # arquivo vazio existe
+        assert snapshot.faq(12, 'padrão') == 'padrão'   # arquivo ausente
+        assert snapshot.links(7) == {'fotos': ['a.jpg', 'b.jpg']}
+        assert snapshot.links(3, {'fotos': []}) == {'fotos': []}
+
+    def test_indice_preserva_ordem_e_metadados(self, dados):
+        destino = str(dados / 'catalogo.snap')
+        compilar(str(dados), destino)
+
+        original = json.loads((dados / 'INDICE.json').read_text(encoding='utf-8'))
+        assert SnapshotCatalogo(destino).indice() == original
+
+    def test_mapa_nao_guarda_registros_decodificados(self, dados):
+        destino = str(dados / 'catalogo.snap')
+        compilar(str(dados), destino)
+        mapa = SnapshotCatalogo(destino).mapa()
+
+        indice = mapa.indice()
+        assert mapa.indice() is not indice
+        assert mapa.indice() == indice
+        assert not [nome for nome, valor in vars(mapa).items() if nome != 'meta' and isinstance(valor, (dict, list))]
+
+    def test_compilacao_espera_lock_de_outro_worker(self, dados):
+        destino = str(dados / 'catalogo.snap')
+        compilar(str(dados), destino)
+        concluida = threading.Event()
+
+        with open(f"{destino}.lock", 'a') as trava:
+            fcntl.flock(trava.fileno(), fcntl.LOCK_EX)   # outro worker compilando
+            thread = threading.Thread(target=lambda: (compilar(str(dados), destino), concluida.set()))
+            thread.start()
+            assert not concluida.wait(0.2)
+            fcntl.flock(trava.fileno(), fcntl.LOCK_UN)
+
+        thread.join(5)
+        assert concluida.is_set()
+
+    def test_id_duplicado_primeira_ocorrencia(self, tmp_path):
+        dados = tmp_path / 'data'
+        escrever_catalogo(dados, [imovel(2, 'primeiro'), imovel(2, 'segundo')])
+        destino = str(dados / 'catalogo.snap')
+        compilar(str(dados), destino)
+
+        snapshot = SnapshotCatalogo(destino)
+        assert snapshot.imovel(2)['titulo'] == 'primeiro'
+        assert len(snapshot.indice()['imoveis']) == 2
+
+    def test_troca_atomica_detectada(self, dados):
+        destino = str(dados / 'catalogo.snap')
+        compilar(str(dados), destino)
+        snapshot = SnapshotCatalogo(destino)
+        antiga = snapshot.faq_bytes(7)
+
+        (dados / 'imoveis' / 'imovel-007' / 'FAQ.txt').write_text('FAQ nova', encoding='utf-8')
+        compilar(str(dados), destino)
+
+        assert snapshot.faq(7) == 'FAQ nova'
+        assert snapshot.trocas == 1
+        assert str(antiga, 'utf-8') == 'FAQ sete ç'  # fatia antiga continua válida
+
+    def test_arquivo_invalido(self, tmp_path):
+        caminho = tmp_path / 'lixo.snap'
+        caminho.write_bytes(b'x' * 64)
+        assert SnapshotCatalogo(str(caminho)).disponivel() is False
+        assert SnapshotCatalogo(str(tmp_path / 'nao_existe.snap')).disponivel() is False
+
+
+class TestRotas:
+    """Rotas do catálogo lendo o snapshot"""
+
+    @pytest.fixture
+    def cliente(self, dados, monkeypatch):
+        monkeypatch.chdir(dados.parent)
+        cache_arquivos.limpar()
+        app = create_app({
+            'DB_PATH': str(dados / 'dashboard.db'), 'DB_MAINTENANCE': False, 'WARMUP': False,
+            'CATALOG_SNAPSHOT': str(dados / 'catalogo.snap')
+        })
+        compilar(str(dados), str(dados / 'catalogo.snap'))
+        yield app.test_client()
+        app.extensions['armazenamento'].fechar()
+        cache_arquivos.limpar()
+
+    def test_leituras_vem_do_snapshot(self, cliente, dados):
+        # Arquivos alterados sem recompilar: as rotas continuam no snapshot
+        (dados / 'imoveis' / 'imovel-007' / 'FAQ.txt').write_text('não compilado', encoding='utf-8')
+
+        resposta = cliente.get('/api/imoveis/7/faq', headers=API_KEY)
+        assert resposta.json['faq'] == 'FAQ sete ç'
+        resposta = cliente.get('/api/imoveis/7/fotos', headers=API_KEY)
+        assert resposta.json['fotos'] == ['a.jpg', 'b.jpg']
+        assert cliente.get('/api/imoveis/5', headers=API_KEY).status_code == 404
+
+    def test_listagem_filtrada_e_faq_em_texto(self, cliente):
+        resposta = cliente.get('/api/imoveis?cidade=bh', headers=API_KEY)
+        assert [i['id'] for i in resposta.json['imoveis']] == [7, 3, 12, 1]
+        assert cliente.get('/api/imoveis?tipo=apartamento', headers=API_KEY).json['total'] == 0
+        assert cliente.get('/api/texto/imoveis', headers=API_KEY).json['total'] == 4
+
+        resposta = cliente.get('/api/imoveis/7/faq?formato=texto', headers=API_KEY)
+        assert resposta.data.decode('utf-8').endswith('\n\nFAQ sete ç')
+        resposta = cliente.get('/api/imoveis/12/faq?formato=texto', headers=API_KEY)
+        assert resposta.data.decode('utf-8').endswith('FAQ não disponível')
+
+    def test_um_stat_por_requisicao(self, cliente, monkeypatch):
+        chamadas = []
+        original = SnapshotCatalogo.mapa
+        monkeypatch.setattr(SnapshotCatalogo, 'mapa', lambda self: chamadas.append(1) or original(self))
+
+        # buscar_imovel_catalogo + ler_faq + ler_links na mesma rota
+        assert cliente.get('/api/texto/imoveis/7/faq', headers=API_KEY).status_code == 200
+        assert len(chamadas) == 1
+
+    def test_escrita_recompila(self, cliente):
+        resposta = cliente.post('/api/imoveis', json={'titulo': 'Casa Nova', 'faq': 'FAQ da casa'})
+        novo_id = resposta.json['imovel_id']
+
+        resposta = cliente.get(f'/api/imoveis/{novo_id}/faq', headers=API_KEY)
+        assert resposta.json['faq'] == 'FAQ da casa'
+
+        cliente.delete(f'/api/imoveis/{novo_id}')
+        assert cliente.get(f'/api/imoveis/{novo_id}', headers=API_KEY).status_code == 404
@@ -0,0 +1,75 @@
+"""
+Testes do Stress de Concorrência
+Valida parsing dos níveis, contagem de retries e um nível curto com threads e processos
+"""
+import sqlite3
+
+import pytest
+
+from database import contador_lock, retry_on_db_lock
+from stress_db import parse_niveis, rodar_nivel
+
+
+class TestNiveis:
+    """Testes do parsing de níveis"""
+
+    def test_parse(self):
+        assert parse_niveis("1x0, 4x2,8") == [(1, 0), (4, 2), (8, 0)]
+
+    def test_nivel_vazio_invalido(self):
+        with pytest.raises(ValueError):
+            parse_niveis("0x0")
+
+
+class TestContadorLock:
+    """Testes da contagem de retries do retry_on_db_lock"""
+
+    def setup_method(self):
+        contador_lock.resetar()
+
+    def test_conta_retries_e_esgotados(self):
+        tentativas = []
+
+        @retry_on_db_lock(max_retries=3, backoff_ms=1)
+        def sempre_locked():
+            tentativas.append(1)
+            raise sqlite3.OperationalError("database is locked")
+
+        with pytest.raises(sqlite3.OperationalError):
+            sempre_locked()
+
+        assert len(tentativas) == 3
+        assert contador_lock.snapshot() == {'retries': 2, 'esgotados': 1}
+
+    def test_sucesso_apos_retry(self):
+        tentativas = []
+
+        @retry_on_db_lock(max_retries=3, backoff_ms=1)
+        def locked_uma_vez():
+            tentativas.append(1)
+            if len(tentativas) == 1:
+                raise sqlite3.OperationalError("database is locked")
+            return "ok"
+
+        assert locked_uma_vez() == "ok"
+        assert contador_lock.snapshot() == {'retries': 1, 'esgotados': 0}
+
+
+class TestNivel:
+    """Nível curto real (whatsapps praticamente únicos para não disputar a mesma linha)"""
+
+    def test_threads_e_processos(self, tmp_path):
+        resultado = rodar_nivel(str(tmp_path / "stress.db"), threads=2, processos=1,
+                                duracao=0.5, leads=10_000_000, escritas=0.7)
+
+        assert resultado['threads'] == 2
+        assert resultado['processos'] == 1
+        assert resultado['escritas']['ok'] > 0
+        assert resultado['leituras']['ok'] > 0
+        assert resultado['escritas']['latencia_ms']['p99'] is not None
+        assert set(resultado['por_operacao']) >= {'registrar_lead', 'criar_agendamento', 'obter_estatisticas'}
+
+        conn = sqlite3.connect(str(tmp_path / "stress.db"))
+        leads = conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0]
+        conn.close()
+        assert leads == resultado['por_operacao']['registrar_lead']['ok']
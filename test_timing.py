@@ -0,0 +1,72 @@
+"""
+Testes do Server-Timing
+Valida coleta de fases por requisição, header e métricas
+"""
+import uuid
+
+import pytest
+from flask import Flask, jsonify
+
+import timing
+from database import LeadsDatabase
+from decorators import protect_endpoint
+from timing import fase, formatar_header, http_request_phase_seconds, init_server_timing
+
+
+def fases_do_header(valor):
+    """{'db': 1.23, ...} a partir do header Server-Timing"""
+    fases = {}
+    for parte in valor.split(', '):
+        nome, dur = parte.split(';')[:2]
+        fases[nome] = float(dur.split('=')[1])
+    return fases
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    init_server_timing(app)
+    db = LeadsDatabase(str(tmp_path / "dashboard.db"))
+
+    @app.route('/lead/<whatsapp>')
+    @protect_endpoint(max_requests=100, window_seconds=1, dedup_params=['id'])
+    def lead(whatsapp):
+        with fase('arquivo'):
+            pass
+        return jsonify({'lead': db.buscar_lead(whatsapp)})
+
+    return app.test_client()
+
+
+class TestServerTiming:
+    """Testes do header e da agregação por fase"""
+
+    def test_header_so_com_debug(self, client):
+        """No modo padrão, o header exige X-Debug-Timing: 1"""
+        assert 'Server-Timing' not in client.get(f'/lead/1?id={uuid.uuid4().hex}').headers
+
+        resposta = client.get(f'/lead/1?id={uuid.uuid4().hex}', headers={'X-Debug-Timing': '1'})
+        fases = fases_do_header(resposta.headers['Server-Timing'])
+
+        assert {'limiter', 'db', 'arquivo', 'json', 'app', 'total'} <= set(fases)
+        assert fases['total'] >= fases['db']
+
+    def test_fases_alimentam_histograma(self, client):
+        """Cada fase observada vira série route/fase no histograma"""
+        client.get(f'/lead/1?id={uuid.uuid4().hex}')
+
+        assert http_request_phase_seconds.quantil(0.5, route='/lead/<whatsapp>', fase='db')
+        assert http_request_phase_seconds.quantil(0.5, route='/lead/<whatsapp>', fase='limiter')
+
+    def test_fora_de_requisicao_nao_coleta(self, tmp_path):
+        """LeadsDatabase usado fora do Flask não depende do contexto"""
+        with fase('db'):
+            LeadsDatabase(str(tmp_path / "x.db")).buscar_lead("1")
+
+        assert not timing.ativo()
+
+    def test_formatacao_com_restante_da_aplicacao(self):
+        """'app' é o tempo não atribuído a nenhuma fase"""
+        valor = formatar_header({'json': [0.001, 1], 'db': [0.002, 3]}, total=0.010)
+
+        assert valor == 'db;dur=2.00;desc="3x", json;dur=1.00, app;dur=7.00, total;dur=10.00'
@@ -0,0 +1,114 @@
+"""
+Testes do Tracing Local
+Valida propagação do traceparent, hierarquia de spans e exportação JSONL
+"""
+import json
+import uuid
+
+import pytest
+from flask import Flask, jsonify
+
+import tracing
+from database import LeadsDatabase
+from decorators import protect_endpoint
+from tracing import init_tracing, parar_exportador, span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    parar_exportador()
+    yield tmp_path / "traces.jsonl"
+    parar_exportador()
+
+
+@pytest.fixture
+def client(tmp_path, arquivo):
+    app = Flask(__name__)
+    init_tracing(app, str(arquivo), taxa_amostragem=1.0)
+    db = LeadsDatabase(str(tmp_path / "dashboard.db"))
+
+    @app.route('/lead/<whatsapp>')
+    @protect_endpoint(max_requests=100, window_seconds=1, dedup_params=['id'])
+    def lead(whatsapp):
+        return jsonify({'lead': db.buscar_lead(whatsapp)})
+
+    return app.test_client()
+
+
+def ler_spans(arquivo):
+    """Esvazia a fila do exportador e retorna {nome: span}"""
+    parar_exportador()
+    linhas = arquivo.read_text(encoding='utf-8').splitlines() if arquivo.exists() else []
+    return {s['name']: s for s in (json.loads(linha)['span'] for linha in linhas)}
+
+
+class TestPropagacao:
+    """Testes do contexto W3C traceparent"""
+
+    def test_continua_trace_recebido(self, client, arquivo):
+        """traceparent válido define trace id e pai do span raiz"""
+        resposta = client.get(f'/lead/1?id={uuid.uuid4().hex}',
+                              headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'})
+
+        assert resposta.headers['traceresponse'].startswith(f'00-{TRACE_ID}-')
+        assert 'traceparent' not in resposta.headers
+
+        raiz = ler_spans(arquivo)['GET /lead/<whatsapp>']
+        assert raiz['traceId'] == TRACE_ID
+        assert raiz['parentSpanId'] == PARENT_ID
+        assert raiz['kind'] == 'SPAN_KIND_SERVER'
+
+    def test_respeita_flag_nao_amostrado(self, client, arquivo):
+        """Flag 00 no traceparent: requisição não é rastreada"""
+        client.get(f'/lead/1?id={uuid.uuid4().hex}',
+                   headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-00'})
+
+        assert ler_spans(arquivo) == {}
+
+    def test_amostragem_padrao_baixa(self, tmp_path, arquivo):
+        """Sem opt-in (TRACE_SAMPLE), só uma fração pequena vai para o JSONL"""
+        assert tracing.TAXA_AMOSTRAGEM <= 0.01
+
+        app = Flask(__name__)
+        init_tracing(app, str(arquivo), taxa_amostragem=0.0)
+        app.add_url_rule('/ping', 'ping', lambda: 'ok')
+        resposta = app.test_client().get('/ping')
+
+        assert 'traceresponse' not in resposta.headers
+        assert ler_spans(arquivo) == {}
+
+    def test_gera_trace_sem_header(self, client, arquivo):
+        """Sem traceparent (ou inválido), um novo trace id é gerado"""
+        resposta = client.get(f'/lead/1?id={uuid.uuid4().hex}', headers={'traceparent': 'lixo'})
+
+        trace_id = resposta.headers['traceresponse'].split('-')[1]
+        assert len(trace_id) == 32 and trace_id != TRACE_ID
+
+
+class TestHierarquia:
+    """Testes dos spans filhos (limiter e LeadsDatabase)"""
+
+    def test_spans_filhos_da_rota(self, client, arquivo):
+        client.get(f'/lead/1?id={uuid.uuid4().hex}')
+
+        spans = ler_spans(arquivo)
+        raiz = spans['GET /lead/<whatsapp>']
+
+        for nome in ('rate_limiter.is_allowed', 'rate_limiter.is_duplicate', 'LeadsDatabase.buscar_lead'):
+            assert spans[nome]['parentSpanId'] == raiz['spanId']
+            assert spans[nome]['traceId'] == raiz['traceId']
+            assert int(spans[nome]['endTimeUnixNano']) >= int(spans[nome]['startTimeUnixNano'])
+
+        status = next(a for a in raiz['attributes'] if a['key'] == 'http.response.status_code')
+        assert status['value'] == {'intValue': '200'}
+
+    def test_fora_de_requisicao_nao_cria_span(self, tmp_path):
+        """Scripts e testes usam LeadsDatabase sem custo de tracing"""
+        with span('qualquer') as atual:
+            LeadsDatabase(str(tmp_path / "x.db")).buscar_lead("1")
+
+        assert atual is None
+        assert tracing.trace_id_atual() is None
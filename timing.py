@@ -0,0 +1,139 @@
+"""
+Server-Timing por Requisição
+Decompõe a latência em fases (auth, limiter, db, arquivo, json) e expõe
+o resultado no header Server-Timing e no histograma de métricas
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from flask import Flask, g, request
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import metrics, rota_atual
+
+# 'debug' (padrão): header só quando a requisição envia X-Debug-Timing: 1
+# 'sempre': header em toda resposta | 'off': não emite (métricas continuam)
+MODO_HEADER = os.getenv('SERVER_TIMING', 'debug')
+HEADER_DEBUG = 'X-Debug-Timing'
+
+FASES = ('auth', 'limiter', 'db', 'arquivo', 'json')
+
+http_request_phase_seconds = metrics.histogram(
+    'http_request_phase_seconds', 'Tempo gasto por fase da requisição', ('route', 'fase'),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+
+# {fase: [segundos, ocorrências]} da requisição atual (None fora de requisição)
+_fases_atuais: ContextVar[Optional[Dict[str, list]]] = ContextVar('server_timing', default=None)
+
+
+def ativo() -> bool:
+    """Se há uma requisição coletando fases neste contexto"""
+    return _fases_atuais.get() is not None
+
+
+def header_debug_ativo() -> bool:
+    """Se a resposta atual deve levar headers de diagnóstico (ver MODO_HEADER)"""
+    return MODO_HEADER == 'sempre' or (
+        MODO_HEADER == 'debug' and request.headers.get(HEADER_DEBUG) == '1'
+    )
+
+
+def registrar(fase: str, segundos: float) -> None:
+    """
+    Soma tempo a uma fase da requisição atual
+
+    Fora de uma requisição (scripts, testes do LeadsDatabase) é no-op.
+    """
+    fases = _fases_atuais.get()
+    if fases is None:
+        return
+    entrada = fases.get(fase)
+    if entrada is None:
+        fases[fase] = [segundos, 1]
+    else:
+        entrada[0] += segundos
+        entrada[1] += 1
+
+
+@contextmanager
+def fase(nome: str) -> Iterator[None]:
+    """
+    Mede um trecho como parte de uma fase
+
+    Usage:
+        with fase('arquivo'):
+            dados = json.load(f)
+    """
+    if _fases_atuais.get() is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(nome, time.perf_counter() - inicio)
+
+
+def formatar_header(fases: Dict[str, list], total: float) -> str:
+    """Monta o valor do header (durações em ms, conforme a especificação)"""
+    partes = []
+    for nome in sorted(fases, key=lambda f: FASES.index(f) if f in FASES else len(FASES)):
+        segundos, ocorrencias = fases[nome]
+        parte = f"{nome};dur={segundos * 1000:.2f}"
+        if ocorrencias > 1:
+            parte += f';desc="{ocorrencias}x"'
+        partes.append(parte)
+
+    medido = sum(segundos for segundos, _ in fases.values())
+    partes.append(f"app;dur={max(total - medido, 0) * 1000:.2f}")
+    partes.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(partes)
+
+
+class JSONProviderCronometrado(DefaultJSONProvider):
+    """Provider JSON do Flask que reporta a serialização na fase 'json'"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        with fase('json'):
+            return super().dumps(obj, **kwargs)
+
+
+def init_server_timing(app: Flask) -> None:
+    """
+    Registra a coleta de fases na aplicação
+
+    Usage:
+        app = Flask(__name__)
+        init_server_timing(app)
+    """
+    app.json = JSONProviderCronometrado(app)
+
+    @app.before_request
+    def _iniciar_fases():
+        g.server_timing_token = _fases_atuais.set({})
+        g.server_timing_inicio = time.perf_counter()
+
+    @app.after_request
+    def _emitir_server_timing(response):
+        fases = _fases_atuais.get()
+        inicio = g.get('server_timing_inicio')
+        if fases is None or inicio is None:
+            return response
+
+        rota = rota_atual()
+        for nome, (segundos, _) in fases.items():
+            http_request_phase_seconds.observe(segundos, route=rota, fase=nome)
+
+        if header_debug_ativo():
+            response.headers['Server-Timing'] = formatar_header(fases, time.perf_counter() - inicio)
+        return response
+
+    @app.teardown_request
+    def _encerrar_fases(exc=None):
+        token = g.pop('server_timing_token', None)
+        if token is not None:
+            _fases_atuais.reset(token)
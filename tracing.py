@@ -0,0 +1,292 @@
+"""
+Tracing Local de Spans
+Propaga trace id (W3C traceparent), mede rotas, LeadsDatabase, catálogo e
+rate limiter, e grava spans em JSONL no formato OTLP/JSON do OpenTelemetry
+"""
+import atexit
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from flask import Flask, g, request
+
+# TRACING=0 desliga; TRACE_SAMPLE controla a fração das requisições sem
+# traceparent que são rastreadas (padrão 1%, para não gravar todo o tráfego).
+# Um traceparent recebido com a flag sampled é sempre rastreado.
+HABILITADO = os.getenv('TRACING', '1') != '0'
+ARQUIVO_TRACES = os.getenv('TRACE_FILE', os.path.join('data', 'traces.jsonl'))
+TAXA_AMOSTRAGEM = float(os.getenv('TRACE_SAMPLE', '0.01'))
+TAMANHO_MAXIMO = int(os.getenv('TRACE_MAX_BYTES', str(20 * 1024 * 1024)))
+ARQUIVOS_BACKUP = 5
+SERVICO = 'lf-dashboard'
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# Logger dedicado: cada registro é um span já serializado
+_exportador = logging.getLogger('tracing.spans')
+_exportador.propagate = False
+_exportador.setLevel(logging.INFO)
+_listener: Optional[QueueListener] = None
+_pid_listener: Optional[int] = None
+
+# Span ativo no contexto atual (None = requisição não rastreada)
+_span_atual: ContextVar[Optional['Span']] = ContextVar('span_atual', default=None)
+
+
+class Span:
+    """Operação medida dentro de um trace"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'nome', 'tipo', 'atributos',
+                 'inicio_ns', '_inicio_perf', 'fim_ns', 'erro')
+
+    def __init__(self, nome: str, trace_id: str, parent_id: Optional[str] = None,
+                 tipo: str = 'INTERNAL', atributos: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.nome = nome
+        self.tipo = tipo
+        self.atributos = atributos or {}
+        self.inicio_ns = time.time_ns()
+        self._inicio_perf = time.perf_counter_ns()
+        self.fim_ns: Optional[int] = None
+        self.erro: Optional[str] = None
+
+    def finalizar(self) -> None:
+        self.fim_ns = self.inicio_ns + (time.perf_counter_ns() - self._inicio_perf)
+        _exportar(self)
+
+    def para_otlp(self) -> Dict[str, Any]:
+        """Representação no formato OTLP/JSON (um span por linha)"""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.nome,
+            'kind': f'SPAN_KIND_{self.tipo}',
+            'startTimeUnixNano': str(self.inicio_ns),
+            'endTimeUnixNano': str(self.fim_ns),
+            'attributes': [{'key': k, 'value': _valor_otlp(v)} for k, v in self.atributos.items()],
+            'status': {'code': 'STATUS_CODE_ERROR', 'message': self.erro} if self.erro
+                      else {'code': 'STATUS_CODE_UNSET'}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return {
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICO}}]},
+            'span': span
+        }
+
+
+def _valor_otlp(valor: Any) -> Dict[str, Any]:
+    if isinstance(valor, bool):
+        return {'boolValue': valor}
+    if isinstance(valor, int):
+        return {'intValue': str(valor)}
+    if isinstance(valor, float):
+        return {'doubleValue': valor}
+    return {'stringValue': str(valor)}
+
+
+def _exportar(span: Span) -> None:
+    # Sem listener (testes, scripts) os spans são descartados
+    if _listener is not None:
+        _exportador.info(span)
+
+
+class _FilaSpans(QueueHandler):
+    """Enfileira o Span como está; a serialização fica na thread do listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _FormatoOTLP(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg.para_otlp(), ensure_ascii=False, separators=(',', ':'))
+
+
+def iniciar_exportador(arquivo: str = ARQUIVO_TRACES) -> None:
+    """
+    Inicia a thread que grava spans no arquivo JSONL rotativo
+
+    O logger só enfileira o Span; serialização e escrita em disco ficam
+    na thread do QueueListener, fora do caminho da requisição.
+    """
+    global _listener, _pid_listener
+    if _listener is not None:
+        if _pid_listener == os.getpid():
+            return
+        # Herdado do processo pai no fork: a thread não existe neste processo
+        for handler in list(_exportador.handlers):
+            _exportador.removeHandler(handler)
+        _listener = None
+
+    os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+    arquivo_handler = RotatingFileHandler(
+        arquivo, maxBytes=TAMANHO_MAXIMO, backupCount=ARQUIVOS_BACKUP, encoding='utf-8'
+    )
+    arquivo_handler.setFormatter(_FormatoOTLP())
+
+    fila: queue.Queue = queue.Queue(-1)
+    _exportador.addHandler(_FilaSpans(fila))
+    _listener = QueueListener(fila, arquivo_handler)
+    _listener.start()
+    _pid_listener = os.getpid()
+    atexit.register(parar_exportador)
+
+
+def parar_exportador() -> None:
+    """Esvazia a fila e encerra a thread de escrita"""
+    global _listener, _pid_listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in list(_exportador.handlers):
+        _exportador.removeHandler(handler)
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = _pid_listener = None
+
+
+def trace_id_atual() -> Optional[str]:
+    span = _span_atual.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def span(nome: str, **atributos) -> Iterator[Optional[Span]]:
+    """
+    Mede um trecho como span filho do span ativo
+
+    Fora de uma requisição rastreada não cria nada (custo de um ContextVar.get).
+
+    Usage:
+        with span('catalogo.ler_indice', arquivo=INDICE_FILE):
+            ...
+    """
+    pai = _span_atual.get()
+    if pai is None:
+        yield None
+        return
+
+    atual = Span(nome, pai.trace_id, pai.span_id, atributos=atributos)
+    token = _span_atual.set(atual)
+    try:
+        yield atual
+    except Exception as e:
+        atual.erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _span_atual.reset(token)
+        atual.finalizar()
+
+
+def rastrear_metodos(prefixo: str) -> Callable[[type], type]:
+    """
+    Decorator de classe: um span por chamada de método público
+
+    Usage:
+        @rastrear_metodos('LeadsDatabase')
+        class LeadsDatabase: ...
+    """
+    def decorator(cls: type) -> type:
+        for nome, metodo in list(vars(cls).items()):
+            if nome.startswith('_') or not inspect.isfunction(metodo):
+                continue
+            setattr(cls, nome, _rastreado(f"{prefixo}.{nome}", metodo))
+        return cls
+    return decorator
+
+
+def _rastreado(nome_span: str, func: Callable) -> Callable:
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if _span_atual.get() is None:
+            return func(*args, **kwargs)
+        with span(nome_span):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _ler_traceparent(valor: Optional[str]):
+    """(trace_id, parent_id, amostrado) do header W3C, ou None se inválido"""
+    if not valor:
+        return None
+    m = _TRACEPARENT.match(valor.strip().lower())
+    if not m or m.group(1) == '0' * 32 or m.group(2) == '0' * 16:
+        return None
+    return m.group(1), m.group(2), bool(int(m.group(3), 16) & 1)
+
+
+def init_tracing(app: Flask, arquivo: str = ARQUIVO_TRACES,
+                 taxa_amostragem: float = TAXA_AMOSTRAGEM) -> None:
+    """
+    Registra o span raiz de cada requisição e inicia o exportador
+
+    O exportador sobe na primeira requisição de cada processo, não no
+    import: a thread de escrita não sobrevive ao fork dos workers.
+
+    Requisições rastreadas respondem o header `traceresponse`
+    (W3C Trace Context Level 2, ainda rascunho) com o trace id e o span
+    raiz, para o cliente correlacionar a chamada com data/traces.jsonl.
+
+    Usage:
+        app = Flask(__name__)
+        init_tracing(app)
+    """
+    if not HABILITADO:
+        return
+
+    @app.before_request
+    def _iniciar_trace():
+        iniciar_exportador(arquivo)
+        recebido = _ler_traceparent(request.headers.get('traceparent'))
+        if recebido:
+            trace_id, parent_id, amostrado = recebido
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+            amostrado = random.random() < taxa_amostragem
+        if not amostrado:
+            return
+
+        rota = request.url_rule.rule if request.url_rule else 'nao_mapeada'
+        raiz = Span(f"{request.method} {rota}", trace_id, parent_id, tipo='SERVER', atributos={
+            'http.request.method': request.method,
+            'http.route': rota,
+            'url.path': request.path
+        })
+        g.trace_token = _span_atual.set(raiz)
+        g.trace_raiz = raiz
+
+    @app.after_request
+    def _anotar_resposta(response):
+        raiz = g.get('trace_raiz')
+        if raiz is not None:
+            raiz.atributos['http.response.status_code'] = response.status_code
+            if response.status_code >= 500:
+                raiz.erro = f"HTTP {response.status_code}"
+            # traceparent é só de requisição; na resposta o rascunho do W3C usa traceresponse
+            response.headers['traceresponse'] = f"00-{raiz.trace_id}-{raiz.span_id}-01"
+        return response
+
+    @app.teardown_request
+    def _encerrar_trace(exc=None):
+        raiz = g.pop('trace_raiz', None)
+        token = g.pop('trace_token', None)
+        if raiz is None:
+            return
+        if exc is not None and raiz.erro is None:
+            raiz.erro = f"{type(exc).__name__}: {exc}"
+        _span_atual.reset(token)
+        raiz.finalizar()